@@ -1,24 +1,35 @@
 # PySide6 및 기타 필요한 모듈
+import os
 import sys
+import time
+import importlib.util
+import multiprocessing
 import numpy as np
-import warnings
-from scipy.optimize import curve_fit
-
-from astropy.io import fits
-from astropy.table import Table
 
 from PySide6.QtWidgets import (
-    QApplication, QMainWindow, QFileDialog, QGraphicsScene, QGraphicsPixmapItem
+    QApplication, QMainWindow, QFileDialog, QGraphicsScene, QGraphicsPixmapItem, QCheckBox,
+    QComboBox, QPushButton, QSpinBox, QLabel, QHBoxLayout
 )
 from PySide6.QtGui import QImage, QPixmap
 from PySide6.QtCore import Qt, QTimer
 
 from ui_PSF import Ui_MainWindow
 from graphics_view import GraphicsView  # 사용자 정의 QGraphicsView
+import backends
+from lazy_imports import preload_heavy_modules
+from plot_widgets import SimplePlotWidget
+from photometry import run_aperture_photometry, run_psf_photometry
+from photometric_errors import ccd_parameters
+from frame_buffers import MEMORY_LIMIT_MB, BufferPool, MemoryLimitError, read_fits, stretch_to_uint8
+from session import SESSION_SUFFIX, in_memory, load_session, save_session
+from background_map import get_background
+from detection import shutdown_executor
+
+# 폴더 감시 주기 (ms)
+WATCH_INTERVAL_MS = 250
 
-from photutils.psf import PSFPhotometry, CircularGaussianPRF
-from photutils.background import LocalBackground, MMMBackground
-from astropy.modeling.fitting import TRFLSQFitter
+# astropy, scipy, photutils는 import에 수 초가 걸리므로 실제로 사용하는
+# 메서드 안에서 불러온다. (창이 뜬 뒤 preload_heavy_modules()가 미리 데워 둠)
 
 
 # ------------------------------------------------
@@ -77,6 +88,12 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.fwhm_value, self.threshold_value, self.sigma_clipping_value
         )
 
+        # 프레임당 한 번 계산한 배경/RMS 지도를 검출과 측광에 함께 사용
+        self.checkBox_bkg_map = QCheckBox("배경 지도 사용 (검출·측광 공통)", self.groupBox)
+        self.checkBox_bkg_map.setChecked(True)
+        self.checkBox_bkg_map.toggled.connect(self.graphicsView.set_background_map_enabled)
+        self.gridLayout_2.addWidget(self.checkBox_bkg_map, 2, 0, 1, 5)
+
         # 비교성 겉보기 등급을 전역 변수로 선언
         self.comp_mag = self.lineEdit_3.text()  # lineEdit_3에 입력된 값을 가져옴
         try:
@@ -95,6 +112,127 @@ class MainWindow(QMainWindow, Ui_MainWindow):
 
         self.lineEdit.textChanged.connect(self.update_psf_fwhm)
 
+        # 호버 검사 모드: 마우스 아래 별의 픽셀 값/중심/방사 프로파일/FWHM 표시
+        self.checkBox_inspect = QCheckBox("별 정보 보기 (마우스 호버)", self.groupBox_2)
+        self.gridLayout_3.addWidget(self.checkBox_inspect, 1, 0, 1, 1)
+        self.checkBox_inspect.toggled.connect(self.toggle_inspect_mode)
+
+        # 측광 방식 선택
+        self.comboBox_mode = QComboBox(self.groupBox_2)
+        self.comboBox_mode.addItem("PSF 측광", "psf")
+        self.comboBox_mode.addItem("차분 영상 PSF 측광 (시퀀스)", "difference")
+        self.comboBox_mode.addItem("조리개 측광 (빠른 확인)", "aperture")
+        self.gridLayout_3.addWidget(self.comboBox_mode, 2, 0, 1, 1)
+
+        # 검출/측광 백엔드 설정 (backends.json) 불러오기
+        try:
+            backends.load_config()
+        except ValueError as e:
+            self.textBrowser.append(f"[ERROR] 백엔드 설정 파일 오류, 기본값 사용: {e}")
+
+        # PSF 피팅 방식 선택 (별이 많을 때는 배치 피팅이 훨씬 빠름)
+        self.comboBox_fitter = QComboBox(self.groupBox_2)
+        for name, description in backends.available("fitter"):
+            if name == "batch" and importlib.util.find_spec("numba") is None:
+                description = "배치 가우시안 (Numba 없음, 느림)"
+            self.comboBox_fitter.addItem(f"피팅: {description}", name)
+        self.comboBox_fitter.setCurrentIndex(self.comboBox_fitter.findData(backends.get_backends()["fitter"]))
+        self.comboBox_fitter.currentIndexChanged.connect(self.select_fitter)
+        self.gridLayout_3.addWidget(self.comboBox_fitter, 3, 0, 1, 1)
+
+        # 이미지 시퀀스 불러오기와 현재 프레임 선택
+        self.pushButton_sequence = QPushButton("시퀀스 불러오기", self.centralwidget)
+        self.pushButton_sequence.clicked.connect(self.load_sequence)
+        self.verticalLayout_2.addWidget(self.pushButton_sequence)
+
+        self.horizontalLayout_frame = QHBoxLayout()
+        self.horizontalLayout_frame.addWidget(QLabel("프레임", self.centralwidget))
+        self.spinBox_frame = QSpinBox(self.centralwidget)
+        self.spinBox_frame.setEnabled(False)
+        self.spinBox_frame.valueChanged.connect(self.select_frame)
+        self.horizontalLayout_frame.addWidget(self.spinBox_frame)
+        self.verticalLayout_2.addLayout(self.horizontalLayout_frame)
+
+        # 프레임 버퍼 풀: 시퀀스를 넘겨 보거나 처리할 때 같은 버퍼를 재사용하고 메모리 상한을 지킴
+        self.buffer_pool = BufferPool(MEMORY_LIMIT_MB)
+        self.horizontalLayout_memory = QHBoxLayout()
+        self.horizontalLayout_memory.addWidget(QLabel("버퍼 풀 메모리 상한 (MB)", self.centralwidget))
+        self.spinBox_memory = QSpinBox(self.centralwidget)
+        self.spinBox_memory.setRange(64, 1024 * 1024)
+        self.spinBox_memory.setSingleStep(256)
+        self.spinBox_memory.setValue(MEMORY_LIMIT_MB)
+        self.spinBox_memory.valueChanged.connect(self.set_memory_limit)
+        self.horizontalLayout_memory.addWidget(self.spinBox_memory)
+        self.verticalLayout_2.addLayout(self.horizontalLayout_memory)
+
+        # 이동 천체 자동 검출과 후보 목록
+        self.pushButton_moving = QPushButton("이동 천체 자동 검출", self.centralwidget)
+        self.pushButton_moving.clicked.connect(self.detect_moving_objects)
+        self.verticalLayout_4.addWidget(self.pushButton_moving)
+        self.comboBox_candidates = QComboBox(self.centralwidget)
+        self.comboBox_candidates.setEnabled(False)
+        self.comboBox_candidates.activated.connect(self.use_moving_candidate)
+        self.verticalLayout_4.addWidget(self.comboBox_candidates)
+
+        self._moving_finder = None
+        self._moving_paths = []
+        self._moving_candidates = []
+
+        self.frame_paths = []
+        self.current_frame_path = None
+        self._frame_generation = 0  # 프레임을 읽을 때마다 증가 (같은 버퍼에 읽으므로 측광 결과 비교 키로 사용)
+        self.ccd = ccd_parameters(None)  # 현재 프레임의 이득/읽기 잡음 (오차 계산용)
+        self._difference_imager = None
+        self._difference_key = None
+        # 세션 파일에서 불러온 기준 영상 (시퀀스 키, 영상, FWHM), 차분 측광을 할 때 사용
+        self._session_reference = None
+        # 측광 방식별 마지막 결과 {"psf"/"difference"/"aperture": (프레임/좌표 키, 등급)} (조리개 − PSF 차이 표시용)
+        self._last_magnitudes = {}
+
+        self.profile_plot = SimplePlotWidget(self.centralwidget, title="방사 프로파일", x_label="반경 (px)")
+        self.profile_plot.setVisible(False)
+        self.horizontalLayout_8.addWidget(self.profile_plot)
+
+        # 폴더 감시 실시간 측광과 광도 곡선
+        self.pushButton_watch = QPushButton("폴더 감시 (실시간 측광)", self.centralwidget)
+        self.pushButton_watch.setCheckable(True)
+        self.pushButton_watch.toggled.connect(self.toggle_watch)
+        self.verticalLayout_2.addWidget(self.pushButton_watch)
+
+        self.light_curve_plot = SimplePlotWidget(
+            self.centralwidget, title="광도 곡선", x_label="프레임", y_label="등급", invert_y=True
+        )
+        self.light_curve_plot.setVisible(False)
+        self.horizontalLayout_8.addWidget(self.light_curve_plot)
+
+        self._watcher = None
+        self._live_reducer = None
+        self._light_curve = []  # [(관측 시각 MJD 또는 None, 등급, 등급 오차)]
+        self._watch_timer = QTimer(self)
+        self._watch_timer.setInterval(WATCH_INTERVAL_MS)
+        self._watch_timer.timeout.connect(self.poll_watch_folder)
+
+        # 작업 세션 저장/불러오기
+        self.horizontalLayout_session = QHBoxLayout()
+        self.pushButton_save_session = QPushButton("세션 저장", self.centralwidget)
+        self.pushButton_save_session.clicked.connect(self.save_session)
+        self.horizontalLayout_session.addWidget(self.pushButton_save_session)
+        self.pushButton_open_session = QPushButton("세션 열기", self.centralwidget)
+        self.pushButton_open_session.clicked.connect(self.open_session)
+        self.horizontalLayout_session.addWidget(self.pushButton_open_session)
+        self.verticalLayout_2.addLayout(self.horizontalLayout_session)
+
+    def select_fitter(self, index):
+        try:
+            backends.set_backends(fitter=self.comboBox_fitter.itemData(index))
+        except ValueError as e:
+            self.textBrowser.append(f"[ERROR] {e}")
+            self.comboBox_fitter.blockSignals(True)
+            self.comboBox_fitter.setCurrentIndex(self.comboBox_fitter.findData(backends.get_backends()["fitter"]))
+            self.comboBox_fitter.blockSignals(False)
+            return
+        self.textBrowser.append(f"[INFO] 백엔드 설정: {backends.get_backends()}")
+
     def update_psf_fwhm(self, text):
         try:
             self.psf_fwhm = float(text)
@@ -129,12 +267,428 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             self.fwhm_value, self.threshold_value, self.sigma_clipping_value
         )
 
+    def toggle_inspect_mode(self, checked):
+        self.profile_plot.setVisible(checked)
+        if checked:
+            self.textBrowser.append("[INFO] 별 정보 보기 모드 진입")
+            self.graphicsView.set_inspect_mode(True, self.inspect_star)
+        else:
+            self.graphicsView.set_inspect_mode(False)
+            self.profile_plot.clear()
+            self.statusbar.clearMessage()
+
+    def inspect_star(self, info):
+        message = f"({info['x']}, {info['y']}) 픽셀 값: {info['pixel_value']:.1f}"
+        star = info['star']
+        if star is None:
+            self.statusbar.showMessage(message)
+            self.profile_plot.clear()
+            return
+
+        message += (
+            f" | 중심: ({star['x_centroid']:.2f}, {star['y_centroid']:.2f})"
+            f" | FWHM: {star['fwhm']:.2f}"
+            f" | 최대값: {star['peak'] + star['background']:.1f}"
+            f" | S/N: {star['snr']:.1f}"
+        )
+        self.statusbar.showMessage(message)
+        self.profile_plot.set_title(f"방사 프로파일 (FWHM {star['fwhm']:.2f})")
+        self.profile_plot.set_data(star['radii'], star['profile'], hline=star['peak'] / 2)
+
+    def load_sequence(self):
+        file_paths, _ = QFileDialog.getOpenFileNames(self, "Open FITS Sequence", "", "FITS Files (*.fits *.fit)")
+        if not file_paths:
+            return
+        self.frame_paths = sorted(file_paths)
+        self.textBrowser.append(f"[INFO] 시퀀스 불러오기: {len(self.frame_paths)}개 프레임")
+        self.spinBox_frame.blockSignals(True)
+        self.spinBox_frame.setRange(1, len(self.frame_paths))
+        self.spinBox_frame.setValue(1)
+        self.spinBox_frame.blockSignals(False)
+        self.spinBox_frame.setEnabled(True)
+        self.load_fits_to_graphicsview(self.frame_paths[0])
+
+    def set_memory_limit(self, value):
+        self.buffer_pool.set_limit(value)
+        self.textBrowser.append(
+            f"[INFO] 버퍼 풀 메모리 상한: {value} MB (사용 중 {self.buffer_pool.nbytes / 2**20:.1f} MB, "
+            f"검출·측광 중 임시 메모리는 포함하지 않음)"
+        )
+
+    def select_frame(self, number):
+        if 1 <= number <= len(self.frame_paths):
+            self.load_fits_to_graphicsview(self.frame_paths[number - 1])
+
+    def get_difference_imager(self):
+        """현재 시퀀스의 기준 영상을 가진 DifferenceImager (시퀀스가 바뀔 때만 새로 만듦)"""
+        from difference_imaging import DifferenceImager
+
+        key = tuple(self.frame_paths)
+        if self._difference_imager is None or self._difference_key != key:
+            imager = DifferenceImager()
+            if self._session_reference is not None and self._session_reference[0] == key:
+                self.textBrowser.append("[INFO] 세션에 저장된 기준 영상 사용")
+                imager.set_reference(*self._session_reference[1:])
+            else:
+                self.textBrowser.append("[INFO] 차분 영상용 기준 영상 생성 중...")
+                # 프레임은 하나씩 같은 버퍼에 읽고, 스택은 메모리 상한에 맞는 장수만 사용
+                # (스택이 float32이므로 프레임도 BITPIX에 맞는 형식으로 읽음)
+                imager.build_reference(
+                    self.frame_paths,
+                    load=lambda p: read_fits(p, self.buffer_pool, "reference_frame", dtype=None)[0],
+                    pool=self.buffer_pool,
+                )
+                self.buffer_pool.release("reference_frame")
+            self._difference_imager = imager
+            self._difference_key = key
+        return self._difference_imager
+
+    def detect_moving_objects(self):
+        """
+        시퀀스의 각 프레임에서 별을 검출하고 정지 천체를 제거한 뒤 이동 천체 후보를 찾습니다.
+        같은 시퀀스에 프레임이 추가된 경우 새 프레임만 처리합니다.
+        """
+        from detection import detect_sources_tiled
+        from moving_objects import MovingObjectFinder, header_time
+
+        if len(self.frame_paths) < 3:
+            self.textBrowser.append("[ERROR] 이동 천체 검출에는 3장 이상의 시퀀스가 필요합니다.")
+            return
+
+        n_done = len(self._moving_paths)
+        if self._moving_finder is None or self.frame_paths[:n_done] != self._moving_paths:
+            link_radius = max(self.fwhm_value / 2, 2.0)
+            self._moving_finder = MovingObjectFinder(match_radius=link_radius, link_radius=link_radius)
+            self._moving_paths = []
+
+        new_paths = self.frame_paths[len(self._moving_paths):]
+        self.textBrowser.append(f"[INFO] 이동 천체 검출: 새 프레임 {len(new_paths)}개 처리")
+        for path in new_paths:
+            try:
+                data, header = read_fits(path, self.buffer_pool, "sequence")
+            except (MemoryLimitError, ValueError, OSError) as e:
+                self.textBrowser.append(f"[ERROR] {e}")
+                break
+            obs_time = header_time(header)
+            background = rms = None
+            if self.checkBox_bkg_map.isChecked():
+                background, rms = get_background(data, sigma=self.sigma_clipping_value)
+            sources = detect_sources_tiled(
+                data, self.fwhm_value, self.threshold_value, self.sigma_clipping_value,
+                background=background, rms=rms,
+            )
+            sources = np.sort(sources, order="peak")[::-1]  # 밝은 별부터 (프레임 정렬에 사용)
+            try:
+                self._moving_finder.add_frame(np.column_stack([sources['x'], sources['y']]), time=obs_time)
+            except ValueError as e:
+                self.textBrowser.append(f"[ERROR] {os.path.basename(path)}: {e}")
+                break
+            self._moving_paths.append(path)
+        self.buffer_pool.release("sequence")
+
+        self._moving_candidates = self._moving_finder.candidates()
+        self.comboBox_candidates.clear()
+        for i, candidate in enumerate(self._moving_candidates):
+            self.comboBox_candidates.addItem(
+                f"후보 {i + 1}: {candidate['n']}회 검출, 속도 {candidate['speed']:.2f} px/시간단위"
+            )
+        self.update_candidate_combo()
+
+        self.textBrowser.append(f"[INFO] 이동 천체 후보 {len(self._moving_candidates)}개")
+        if self._moving_candidates:
+            self.use_moving_candidate(0)
+
+    def use_moving_candidate(self, index):
+        """선택한 이동 천체 후보의 현재 프레임 예측 위치를 측광 대상으로 지정"""
+        if not (0 <= index < len(self._moving_candidates)):
+            return
+        if self.current_frame_path not in self._moving_paths:
+            self.textBrowser.append("[ERROR] 현재 프레임은 이동 천체 검출에서 처리되지 않았습니다.")
+            return
+        frame_index = self._moving_paths.index(self.current_frame_path)
+        x, y = self._moving_finder.position_at(self._moving_candidates[index], frame_index)
+
+        self.graphicsView.clear_target_stars()
+        self.graphicsView.add_star_marker(x, y, "target", label=f"이동 천체 후보 {index + 1}")
+        self.target_coords(self.graphicsView.coords_target)
+        self.textBrowser.append(f"[INFO] 이동 천체 후보 {index + 1}을 측광 대상으로 지정: ({x:.1f}, {y:.1f})")
+
+    def update_candidate_combo(self):
+        """이동 천체 검출에서 처리한 프레임을 보고 있을 때만 후보 선택을 켬"""
+        self.comboBox_candidates.setEnabled(
+            bool(self._moving_candidates) and self.current_frame_path in self._moving_paths
+        )
+
+    def toggle_watch(self, checked):
+        if checked:
+            if not self.start_watch():
+                self.pushButton_watch.blockSignals(True)
+                self.pushButton_watch.setChecked(False)
+                self.pushButton_watch.blockSignals(False)
+        else:
+            self.stop_watch()
+
+    def start_watch(self, directory=None):
+        """
+        폴더 감시를 시작합니다. 현재 프레임의 측광 대상/비교성 좌표와 검출·측광 설정을
+        기준으로, 이후 폴더에 새로 쓰이는 프레임마다 백그라운드에서 측광하여 광도 곡선에 추가합니다.
+        """
+        from detection import detect_sources
+        from live_reduction import FolderWatcher, LiveReducer
+
+        data = self.graphicsView._image_data
+        target_coords = getattr(self, "_target_coords", [])
+        comp_coords = getattr(self, "_comp_coords", [])
+        if data is None or not target_coords or not comp_coords:
+            self.textBrowser.append("[ERROR] 기준 프레임을 열고 측광 대상과 비교성을 먼저 지정하세요.")
+            return False
+
+        if directory is None:
+            directory = QFileDialog.getExistingDirectory(self, "감시할 폴더 선택")
+            if not directory:
+                return False
+
+        background = rms = None
+        if self.checkBox_bkg_map.isChecked():
+            background, rms = get_background(data, sigma=self.sigma_clipping_value)
+        sources = detect_sources(
+            data, self.fwhm_value, self.threshold_value, self.sigma_clipping_value,
+            background=background, rms=rms,
+        )
+        sources = np.sort(sources, order="peak")[::-1]
+
+        mode = self.comboBox_mode.currentData()
+        setup = {
+            'target_coords': list(target_coords),
+            'comp_coords': list(comp_coords),
+            'comp_mag': self.comp_mag,
+            'reference_xy': np.column_stack([sources['x'], sources['y']]),
+            'detection_fwhm': self.fwhm_value,
+            'threshold': self.threshold_value,
+            'sigma_clip': self.sigma_clipping_value,
+            'psf_fwhm': self.psf_fwhm,
+            'method': "aperture" if mode == "aperture" else "psf",
+            'backends': backends.get_backends(),
+            'use_background_map': self.checkBox_bkg_map.isChecked(),
+            'memory_limit_mb': self.spinBox_memory.value(),
+        }
+
+        self._watcher = FolderWatcher(directory)
+        self._live_reducer = LiveReducer(setup)
+        self._light_curve = []
+        self.light_curve_plot.clear()
+        self.light_curve_plot.setVisible(True)
+        self._watch_timer.start()
+        self.textBrowser.append(f"[INFO] 폴더 감시 시작: {directory} (기준 별 {len(sources)}개)")
+        return True
+
+    def stop_watch(self):
+        self._watch_timer.stop()
+        if self._live_reducer is not None:
+            self._live_reducer.shutdown()
+            self._live_reducer = None
+            self.textBrowser.append(f"[INFO] 폴더 감시 종료: {len(self._light_curve)}개 프레임 측광")
+        self._watcher = None
+
+    def poll_watch_folder(self):
+        """새 프레임을 작업 풀에 보내고, 끝난 결과를 광도 곡선에 추가"""
+        if self._watcher is None or self._live_reducer is None:
+            return
+        for path in self._watcher.poll():
+            self._live_reducer.submit(path)
+
+        updated = False
+        for path, result, error in self._live_reducer.collect():
+            name = os.path.basename(path)
+            if error is not None:
+                self.textBrowser.append(f"[ERROR] {name} 측광 실패: {error}")
+                continue
+            # 파일이 다 쓰인 시각(노출 종료 직후)부터 결과가 나오기까지의 지연
+            try:
+                latency = time.time() - os.path.getmtime(path)
+            except OSError:
+                latency = float("nan")
+            if not np.isfinite(result['mag']):
+                self.textBrowser.append(f"[ERROR] {name}: 측광 대상 또는 비교성의 플럭스가 0 이하입니다.")
+                continue
+            self.textBrowser.append(
+                f"[INFO] {name}: 등급 {result['mag']:.3f} ± {result['mag_err']:.3f}, "
+                f"이동 ({result['offset'][0]:.1f}, {result['offset'][1]:.1f}) px, 처리 {result['elapsed']:.2f} s, 지연 {latency:.1f} s"
+            )
+            self._light_curve.append((result['time'], result['mag'], result['mag_err']))
+            updated = True
+
+        if updated:
+            self.update_light_curve()
+
+    def update_light_curve(self):
+        times = [t for t, _, _ in self._light_curve]
+        mags = np.array([m for _, m, _ in self._light_curve])
+        errors = np.array([e for _, _, e in self._light_curve])
+        if all(t is not None for t in times):
+            # 관측 시각이 모두 있으면 첫 프레임 기준 경과 시간(분)
+            x = (np.array(times) - times[0]) * 24 * 60
+            self.light_curve_plot.set_labels(x_label="경과 시간 (분)")
+        else:
+            x = np.arange(1, len(mags) + 1)
+            self.light_curve_plot.set_labels(x_label="프레임")
+        self.light_curve_plot.set_title(f"광도 곡선 ({len(mags)}개, 최근 {mags[-1]:.3f})")
+        self.light_curve_plot.set_data(x, mags, yerr=errors)
+
+    def session_state(self):
+        """현재 프레임 목록, 선택, 설정, 광도 곡선과 차분 기준 영상을 세션 dict로 모음"""
+        key = tuple(self.frame_paths)
+        reference = reference_fwhm = None
+        if self._difference_imager is not None and self._difference_key == key:
+            reference = self._difference_imager.reference
+            reference_fwhm = self._difference_imager.reference_fwhm
+        elif self._session_reference is not None and self._session_reference[0] == key:
+            reference, reference_fwhm = self._session_reference[1:]
+
+        return {
+            'frame_paths': self.frame_paths,
+            'current_frame_path': self.current_frame_path,
+            'target_coords': getattr(self, "_target_coords", []),
+            'comp_coords': getattr(self, "_comp_coords", []),
+            'params': {
+                'detection_fwhm': self.fwhm_value,
+                'threshold': self.threshold_value,
+                'sigma_clip': self.sigma_clipping_value,
+                'psf_fwhm': self.lineEdit.text(),
+                'comp_mag': self.lineEdit_3.text(),
+                'mode': self.comboBox_mode.currentData(),
+                'use_background_map': self.checkBox_bkg_map.isChecked(),
+                'memory_limit_mb': self.spinBox_memory.value(),
+                'backends': backends.get_backends(),
+            },
+            'light_curve': self._light_curve,
+            'reference': reference,
+            'reference_fwhm': None if reference_fwhm is None else float(reference_fwhm),
+        }
+
+    def release_reference_mapping(self):
+        """
+        세션에서 불러온 기준 영상(메모리 맵)을 메모리로 옮겨 파일 매핑을 놓습니다.
+        Windows에서는 매핑된 파일을 덮어쓸 수 없으므로 세션을 저장하기 전에 호출합니다.
+        """
+        if self._session_reference is not None:
+            key, reference, reference_fwhm = self._session_reference
+            self._session_reference = (key, in_memory(reference), reference_fwhm)
+        if self._difference_imager is not None:
+            self._difference_imager.reference = in_memory(self._difference_imager.reference)
+
+    def save_session(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Save Session", "", f"AstroPSF Session (*{SESSION_SUFFIX})"
+        )
+        if not path:
+            return
+        if not path.endswith(SESSION_SUFFIX):
+            path += SESSION_SUFFIX
+        self.release_reference_mapping()
+        try:
+            save_session(path, self.session_state())
+        except (OSError, ValueError) as e:
+            self.textBrowser.append(f"[ERROR] 세션 저장 실패: {e}")
+            return
+        self.textBrowser.append(f"[INFO] 세션 저장: {path}")
+
+    def open_session(self, path=None):
+        """
+        세션 파일을 불러와 설정, 프레임 목록, 선택과 광도 곡선을 복원합니다.
+        현재 프레임 하나만 다시 읽고, 측광/기준 영상은 다시 계산하지 않습니다.
+        """
+        if not path:
+            path, _ = QFileDialog.getOpenFileName(
+                self, "Open Session", "", f"AstroPSF Session (*{SESSION_SUFFIX})"
+            )
+            if not path:
+                return
+        try:
+            state = load_session(path)
+        except (OSError, ValueError, KeyError) as e:
+            self.textBrowser.append(f"[ERROR] 세션 열기 실패: {e}")
+            return
+
+        self.stop_watch()
+        params = state['params']
+        self.doubleSpinBox.setValue(params.get('detection_fwhm', self.fwhm_value))
+        self.doubleSpinBox_2.setValue(params.get('threshold', self.threshold_value))
+        self.doubleSpinBox_3.setValue(params.get('sigma_clip', self.sigma_clipping_value))
+        self.lineEdit.setText(params.get('psf_fwhm', self.lineEdit.text()))
+        self.lineEdit_3.setText(params.get('comp_mag', self.lineEdit_3.text()))
+        self.checkBox_bkg_map.setChecked(params.get('use_background_map', True))
+        self.spinBox_memory.setValue(params.get('memory_limit_mb', self.spinBox_memory.value()))
+        mode_index = self.comboBox_mode.findData(params.get('mode'))
+        if mode_index >= 0:
+            self.comboBox_mode.setCurrentIndex(mode_index)
+        try:
+            backends.set_backends(**params.get('backends', {}))
+        except ValueError as e:
+            self.textBrowser.append(f"[ERROR] 세션의 백엔드 설정 오류, 현재 설정 유지: {e}")
+        self.comboBox_fitter.blockSignals(True)
+        self.comboBox_fitter.setCurrentIndex(self.comboBox_fitter.findData(backends.get_backends()["fitter"]))
+        self.comboBox_fitter.blockSignals(False)
+
+        self.frame_paths = state['frame_paths']
+        self._moving_finder = None  # 이동 천체 검출은 필요할 때 다시 계산
+        self._moving_paths = []
+        self._moving_candidates = []
+        self.comboBox_candidates.clear()
+        self.comboBox_candidates.setEnabled(False)
+        self._difference_imager = None
+        self._difference_key = None
+        self._session_reference = None
+        if state['reference'] is not None:
+            self._session_reference = (tuple(self.frame_paths), state['reference'], state['reference_fwhm'])
+
+        current = state['current_frame_path']
+        self.spinBox_frame.blockSignals(True)
+        self.spinBox_frame.setRange(1, max(len(self.frame_paths), 1))
+        if current in self.frame_paths:
+            self.spinBox_frame.setValue(self.frame_paths.index(current) + 1)
+        self.spinBox_frame.blockSignals(False)
+        self.spinBox_frame.setEnabled(bool(self.frame_paths))
+        if current and os.path.exists(current):
+            self.load_fits_to_graphicsview(current)
+        elif current:
+            self.textBrowser.append(f"[ERROR] 현재 프레임 파일이 없습니다: {current}")
+
+        self.graphicsView.clear_target_stars()
+        self.graphicsView.clear_comp_stars()
+        for x, y in state['target_coords']:
+            self.graphicsView.add_star_marker(x, y, "target")
+        for x, y in state['comp_coords']:
+            self.graphicsView.add_star_marker(x, y, "comp")
+        self.target_coords(self.graphicsView.coords_target)
+        self.comp_coords(self.graphicsView.coords_comp)
+
+        self._light_curve = state['light_curve']
+        self.light_curve_plot.clear()
+        self.light_curve_plot.setVisible(bool(self._light_curve))
+        if self._light_curve:
+            self.update_light_curve()
+
+        self.textBrowser.append(
+            f"[INFO] 세션 열기: 프레임 {len(self.frame_paths)}개, 측광 대상 {len(state['target_coords'])}개, "
+            f"비교성 {len(state['comp_coords'])}개, 광도 곡선 {len(self._light_curve)}점"
+        )
+        if state['missing_frames']:
+            self.textBrowser.append(f"[ERROR] 세션의 프레임 중 {state['missing_frames']}개 파일이 없습니다.")
+
     def load_fits_to_graphicsview(self, path):
-        data = fits.getdata(path)
-        data = np.nan_to_num(data)
-        vmin, vmax = np.percentile(data, [5, 99])
-        clipped = np.clip(data, vmin, vmax)
-        normed = ((clipped - vmin) / (vmax - vmin) * 255).astype(np.uint8)
+        # 프레임마다 새 배열을 만들지 않고 버퍼 풀에 읽어 제자리에서 스트레치
+        try:
+            data, header = read_fits(path, self.buffer_pool)
+            normed = stretch_to_uint8(data, self.buffer_pool)
+        except (MemoryLimitError, ValueError, OSError) as e:
+            # 상한 초과, 이미지 데이터가 없는 FITS, 읽을 수 없는 파일
+            self.textBrowser.append(f"[ERROR] {e}")
+            return
+        self.current_frame_path = path
+        self._frame_generation += 1
+        self.ccd = ccd_parameters(header)
+        self.update_candidate_combo()
 
         height, width = normed.shape
         qimage = QImage(normed.data, width, height, width, QImage.Format_Grayscale8)
@@ -212,151 +766,108 @@ class MainWindow(QMainWindow, Ui_MainWindow):
             if not comp_coords:
                 self.textBrowser.append("[ERROR] 비교성 좌표가 없습니다.")
                 return
-            
-            # 예: 이미지와 별 좌표가 주어졌을 때
-            # 첫 번째 타겟 좌표를 사용
-            x0, y0 = target_coords[0]
-            fwhm_result = self.estimate_fwhm_1d_profile(data, x0=x0, y0=y0, size=31)
 
-            self.textBrowser.append(f"측광 대상 FWHM_x: {fwhm_result['fwhm_x']:.2f}")
-            self.textBrowser.append(f"측광 대상 FWHM_y: {fwhm_result['fwhm_y']:.2f}")
+            background = None
+            if self.checkBox_bkg_map.isChecked():
+                background, _ = get_background(data, sigma=self.sigma_clipping_value)
 
-            x1, y1 = comp_coords[0]
-            fwhm_comp_result = self.estimate_fwhm_1d_profile(data, x0=x1, y0=y1, size=31)
+            key = (self.current_frame_path, self._frame_generation, tuple(target_coords), tuple(comp_coords))
+            if self.comboBox_mode.currentData() == "aperture":
+                self.quick_look_photometry(data, target_coords, comp_coords, background, key)
+                return
 
-            self.textBrowser.append(f"비교성 FWHM_x: {fwhm_comp_result['fwhm_x']:.2f}")
-            self.textBrowser.append(f"비교성 FWHM_y: {fwhm_comp_result['fwhm_y']:.2f}")
-            
-            fwhm_values = [
-                fwhm_result['fwhm_x'],
-                fwhm_result['fwhm_y'],
-                fwhm_comp_result['fwhm_x'],
-                fwhm_comp_result['fwhm_y']
-            ]
-            fwhm = np.nanmean(fwhm_values)
-
-            self.lineEdit.setText(f"{fwhm:.3f}")
-
-            psf_model = CircularGaussianPRF(fwhm=fwhm)
-            psf_model.fwhm.fixed = True
-
-
-            def ensure_odd(n):
-                return int(n) if int(n) % 2 == 1 else int(n) + 1
-
-            inner_radius = int(round(fwhm * 2))
-            outer_radius = int(round(fwhm * 4))
-            fit_size = ensure_odd(round(fwhm * 6))
-            fit_shape = (fit_size, fit_size)
-
-            # 지역 배경 추정 설정
-            bkg_est = LocalBackground(
-                inner_radius=inner_radius,
-                outer_radius=outer_radius,
-                bkg_estimator=MMMBackground()
+            difference_imager = None
+            if self.comboBox_mode.currentData() == "difference":
+                if len(self.frame_paths) < 3:
+                    self.textBrowser.append("[ERROR] 차분 영상 측광에는 3장 이상의 시퀀스가 필요합니다.")
+                    return
+                difference_imager = self.get_difference_imager()
+
+            # 중심 보정 → 첫 번째 측광 대상/비교성으로 FWHM 추정 → PSF 측광
+            result = run_psf_photometry(
+                data, target_coords, comp_coords, self.comp_mag,
+                detection_fwhm=self.fwhm_value,
+                difference_imager=difference_imager,
+                background=background,
+                ccd=self.ccd,
             )
 
-            # 각각 Table로 변환
-            target_positions = Table(rows=target_coords, names=["x_0", "y_0"])
-            comp_positions = Table(rows=comp_coords, names=["x_0", "y_0"])
-            
-            # PSF 측광 객체 생성
-            phot = PSFPhotometry(
-                psf_model=psf_model,
-                fit_shape=fit_shape,
-                finder=None,
-                fitter=TRFLSQFitter(),
-                localbkg_estimator=bkg_est,
-                aperture_radius=fwhm * 2,
-                progress_bar=False,
+            ok, shift = result['refined'], result['shift']
+            self.textBrowser.append(
+                f"[INFO] 중심 보정: {ok.sum()}/{len(ok)}개 성공, 평균 이동 {shift.mean():.2f} px"
             )
-            
-            # PSF 측광 수행
-            target_result = phot(data, init_params=target_positions)
-            comp_result = phot(data, init_params=comp_positions)
-
-            # print("[INFO] 측광 대상 결과:")
-            # print(target_result["id", "x_fit", "y_fit", "flux_fit"])
-
-            # print("[INFO] 비교성 결과:")
-            # print(comp_result["id", "x_fit", "y_fit", "flux_fit"])
-
-            # 겉보기 등급 계산 예시 (비교성의 등급이 comp_mag라면)
-            # m_target = m_comp - 2.5 * log10(flux_target / flux_comp)
-            # 아래는 첫 번째 별만 예시로 계산
-            if len(target_result) > 0 and len(comp_result) > 0:
-                flux_target = target_result["flux_fit"][0]
-                flux_comp = comp_result["flux_fit"][0]
-                comp_mag = self.comp_mag
-                m_target = comp_mag - 2.5 * np.log10(flux_target / flux_comp)
+
+            fwhm_result, fwhm_comp_result = result['fwhm_target'], result['fwhm_comp']
+            self.textBrowser.append(f"측광 대상 FWHM_x: {fwhm_result['fwhm_x']:.2f}")
+            self.textBrowser.append(f"측광 대상 FWHM_y: {fwhm_result['fwhm_y']:.2f}")
+            self.textBrowser.append(f"비교성 FWHM_x: {fwhm_comp_result['fwhm_x']:.2f}")
+            self.textBrowser.append(f"비교성 FWHM_y: {fwhm_comp_result['fwhm_y']:.2f}")
+
+            self.lineEdit.setText(f"{result['fwhm']:.3f}")
+
+            if result['difference'] is not None:
+                info = result['difference']
+                self.textBrowser.append(
+                    f"[INFO] 차분 영상: 이동 ({info['shift'][0]:.2f}, {info['shift'][1]:.2f}) px, "
+                    f"밝기 비율 {info['scale']:.3f}, FWHM {info['fwhm']:.2f}"
+                )
+
+            # 겉보기 등급 (첫 번째 측광 대상과 첫 번째 비교성 기준)
+            m_target = result['mag']
+            if np.isfinite(m_target):
                 self.lineEdit_4.setText(f"{m_target:.3f}")
-                self.textBrowser.append(f"[INFO] 측광 대상의 겉보기 등급: {m_target:.3f}")
+                self.textBrowser.append(
+                    f"[INFO] 측광 대상의 겉보기 등급: {m_target:.3f} ± {result['mag_err']:.3f} "
+                    f"(S/N {result['snr']:.1f}{self.ccd_note()})"
+                )
+                # 차분 영상 결과는 조리개 − PSF 비교에 쓰지 않도록 따로 기록
+                self.record_magnitude(self.comboBox_mode.currentData(), key, m_target)
 
         except Exception as e:
             self.textBrowser.append(f"[ERROR] PSF photometry 실패: {e}")
-    
-
-    def gaussian_1d(self, x, amplitude, mean, sigma, offset):
-        return amplitude * np.exp(-(x - mean)**2 / (2 * sigma**2)) + offset
 
-
-    def estimate_fwhm_1d_profile(self, image, x0, y0, size=21):
-        """
-        중심 좌표 (x0, y0) 기준으로 1D 밝기 프로파일 절단법으로 FWHM 추정
-
-        Parameters:
-            image : 2D numpy array
-                별이 있는 이미지
-            x0, y0 : float
-                별 중심의 좌표
-            size : int
-                자를 패치 크기 (홀수 추천)
-
-        Returns:
-            dict : {
-                'fwhm_x', 'fwhm_y', 'sigma_x', 'sigma_y', 'success_x', 'success_y'
-            }
-        """
-        half = size // 2
-        h, w = image.shape
-        x0, y0 = int(round(x0)), int(round(y0))
-
-        if x0 - half < 0 or y0 - half < 0 or x0 + half >= w or y0 + half >= h:
-            raise ValueError("Patch 영역이 이미지 밖으로 나갑니다.")
-
-        patch = image[y0 - half:y0 + half + 1, x0 - half:x0 + half + 1]
-
-        # X, Y 프로파일 추출
-        profile_x = patch[half, :]  # y 방향 중앙 라인
-        profile_y = patch[:, half]  # x 방향 중앙 라인
-        x = np.arange(size)
-
-        result = {}
-
-        for direction, profile in zip(['x', 'y'], [profile_x, profile_y]):
-            amp_guess = profile.max() - profile.min()
-            offset_guess = profile.min()
-            p0 = [amp_guess, size // 2, 3.0, offset_guess]
-
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                try:
-                    popt, _ = curve_fit(self.gaussian_1d, x, profile, p0=p0)
-                    sigma = abs(popt[2])
-                    fwhm = 2.3548 * sigma
-                    result[f'fwhm_{direction}'] = fwhm
-                    result[f'sigma_{direction}'] = sigma
-                    result[f'success_{direction}'] = True
-                except Exception:
-                    result[f'fwhm_{direction}'] = np.nan
-                    result[f'sigma_{direction}'] = np.nan
-                    result[f'success_{direction}'] = False
-
-        return result
+    def quick_look_photometry(self, data, target_coords, comp_coords, background, key):
+        """원형 조리개로 측광 대상과 비교성을 한 번에 측광하여 등급만 빠르게 표시"""
+        result = run_aperture_photometry(
+            data, target_coords, comp_coords, self.comp_mag, self.psf_fwhm,
+            detection_fwhm=self.fwhm_value,
+            background=background,
+            ccd=self.ccd,
+        )
+        m_target = result['mag']
+        if not np.isfinite(m_target):
+            self.textBrowser.append("[ERROR] 조리개 측광 실패: 측광 대상 또는 비교성의 플럭스가 0 이하입니다.")
+            return
+        self.lineEdit_4.setText(f"{m_target:.3f}")
+        self.textBrowser.append(
+            f"[INFO] 조리개 측광 (반지름 {result['fwhm'] * 2:.1f} px) 겉보기 등급: "
+            f"{m_target:.3f} ± {result['mag_err']:.3f} (S/N {result['snr']:.1f}{self.ccd_note()})"
+        )
+        self.record_magnitude("aperture", key, m_target)
+
+    def ccd_note(self):
+        """오차 계산에 쓴 이득/읽기 잡음 설명 (헤더에 없으면 알림)"""
+        if not self.ccd['from_header']:
+            return ", 헤더에 GAIN 없음: 이득 1 가정"
+        return f", 이득 {self.ccd['gain']:g} e-/ADU, 읽기 잡음 {self.ccd['read_noise']:g} e-"
+
+    def record_magnitude(self, method, key, mag):
+        """측광 결과를 기억하고, 같은 프레임/좌표의 다른 방식 결과가 있으면 등급 차이를 표시"""
+        self._last_magnitudes[method] = (key, mag)
+        aperture = self._last_magnitudes.get("aperture")
+        psf = self._last_magnitudes.get("psf")
+        if aperture and psf and aperture[0] == psf[0] == key:
+            self.textBrowser.append(f"[INFO] 조리개 − PSF 등급 차이: {aperture[1] - psf[1]:+.3f}")
         
 
 if __name__ == "__main__":
+    # 병렬 검출 작업 프로세스가 실행 파일로 배포된 환경(Windows)에서도 동작하도록
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(shutdown_executor)
     window = MainWindow()
+    app.aboutToQuit.connect(window.stop_watch)
     window.show()
+    # 창이 먼저 뜨도록 이벤트 루프 진입 후 무거운 모듈을 백그라운드에서 미리 불러옴
+    QTimer.singleShot(0, preload_heavy_modules)
     app.exec()
@@ -0,0 +1,165 @@
+# backends.py
+"""
+검출/측광 단계별 구현(백엔드) 등록부.
+
+단계마다 이름 → 생성 함수를 등록해 두고, 설정(이름)만 바꿔서 구현을 교체합니다.
+    finder     : 별 검출기 (IRAFStarFinder, DAOStarFinder)
+    fitter     : PSF 피팅 최적화기 (TRFLSQFitter, LMLSQFitter, ..., 배치 가우시안)
+    psf_model  : PSF 모델 (CircularGaussianPRF, CircularGaussianPSF, MoffatPSF)
+    background : 별 주변 고리의 지역 배경 추정기 (MMMBackground, MedianBackground, ...)
+
+현재 설정은 프로그램 폴더의 backends.json(있으면)에서 읽고, 작업 프로세스에는
+get_backends()로 얻은 dict를 그대로 넘겨 같은 구현을 쓰게 합니다.
+무거운 모듈은 생성 함수 안에서만 import 합니다.
+"""
+
+import json
+import os
+
+STAGES = ("finder", "fitter", "psf_model", "background")
+
+DEFAULT_BACKENDS = {
+    "finder": "iraf",
+    "fitter": "trf",
+    "psf_model": "gaussian_prf",
+    "background": "mmm",
+}
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backends.json")
+
+# 모팻 PSF의 beta (대기 요동 PSF의 일반적인 값으로 고정)
+MOFFAT_BETA = 2.5
+
+_registry = {stage: {} for stage in STAGES}  # stage -> {name: (factory, description)}
+_active = dict(DEFAULT_BACKENDS)
+
+
+def register(stage, name, factory, description=""):
+    """단계 stage에 name으로 구현을 등록합니다. (같은 이름이면 교체)"""
+    if stage not in _registry:
+        raise ValueError(f"알 수 없는 단계: {stage}")
+    _registry[stage][name] = (factory, description)
+
+
+def available(stage):
+    """stage에 등록된 (이름, 설명) 목록"""
+    return [(name, description) for name, (_, description) in _registry[stage].items()]
+
+
+def create(stage, name, *args, **kwargs):
+    """등록된 생성 함수로 구현 객체를 만듭니다."""
+    try:
+        factory, _ = _registry[stage][name]
+    except KeyError:
+        raise ValueError(f"{stage} 단계에 '{name}' 구현이 없습니다.") from None
+    return factory(*args, **kwargs)
+
+
+def resolve(choices=None):
+    """현재 설정에 choices(일부 단계만 지정 가능)를 덮어쓴 전체 설정을 검사하여 반환"""
+    backends = dict(_active)
+    for stage, name in (choices or {}).items():
+        if stage not in _registry:
+            raise ValueError(f"알 수 없는 단계: {stage}")
+        if name not in _registry[stage]:
+            raise ValueError(f"{stage} 단계에 '{name}' 구현이 없습니다.")
+        backends[stage] = name
+    if backends["fitter"] == "batch" and backends["psf_model"] != "gaussian_prf":
+        raise ValueError("배치 가우시안 피팅은 gaussian_prf 모델만 지원합니다.")
+    return backends
+
+
+def get_backends():
+    return dict(_active)
+
+
+def set_backends(**choices):
+    """현재 설정의 일부 단계를 바꿉니다."""
+    _active.update(resolve(choices))
+    return get_backends()
+
+
+def load_config(path=CONFIG_FILE):
+    """
+    JSON 설정 파일({"finder": "dao", "fitter": "lm", ...})을 읽어 현재 설정에 반영합니다.
+    파일이 없으면 아무것도 바꾸지 않습니다.
+    """
+    if not os.path.exists(path):
+        return get_backends()
+    with open(path, encoding="utf-8") as f:
+        choices = json.load(f)
+    if not isinstance(choices, dict):
+        raise ValueError("백엔드 설정 파일은 JSON 객체여야 합니다.")
+    return set_backends(**choices)
+
+
+# ------------------------------------------------
+# 기본 구현
+# ------------------------------------------------
+
+
+def _iraf_finder(threshold, fwhm):
+    from photutils.detection import IRAFStarFinder
+    # IRAFStarFinder는 PSF의 sigma(표준편차) 단위로 입력받음 (fwhm = 2.3548 * sigma)
+    return IRAFStarFinder(threshold=threshold, fwhm=fwhm, sigma_radius=fwhm / 2.3548)
+
+
+def _dao_finder(threshold, fwhm):
+    from photutils.detection import DAOStarFinder
+    return DAOStarFinder(threshold=threshold, fwhm=fwhm)
+
+
+def _fitter(name):
+    def factory():
+        from astropy.modeling import fitting
+        return getattr(fitting, name)()
+    return factory
+
+
+def _gaussian_prf(fwhm):
+    from photutils.psf import CircularGaussianPRF
+    model = CircularGaussianPRF(fwhm=fwhm)
+    model.fwhm.fixed = True
+    return model
+
+
+def _gaussian_psf(fwhm):
+    from photutils.psf import CircularGaussianPSF
+    model = CircularGaussianPSF(fwhm=fwhm)
+    model.fwhm.fixed = True
+    return model
+
+
+def _moffat(fwhm):
+    from photutils.psf import MoffatPSF
+    alpha = fwhm / (2 * (2 ** (1 / MOFFAT_BETA) - 1) ** 0.5)
+    model = MoffatPSF(alpha=alpha, beta=MOFFAT_BETA)
+    model.alpha.fixed = True
+    model.beta.fixed = True
+    return model
+
+
+def _background(name):
+    def factory():
+        from photutils import background
+        return getattr(background, name)()
+    return factory
+
+
+register("finder", "iraf", _iraf_finder, "IRAFStarFinder")
+register("finder", "dao", _dao_finder, "DAOStarFinder")
+
+register("fitter", "trf", _fitter("TRFLSQFitter"), "TRFLSQFitter")
+register("fitter", "lm", _fitter("LMLSQFitter"), "LMLSQFitter")
+register("fitter", "dogbox", _fitter("DogBoxLSQFitter"), "DogBoxLSQFitter")
+# 배치 가우시안 피팅은 PSFPhotometry를 거치지 않음 (photometry.fit_stars 참고)
+register("fitter", "batch", lambda: None, "배치 가우시안 (Numba)")
+
+register("psf_model", "gaussian_prf", _gaussian_prf, "CircularGaussianPRF")
+register("psf_model", "gaussian_psf", _gaussian_psf, "CircularGaussianPSF")
+register("psf_model", "moffat", _moffat, f"MoffatPSF (beta={MOFFAT_BETA})")
+
+register("background", "mmm", _background("MMMBackground"), "MMMBackground")
+register("background", "median", _background("MedianBackground"), "MedianBackground")
+register("background", "sextractor", _background("SExtractorBackground"), "SExtractorBackground")
+register("background", "biweight", _background("BiweightLocationBackground"), "BiweightLocationBackground")
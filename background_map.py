@@ -0,0 +1,75 @@
+# background_map.py
+"""
+프레임당 한 번 계산하는 2D 배경/잡음(RMS) 지도.
+
+거친 격자(box_size) 단위로 sigma-clipping 배경을 구해 보간한 지도를 만들고,
+같은 프레임에 대해서는 캐시된 결과를 재사용합니다.
+별 검출(선택 영역마다 sigma_clipped_stats)과 PSF 측광(별마다 배경 고리 통계)이
+같은 배경/임계값을 쓰도록 두 단계가 함께 사용합니다.
+"""
+
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_BOX_SIZE = 64
+DEFAULT_FILTER_SIZE = 3
+# 캐시할 프레임 수 (프레임마다 이미지 두 장 크기의 메모리 사용)
+CACHE_SIZE = 4
+
+_cache = OrderedDict()  # id(data) -> (weakref(data), key, (background, rms))
+
+
+def compute_background(data, box_size=DEFAULT_BOX_SIZE, filter_size=DEFAULT_FILTER_SIZE, sigma=3.0):
+    """
+    photutils Background2D로 배경 지도와 RMS 지도를 계산합니다.
+
+    Returns:
+        (background, rms) : data와 같은 크기의 2D 배열
+    """
+    from astropy.stats import SigmaClip
+    from photutils.background import Background2D, MedianBackground
+
+    h, w = data.shape
+    # 이미지가 격자보다 작으면 격자를 줄임
+    box = (max(min(box_size, h // 2), 1), max(min(box_size, w // 2), 1))
+    bkg = Background2D(
+        data, box,
+        filter_size=(filter_size, filter_size),
+        sigma_clip=SigmaClip(sigma=sigma),
+        bkg_estimator=MedianBackground(),
+    )
+    rms = np.asarray(bkg.background_rms, dtype=np.float64)
+    # 잡음이 0인 격자(포화/결측 영역)로 나누지 않도록 최소값 보정
+    positive = rms[rms > 0]
+    floor = positive.min() if positive.size else 1.0
+    return np.asarray(bkg.background, dtype=np.float64), np.maximum(rms, floor)
+
+
+def get_background(data, box_size=DEFAULT_BOX_SIZE, filter_size=DEFAULT_FILTER_SIZE, sigma=3.0):
+    """
+    compute_background()의 캐시 버전. 같은 배열(같은 프레임)과 같은 설정이면 다시 계산하지 않습니다.
+    배열 객체가 사라지면 캐시 항목도 무효가 됩니다.
+    """
+    key = (data.shape, box_size, filter_size, sigma)
+    entry = _cache.get(id(data))
+    if entry is not None:
+        ref, cached_key, maps = entry
+        if ref() is data and cached_key == key:
+            _cache.move_to_end(id(data))
+            return maps
+
+    # 이미 사라진 프레임(버퍼 풀에서 다음 프레임으로 덮어쓴 배열 등)의 지도는 바로 놓음
+    for stale in [k for k, (ref, _, _) in _cache.items() if ref() is None]:
+        del _cache[stale]
+    maps = compute_background(data, box_size, filter_size, sigma)
+    _cache[id(data)] = (weakref.ref(data), key, maps)
+    _cache.move_to_end(id(data))
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return maps
+
+
+def clear_cache():
+    _cache.clear()
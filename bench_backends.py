@@ -0,0 +1,204 @@
+# bench_backends.py
+"""
+검출/측광 백엔드 조합 비교 벤치마크.
+
+backends에 등록된 모든 조합(finder × fitter × psf_model × background)으로 같은 프레임들을
+처리하여 프레임당 검출/피팅 시간과 측광 정밀도(밝은 별들의 차등 등급 산포)를 비교합니다.
+산포는 프레임마다 별 전체의 중앙값 등급을 빼서(앙상블 보정) 남은 값의 별별 표준편차 중앙값입니다.
+가장 정밀한 조합의 산포에서 --tolerance 배 이내인 조합 중 가장 빠른 것을 추천합니다.
+
+사용 예:
+    python bench_backends.py                              # 합성 시퀀스
+    python bench_backends.py --frames night1/*.fits --fwhm 4.5
+    python bench_backends.py --finder iraf --fitter trf,lm,batch
+"""
+
+import argparse
+import itertools
+import statistics
+import sys
+import time
+import warnings
+
+import numpy as np
+
+import backends
+
+
+def make_sequence(n_frames, n_stars, shape=(512, 512), fwhm=3.5, sky=100.0, noise=5.0,
+                  max_shift=3.0, seed=0):
+    """같은 별들을 프레임마다 조금씩 이동시키고 잡음만 다르게 한 합성 시퀀스"""
+    from astropy.table import Table
+    from photutils.datasets import make_model_image
+    from photutils.psf import CircularGaussianPRF
+
+    rng = np.random.default_rng(seed)
+    border = int(fwhm * 6 + max_shift)
+    x = rng.uniform(border, shape[1] - border, n_stars)
+    y = rng.uniform(border, shape[0] - border, n_stars)
+    flux = 10 ** rng.uniform(3.3, 5, n_stars)
+    size = int(fwhm * 8) | 1
+
+    frames = []
+    for _ in range(n_frames):
+        dx, dy = rng.uniform(-max_shift, max_shift, 2)
+        params = Table({"x_0": x + dx, "y_0": y + dy, "flux": flux, "fwhm": np.full(n_stars, fwhm)})
+        image = make_model_image(shape, CircularGaussianPRF(), params, model_shape=(size, size))
+        frames.append(image + sky + rng.normal(0, noise, shape))
+    return frames
+
+
+def load_frames(paths):
+    from astropy.io import fits
+    return [np.nan_to_num(np.asarray(fits.getdata(p), dtype=np.float64)) for p in paths]
+
+
+def select_stars(sources, shape, n_stars, min_separation, border):
+    """밝은 순으로, 가장자리에서 떨어지고 서로 겹치지 않는 별 n_stars개 선택"""
+    chosen = []
+    h, w = shape
+    for x, y in zip(sources["x"], sources["y"]):
+        if not (border <= x < w - border and border <= y < h - border):
+            continue
+        if all(np.hypot(x - cx, y - cy) >= min_separation for cx, cy in chosen):
+            chosen.append((x, y))
+        if len(chosen) == n_stars:
+            break
+    return np.array(chosen).reshape(-1, 2)
+
+
+def differential_scatter(flux):
+    """(프레임, 별) 플럭스 → 앙상블 보정 후 별별 등급 표준편차의 중앙값 (mag)"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mag = -2.5 * np.log10(flux)
+    mag[~np.isfinite(mag)] = np.nan
+    mag -= np.nanmedian(mag, axis=1, keepdims=True)
+    return float(np.nanmedian(np.nanstd(mag, axis=0)))
+
+
+def run_detection(frames, finder, fwhm, threshold, sigma_clip):
+    """finder로 모든 프레임을 검출하여 (프레임당 시간, 밝기순 검출 목록들) 반환"""
+    from detection import detect_sources
+
+    times, detections = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        sources = detect_sources(frame, fwhm, threshold, sigma_clip, finder=finder)
+        times.append(time.perf_counter() - t0)
+        detections.append(np.sort(sources, order="peak")[::-1])
+    return statistics.median(times), detections
+
+
+def run_fit(frames, positions, fwhm, choice):
+    """모든 프레임에서 positions(프레임별 초기 좌표)를 피팅하여 (프레임당 시간, 플럭스 행렬) 반환"""
+    from photometry import fit_stars
+
+    flux = np.full((len(frames), len(positions[0])), np.nan)
+    times = []
+    for i, (frame, coords) in enumerate(zip(frames, positions)):
+        t0 = time.perf_counter()
+        table = fit_stars(frame, [tuple(p) for p in coords], fwhm, backends=choice)
+        times.append(time.perf_counter() - t0)
+        flux[i] = np.asarray(table["flux_fit"], dtype=np.float64)
+    return statistics.median(times), flux
+
+
+def parse_choices(args):
+    """명령행에서 단계별로 고른 구현 목록 (지정하지 않으면 등록된 전체)"""
+    choices = {}
+    for stage in backends.STAGES:
+        value = getattr(args, stage)
+        names = [name for name, _ in backends.available(stage)]
+        if value:
+            unknown = set(value.split(",")) - set(names)
+            if unknown:
+                raise ValueError(f"{stage} 단계에 없는 구현: {', '.join(sorted(unknown))}")
+            names = value.split(",")
+        choices[stage] = names
+    return choices
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="검출/측광 백엔드 조합 비교")
+    parser.add_argument("--frames", nargs="*", help="비교할 FITS 프레임 (없으면 합성 시퀀스)")
+    parser.add_argument("--n-frames", type=int, default=6, help="합성 시퀀스 프레임 수")
+    parser.add_argument("--stars", type=int, default=40, help="측광할 밝은 별 수")
+    parser.add_argument("--fwhm", type=float, default=3.5)
+    parser.add_argument("--threshold", type=float, default=5.0, help="검출 임계값 (배경 잡음 배수)")
+    parser.add_argument("--sigma-clip", type=float, default=3.0)
+    parser.add_argument("--tolerance", type=float, default=1.2,
+                        help="추천 조건: 최소 산포의 이 배수 이내")
+    for stage in backends.STAGES:
+        parser.add_argument(f"--{stage.replace('_', '-')}", dest=stage,
+                            help="쉼표로 구분한 구현 이름 (기본: 전체)")
+    args = parser.parse_args(argv)
+
+    from moving_objects import estimate_offset
+
+    # 조합마다 반복되는 피팅 경고(LMLSQFitter의 bounds 경고, 수렴 경고 등)는 표에 영향이 없으므로 숨김
+    warnings.simplefilter("ignore")
+
+    try:
+        choices = parse_choices(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    if args.frames:
+        frames = load_frames(args.frames)
+    else:
+        frames = make_sequence(args.n_frames, args.stars * 3, fwhm=args.fwhm)
+    print(f"[INFO] 프레임 {len(frames)}장, 크기 {frames[0].shape}")
+
+    rows = []
+    for finder in choices["finder"]:
+        detect_time, detections = run_detection(frames, finder, args.fwhm, args.threshold, args.sigma_clip)
+        # 첫 프레임에서 고른 별을 프레임마다 검출 목록으로 추정한 이동량만큼 옮겨 초기 좌표로 사용
+        reference = select_stars(detections[0], frames[0].shape, args.stars,
+                                 min_separation=args.fwhm * 8, border=int(args.fwhm * 4))
+        ref_xy = np.column_stack([detections[0]["x"], detections[0]["y"]])
+        positions = []
+        for i, sources in enumerate(detections):
+            offset = estimate_offset(ref_xy, np.column_stack([sources["x"], sources["y"]]))
+            if offset is None:
+                print(f"[ERROR] {finder}: 프레임 {i}의 이동량을 추정하지 못해 첫 프레임 좌표를 사용합니다.")
+                offset = (0.0, 0.0)
+            positions.append(reference + offset)
+        print(f"[INFO] {finder}: 프레임당 검출 {detect_time * 1e3:.1f} ms, "
+              f"첫 프레임 {len(detections[0])}개 검출, 측광 별 {len(reference)}개")
+
+        for fitter, psf_model, background in itertools.product(
+                choices["fitter"], choices["psf_model"], choices["background"]):
+            choice = {"finder": finder, "fitter": fitter, "psf_model": psf_model, "background": background}
+            try:
+                backends.resolve(choice)
+            except ValueError:
+                continue  # 지원하지 않는 조합 (배치 피팅 + 가우시안 외 모델 등)
+            if fitter == "batch" and background != "mmm":
+                continue  # 배치 피팅의 지역 배경은 MMM 고정이므로 같은 결과가 반복됨
+            fit_time, flux = run_fit(frames, positions, args.fwhm, choice)
+            rows.append((choice, detect_time, fit_time, differential_scatter(flux)))
+
+    if not rows:
+        print("[ERROR] 실행할 수 있는 조합이 없습니다.")
+        return 1
+
+    print()
+    print(f"{'finder':<7} {'fitter':<7} {'psf_model':<13} {'background':<11} "
+          f"{'검출(ms)':>9} {'피팅(ms)':>9} {'산포(mmag)':>11}")
+    for choice, detect_time, fit_time, scatter in sorted(rows, key=lambda r: r[1] + r[2]):
+        print(f"{choice['finder']:<7} {choice['fitter']:<7} {choice['psf_model']:<13} "
+              f"{choice['background']:<11} {detect_time * 1e3:>9.1f} {fit_time * 1e3:>9.1f} "
+              f"{scatter * 1e3:>11.2f}")
+
+    best_scatter = min(r[3] for r in rows)
+    accurate = [r for r in rows if r[3] <= best_scatter * args.tolerance]
+    choice, detect_time, fit_time, scatter = min(accurate, key=lambda r: r[1] + r[2])
+    print()
+    print(f"[INFO] 추천 (산포 {best_scatter * 1e3:.2f} mmag의 {args.tolerance}배 이내 중 가장 빠름): "
+          f"{choice} ({(detect_time + fit_time) * 1e3:.1f} ms/프레임, {scatter * 1e3:.2f} mmag)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
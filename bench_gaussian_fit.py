@@ -0,0 +1,92 @@
+# bench_gaussian_fit.py
+"""
+배치 가우시안 피팅(gaussian_fit) 검증 및 속도 벤치마크.
+
+별을 무작위로 뿌린 합성 프레임을 만들어 photutils 경로(PSFPhotometry + TRFLSQFitter)와
+배치 피팅의 결과를 비교하고, 두 방식의 소요 시간을 출력합니다.
+서로 떨어진 별들에서 위치나 밝기 차이가 허용치를 넘으면 종료 코드 1을 반환합니다.
+
+사용 예:
+    python bench_gaussian_fit.py
+    python bench_gaussian_fit.py --stars 5000 --compare 500
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+# 두 방식이 일치한다고 볼 허용치 (위치 px, 상대 밝기)
+POSITION_TOLERANCE = 0.05
+FLUX_TOLERANCE = 0.01
+
+
+def make_field(n_stars, shape=(2048, 2048), fwhm=3.5, sky=100.0, noise=5.0, seed=0):
+    """CircularGaussianPRF 별을 뿌린 합성 프레임과 (약간 어긋난) 초기 좌표 반환"""
+    from astropy.table import Table
+    from photutils.datasets import make_model_image
+    from photutils.psf import CircularGaussianPRF
+
+    rng = np.random.default_rng(seed)
+    border = int(fwhm * 6)
+    params = Table()
+    params["x_0"] = rng.uniform(border, shape[1] - border, n_stars)
+    params["y_0"] = rng.uniform(border, shape[0] - border, n_stars)
+    params["flux"] = rng.uniform(2e3, 5e4, n_stars)
+    params["fwhm"] = fwhm
+    size = int(fwhm * 8) | 1
+    image = make_model_image(shape, CircularGaussianPRF(), params, model_shape=(size, size))
+    image += sky + rng.normal(0, noise, shape)
+    positions = np.column_stack([params["x_0"], params["y_0"]]) + rng.normal(0, 0.3, (n_stars, 2))
+    return image, positions, params
+
+
+def isolated(positions, radius):
+    """radius 안에 다른 별이 없는 별의 마스크 (겹친 별은 두 방식의 결과가 달라도 정상)"""
+    from scipy.spatial import cKDTree
+
+    dist, _ = cKDTree(positions).query(positions, k=2)
+    return dist[:, 1] > radius
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="배치 가우시안 피팅 검증/벤치마크")
+    parser.add_argument("--stars", type=int, default=3000, help="합성 프레임의 별 수")
+    parser.add_argument("--compare", type=int, default=300, help="photutils 경로와 비교할 별 수")
+    parser.add_argument("--fwhm", type=float, default=3.5)
+    args = parser.parse_args(argv)
+
+    from gaussian_fit import HAS_NUMBA, compare_with_photutils, fit_gaussian_prf_batch
+
+    image, positions, _ = make_field(args.stars, fwhm=args.fwhm)
+    keep = isolated(positions, args.fwhm * 8)
+    print(f"[INFO] 별 {args.stars}개 (고립된 별 {keep.sum()}개), numba {'사용' if HAS_NUMBA else '없음'}")
+
+    # 첫 호출은 JIT 컴파일 시간을 포함하므로 따로 측정
+    t0 = time.perf_counter()
+    fit_gaussian_prf_batch(image, positions[:1], args.fwhm)
+    print(f"[INFO] 첫 호출 (컴파일 포함): {time.perf_counter() - t0:.2f} s")
+
+    t0 = time.perf_counter()
+    result = fit_gaussian_prf_batch(image, positions, args.fwhm)
+    elapsed = time.perf_counter() - t0
+    print(f"[INFO] 배치 피팅 {args.stars}개: {elapsed:.3f} s ({elapsed / args.stars * 1e6:.1f} us/별), "
+          f"수렴 실패 {np.count_nonzero(result['flags'])}개")
+
+    subset = positions[keep][:args.compare]
+    stats = compare_with_photutils(image, subset, args.fwhm)
+    print(f"[INFO] 비교 {stats['n']}개: photutils {stats['time_photutils']:.3f} s, "
+          f"배치 {stats['time_batch']:.3f} s "
+          f"(x{stats['time_photutils'] / max(stats['time_batch'], 1e-9):.0f})")
+    print(f"[INFO] 최대 위치 차이 ({stats['max_dx']:.4f}, {stats['max_dy']:.4f}) px, "
+          f"상대 밝기 차이 중앙값 {stats['median_dflux']:.2e} / 최대 {stats['max_dflux']:.2e}")
+
+    ok = (max(stats['max_dx'], stats['max_dy']) <= POSITION_TOLERANCE
+          and stats['max_dflux'] <= FLUX_TOLERANCE)
+    print("[OK] 두 방식의 결과가 일치합니다." if ok else "[FAIL] 두 방식의 결과가 허용치를 넘게 다릅니다.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# bench_memory.py
+"""
+시퀀스 처리 메모리 벤치마크.
+
+큰 프레임 여러 장을 차례로 읽기 → 화면 스트레치 → 배경 지도 → 별 검출 → 조리개 측광 하면서
+단계별 최대 메모리 사용량(tracemalloc)과 프레임마다 남는 메모리를 측정합니다.
+버퍼 풀(frame_buffers)을 쓰는 방식과 프레임마다 새 배열을 만드는 기존 방식을 비교하고,
+버퍼 풀 방식에서 메모리가 프레임 수에 따라 늘어나거나 상한을 넘으면 종료 코드 1을 반환합니다.
+
+사용 예:
+    python bench_memory.py                         # 2048x2048 합성 프레임 20장
+    python bench_memory.py --frames night1/*.fits --memory-limit 512
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import warnings
+
+import numpy as np
+
+from frame_buffers import MB, MEMORY_LIMIT_MB, BufferPool, MemoryLimitError, MemoryReport, read_fits, stretch_to_uint8
+
+# 프레임 수가 늘어도 남는 메모리가 이 값(MB) 이내여야 "일정"으로 판정
+GROWTH_TOLERANCE_MB = 1.0
+
+
+def write_sequence(directory, n_frames, size, fwhm, n_stars=150, seed=0):
+    """합성 시퀀스를 float32 FITS 파일로 저장하고 경로 목록 반환"""
+    from astropy.io import fits
+
+    from bench_backends import make_sequence
+
+    paths = []
+    for i, frame in enumerate(make_sequence(n_frames, n_stars, shape=(size, size), fwhm=fwhm, seed=seed)):
+        path = os.path.join(directory, f"frame_{i:03d}.fits")
+        fits.PrimaryHDU(frame.astype(np.float32)).writeto(path)
+        paths.append(path)
+    return paths
+
+
+def legacy_load(path):
+    """기존 방식: 프레임마다 데이터, nan_to_num, clip, 정규화, 8비트 영상을 새로 만듦"""
+    from astropy.io import fits
+
+    data = np.nan_to_num(fits.getdata(path))
+    vmin, vmax = np.percentile(data, [5, 99])
+    clipped = np.clip(data, vmin, vmax)
+    normed = ((clipped - vmin) / (vmax - vmin) * 255).astype(np.uint8)
+    return data, normed
+
+
+def run(paths, fwhm, pool=None):
+    """
+    모든 프레임을 처리하여 (MemoryReport, 프레임마다 처리 후 남은 메모리 목록) 반환.
+    pool이 None이면 기존 방식으로 읽고 스트레치합니다.
+    """
+    from background_map import get_background
+    from detection import detect_sources
+    from photometry import run_aperture_photometry
+
+    report = MemoryReport(pool)
+    remaining = []
+    data = target = comp = None
+    try:
+        for path in paths:
+            if pool is None:
+                data = None  # 화면에 표시 중인 이전 프레임을 새 프레임으로 바꾸는 시점
+                with report.stage("읽기+스트레치"):
+                    data, normed = legacy_load(path)
+            else:
+                with report.stage("읽기"):
+                    data, header = read_fits(path, pool)
+                with report.stage("스트레치"):
+                    normed = stretch_to_uint8(data, pool)
+            with report.stage("배경"):
+                background, rms = get_background(data)
+            with report.stage("검출"):
+                sources = detect_sources(data, fwhm, 5.0, 3.0, background=background, rms=rms)
+            if target is None:
+                # 첫 프레임의 가장 밝은 두 별을 측광 대상과 비교성으로 사용
+                brightest = np.sort(sources, order="peak")[::-1][:2]
+                target, comp = [(brightest["x"][0], brightest["y"][0])], [(brightest["x"][1], brightest["y"][1])]
+            with report.stage("측광"):
+                run_aperture_photometry(data, target, comp, 10.0, fwhm, background=background)
+            del normed, background, rms, sources
+            remaining.append(report.traced())
+    finally:
+        report.stop()
+    return report, remaining
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="시퀀스 처리 메모리 벤치마크")
+    parser.add_argument("--frames", nargs="*", help="처리할 FITS 프레임 (없으면 합성 시퀀스)")
+    parser.add_argument("--n-frames", type=int, default=20, help="합성 시퀀스 프레임 수")
+    parser.add_argument("--size", type=int, default=2048, help="합성 프레임 한 변 크기 (px)")
+    parser.add_argument("--fwhm", type=float, default=3.5)
+    parser.add_argument("--memory-limit", type=float, default=MEMORY_LIMIT_MB, help="버퍼 풀 메모리 상한 (MB)")
+    parser.add_argument("--skip-legacy", action="store_true", help="기존 방식 측정 생략")
+    args = parser.parse_args(argv)
+
+    warnings.simplefilter("ignore")
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = args.frames
+        if not paths:
+            paths = write_sequence(directory, args.n_frames, args.size, args.fwhm)
+        print(f"[INFO] 프레임 {len(paths)}장, 메모리 상한 {args.memory_limit:.0f} MB")
+
+        results = []
+        if not args.skip_legacy:
+            results.append(("기존 방식", None))
+        pool = BufferPool(args.memory_limit)
+        results.append(("버퍼 풀", pool))
+
+        status = 0
+        for label, run_pool in results:
+            try:
+                report, remaining = run(paths, args.fwhm, run_pool)
+            except MemoryLimitError as e:
+                print(f"[ERROR] {label}: {e}")
+                return 1
+            growth = (remaining[-1] - remaining[0]) / MB
+            print()
+            print(f"[{label}]")
+            lines = report.lines()
+            print("\n".join(lines))
+            print(f"처리 후 남은 메모리: 첫 프레임 {remaining[0] / MB:.1f} MB, "
+                  f"마지막 프레임 {remaining[-1] / MB:.1f} MB (증가 {growth:+.1f} MB), "
+                  f"최대 {max(remaining) / MB:.1f} MB")
+            if run_pool is not None:
+                if growth > GROWTH_TOLERANCE_MB:
+                    print(f"[ERROR] 프레임 수에 따라 메모리가 늘어남 ({growth:+.1f} MB)")
+                    status = 1
+                if any(line.startswith("[ERROR]") for line in lines):
+                    status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+# bench_startup.py
+"""
+프로그램 시작(import) 시간 벤치마크.
+
+새 파이썬 프로세스에서 모듈을 import 하는 데 걸리는 시간을 여러 번 측정하고,
+무거운 모듈(lazy_imports.HEAVY_MODULES)이 시작 시점에 불러와지지 않았는지 확인합니다.
+중앙값이 예산을 넘거나 무거운 모듈이 섞여 있으면 종료 코드 1을 반환합니다.
+
+사용 예:
+    python bench_startup.py
+    python bench_startup.py --budget 0.8 --repeat 7 AstroPSF graphics_view
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from lazy_imports import HEAVY_MODULES
+
+# 시작 시간 예산(초): 이 시간 안에 창을 띄울 준비가 끝나야 함
+STARTUP_BUDGET_S = 1.0
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"elapsed": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure_import(module, repeat=5):
+    """새 프로세스에서 module을 repeat번 import 하여 (시간 목록, 불러와진 무거운 모듈) 반환"""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    times = []
+    heavy = set()
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=here, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"{module} import 실패:\n{proc.stderr.strip()}")
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        times.append(result["elapsed"])
+        heavy.update(result["heavy"])
+    return times, sorted(heavy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPSF 시작 시간 벤치마크")
+    parser.add_argument("modules", nargs="*", default=["graphics_view", "AstroPSF"])
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_S, help="import 시간 예산(초)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    ok = True
+    for module in args.modules:
+        try:
+            times, heavy = measure_import(module, args.repeat)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            ok = False
+            continue
+
+        median = statistics.median(times)
+        status = "OK" if median <= args.budget and not heavy else "FAIL"
+        print(f"[{status}] {module}: 중앙값 {median:.3f} s (최소 {min(times):.3f} s, 예산 {args.budget:.3f} s)")
+        if heavy:
+            print(f"        시작 시점에 불러와진 무거운 모듈: {', '.join(heavy)}")
+        ok = ok and status == "OK"
+
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
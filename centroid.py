@@ -0,0 +1,148 @@
+# centroid.py
+
+import warnings
+
+import numpy as np
+
+
+def stack_cutouts(image, xs, ys, size):
+    """
+    정수 중심 (xs, ys) 주변의 size x size 절단 이미지들을 (N, size, size) 배열 하나로 쌓습니다.
+    이미지 밖으로 나가는 픽셀은 NaN으로 채웁니다.
+
+    Returns:
+        cutouts : (N, size, size) float64 배열
+        x0, y0 : (N,) 각 절단 이미지 왼쪽 위 픽셀의 이미지 좌표
+    """
+    h, w = image.shape
+    half = size // 2
+    xs = np.asarray(xs, dtype=np.intp)
+    ys = np.asarray(ys, dtype=np.intp)
+    offsets = np.arange(-half, half + 1)
+
+    iy = ys[:, None, None] + offsets[None, :, None]
+    ix = xs[:, None, None] + offsets[None, None, :]
+    inside = (iy >= 0) & (iy < h) & (ix >= 0) & (ix < w)
+
+    cutouts = image[np.clip(iy, 0, h - 1), np.clip(ix, 0, w - 1)].astype(np.float64)
+    cutouts[~inside] = np.nan
+    return cutouts, xs - half, ys - half
+
+
+def _border_median(cutouts):
+    border = np.concatenate(
+        [cutouts[:, 0, :], cutouts[:, -1, :], cutouts[:, 1:-1, 0], cutouts[:, 1:-1, -1]], axis=1
+    )
+    return np.nanmedian(border, axis=1)
+
+
+def annulus_background(image, positions, inner_radius, outer_radius):
+    """
+    별마다 고리(inner_radius ~ outer_radius) 픽셀의 MMM 배경(3·중앙값 − 2·평균)을 한 번에 계산합니다.
+    한 번 3-sigma clipping 한 값을 사용합니다. (photutils MMMBackground와 같은 추정식)
+
+    Returns:
+        (N,) 배경값 (고리 픽셀이 없으면 NaN)
+    """
+    positions = np.atleast_2d(np.asarray(positions, dtype=np.float64))
+    outer = int(np.ceil(outer_radius))
+    size = 2 * outer + 1
+    xs = np.rint(positions[:, 0]).astype(np.intp)
+    ys = np.rint(positions[:, 1]).astype(np.intp)
+    cutouts, x0, y0 = stack_cutouts(image, xs, ys, size)
+
+    # 부픽셀 중심 기준 거리
+    offsets = np.arange(size, dtype=np.float64)
+    dx = x0[:, None] + offsets[None, :] - positions[:, 0][:, None]
+    dy = y0[:, None] + offsets[None, :] - positions[:, 1][:, None]
+    r = np.hypot(dx[:, None, :], dy[:, :, None])
+    values = np.where((r >= inner_radius) & (r <= outer_radius), cutouts, np.nan).reshape(len(xs), -1)
+
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        median = np.nanmedian(values, axis=1)
+        std = np.nanstd(values, axis=1)
+        clipped = np.where(np.abs(values - median[:, None]) <= 3 * std[:, None], values, np.nan)
+        median = np.nanmedian(clipped, axis=1)
+        mean = np.nanmean(clipped, axis=1)
+    return 3 * median - 2 * mean
+
+
+def refine_centroids(image, positions, box_size=11, method="com", n_iter=2, max_shift=None):
+    """
+    초기 좌표들을 한 번에 별 중심으로 보정합니다. (모든 별을 쌓아서 벡터화 계산)
+
+    1) box_size 영역 안의 가장 밝은 픽셀로 이동 (클릭이 몇 픽셀 어긋난 경우 보정)
+    2) 그 주변 절단 이미지에서 무게중심(method="com") 또는
+       3x3 이차 곡선 꼭짓점(method="quadratic")으로 부픽셀 중심 계산
+
+    Parameters:
+        image : 2D numpy array
+        positions : (N, 2) 배열 또는 (x, y) 튜플 리스트
+        box_size : int
+            탐색 및 절단 이미지 크기 (홀수로 맞춤)
+        method : "com" 또는 "quadratic"
+        n_iter : int
+            무게중심 재계산 횟수 (method="com"일 때)
+        max_shift : float 또는 None
+            보정된 중심이 초기 좌표에서 이 거리(px)보다 멀면 실패로 봄.
+            탐색 영역에 더 밝은 이웃 별이 있으면 그쪽으로 끌려가므로 보통 FWHM 정도를 줍니다.
+            None이면 탐색 영역(box_size) 안이기만 하면 성공
+
+    Returns:
+        refined : (N, 2) 보정된 좌표 (보정에 실패한 별은 원래 좌표 유지)
+        ok : (N,) bool, 보정 성공 여부
+    """
+    if method not in ("com", "quadratic"):
+        raise ValueError(f"지원하지 않는 중심 계산 방법: {method}")
+
+    positions = np.atleast_2d(np.asarray(positions, dtype=np.float64))
+    if positions.size == 0:
+        return positions.reshape(0, 2), np.zeros(0, dtype=bool)
+
+    box_size = int(box_size) | 1
+    half = box_size // 2
+    xs = np.rint(positions[:, 0]).astype(np.intp)
+    ys = np.rint(positions[:, 1]).astype(np.intp)
+
+    # 1. 탐색 영역 안의 최대 픽셀로 이동
+    cutouts, x0, y0 = stack_cutouts(image, xs, ys, box_size)
+    flat = np.where(np.isnan(cutouts), -np.inf, cutouts).reshape(len(xs), -1)
+    iy, ix = np.unravel_index(np.argmax(flat, axis=1), (box_size, box_size))
+    px, py = x0 + ix, y0 + iy
+
+    if method == "quadratic":
+        cutouts, _, _ = stack_cutouts(image, px, py, 3)
+        c = cutouts[:, 1, 1]
+        left, right = cutouts[:, 1, 0], cutouts[:, 1, 2]
+        down, up = cutouts[:, 0, 1], cutouts[:, 2, 1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            denom_x = left - 2 * c + right
+            denom_y = down - 2 * c + up
+            dx = np.where(denom_x < 0, 0.5 * (left - right) / denom_x, 0.0)
+            dy = np.where(denom_y < 0, 0.5 * (down - up) / denom_y, 0.0)
+        refined = np.column_stack([px + np.clip(dx, -0.5, 0.5), py + np.clip(dy, -0.5, 0.5)])
+    else:
+        cx, cy = px.astype(np.float64), py.astype(np.float64)
+        for _ in range(max(n_iter, 1)):
+            cutouts, x0, y0 = stack_cutouts(image, np.rint(cx), np.rint(cy), box_size)
+            weights = cutouts - _border_median(cutouts)[:, None, None]
+            weights = np.clip(np.nan_to_num(weights), 0, None)
+            total = weights.sum(axis=(1, 2))
+            offsets = np.arange(box_size)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                new_cx = x0 + (weights.sum(axis=1) * offsets).sum(axis=1) / total
+                new_cy = y0 + (weights.sum(axis=2) * offsets).sum(axis=1) / total
+            good = total > 0
+            cx = np.where(good, new_cx, cx)
+            cy = np.where(good, new_cy, cy)
+        refined = np.column_stack([cx, cy])
+
+    # 보정 결과가 유효하지 않거나 탐색 영역(또는 max_shift) 밖으로 벗어나면 원래 좌표 유지
+    shift = np.abs(refined - positions)
+    ok = np.all(np.isfinite(refined), axis=1) & np.all(shift <= half + 1, axis=1)
+    if max_shift is not None:
+        with np.errstate(invalid="ignore"):
+            ok &= np.hypot(shift[:, 0], shift[:, 1]) <= max_shift
+    refined[~ok] = positions[~ok]
+    return refined, ok
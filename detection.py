@@ -0,0 +1,206 @@
+# detection.py
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import backends
+
+# 검출 결과 형식 (좌표는 입력 이미지 기준 픽셀)
+SOURCE_DTYPE = np.dtype([("x", "f8"), ("y", "f8"), ("peak", "f8")])
+
+# 이 크기(픽셀 수)보다 큰 이미지만 타일로 나누어 병렬 검출
+TILED_MIN_PIXELS = 4096 * 4096
+DEFAULT_TILE_SIZE = 2048
+# 타일 검출에서 공유할 sigma-clipping 통계에 쓸 최대 표본 수 (격자 간격으로 표본 추출)
+STATS_SAMPLES = 1_000_000
+
+_executor = None
+_executor_workers = None
+
+
+def detect_sources(image, fwhm, threshold, sigma_clip, background=None, rms=None, normalized=False,
+                   finder=None, stats=None):
+    """
+    이미지 전체에서 별을 검출합니다.
+    threshold는 배경 잡음(표준편차)의 배수입니다.
+    finder는 backends에 등록된 검출기 이름입니다. (None이면 현재 설정, 기본 IRAFStarFinder)
+
+    background, rms 지도(background_map)가 주어지면 (image - background) / rms 영상에서
+    검출하므로 영역마다 통계를 다시 내지 않고 프레임 전체에서 같은 임계값이 적용됩니다.
+    지도가 없으면 영역 전체의 sigma-clipping 통계를 사용합니다.
+    normalized=True이면 image가 이미 (image - background) / rms 영상이라고 봅니다.
+    stats=(median, std)가 주어지면 통계를 다시 내지 않고 그 값을 씁니다. (타일 검출에서 영역 전체 통계 공유)
+
+    Returns:
+        SOURCE_DTYPE 구조체 배열 (x, y, peak)
+    """
+    if finder is None:
+        finder = backends.get_backends()["finder"]
+
+    if background is not None and rms is not None:
+        image = (image - background) / rms
+        normalized = True
+
+    if normalized:
+        median, std = 0.0, 1.0
+    elif stats is not None:
+        median, std = stats
+    else:
+        from astropy.stats import sigma_clipped_stats
+        mean, median, std = sigma_clipped_stats(image, sigma=sigma_clip)
+    star_finder = backends.create("finder", finder, threshold * std, fwhm)
+    sources = star_finder(image - median)
+
+    if sources is None:
+        return np.zeros(0, dtype=SOURCE_DTYPE)
+
+    result = np.empty(len(sources), dtype=SOURCE_DTYPE)
+    result["x"] = sources["xcentroid"]
+    result["y"] = sources["ycentroid"]
+    result["peak"] = sources["peak"]
+    return result
+
+
+def make_tiles(shape, tile_size, overlap):
+    """
+    이미지를 겹치는 타일로 나눕니다.
+    각 타일은 (검출 영역, 소유 영역)이며 소유 영역끼리는 겹치지 않습니다.
+    영역은 (y0, y1, x0, x1) 형식입니다.
+    """
+    h, w = shape
+    tiles = []
+    for cy0 in range(0, h, tile_size):
+        for cx0 in range(0, w, tile_size):
+            cy1, cx1 = min(cy0 + tile_size, h), min(cx0 + tile_size, w)
+            region = (max(cy0 - overlap, 0), min(cy1 + overlap, h),
+                      max(cx0 - overlap, 0), min(cx1 + overlap, w))
+            tiles.append((region, (cy0, cy1, cx0, cx1)))
+    return tiles
+
+
+def _attach_shared(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python 3.13 미만: 작업 프로세스는 부모와 같은 resource tracker를 공유하므로
+        # 그대로 연결해도 해제(unlink)는 부모에서 한 번만 일어남
+        return shared_memory.SharedMemory(name=name)
+
+
+def _detect_tile(shm_name, shape, dtype, tile, fwhm, threshold, sigma_clip, normalized, finder, stats):
+    """작업 프로세스에서 실행: 공유 메모리의 이미지에서 타일 하나를 검출"""
+    (y0, y1, x0, x1), (cy0, cy1, cx0, cx1) = tile
+    shm = _attach_shared(shm_name)
+    try:
+        image = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        sources = detect_sources(image[y0:y1, x0:x1], fwhm, threshold, sigma_clip,
+                                 normalized=normalized, finder=finder, stats=stats)
+        del image
+    finally:
+        shm.close()
+
+    sources["x"] += x0
+    sources["y"] += y0
+    # 소유 영역 안의 별만 남겨 겹침 구간의 중복을 제거
+    own = ((sources["x"] >= cx0 - 0.5) & (sources["x"] < cx1 - 0.5) &
+           (sources["y"] >= cy0 - 0.5) & (sources["y"] < cy1 - 0.5))
+    return sources[own]
+
+
+def merge_duplicates(sources, min_separation):
+    """min_separation 안에 있는 검출은 가장 밝은 것 하나만 남깁니다."""
+    if len(sources) < 2:
+        return sources
+    from scipy.spatial import cKDTree
+
+    order = np.argsort(-sources["peak"])
+    sources = sources[order]
+    tree = cKDTree(np.column_stack([sources["x"], sources["y"]]))
+    keep = np.ones(len(sources), dtype=bool)
+    for i, j in sorted(tree.query_pairs(min_separation)):
+        # 밝기 순으로 정렬되어 있으므로 i < j 이면 j가 더 어두움
+        if keep[i]:
+            keep[j] = False
+    return sources[keep]
+
+
+def _get_executor(max_workers):
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != max_workers:
+        shutdown_executor()
+        _executor = ProcessPoolExecutor(max_workers=max_workers)
+        _executor_workers = max_workers
+    return _executor
+
+
+def shutdown_executor():
+    """병렬 검출용 작업 프로세스 풀을 종료합니다."""
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _executor_workers = None
+
+
+def detect_sources_tiled(image, fwhm, threshold, sigma_clip,
+                         tile_size=DEFAULT_TILE_SIZE, overlap=None, max_workers=None,
+                         min_pixels=TILED_MIN_PIXELS, background=None, rms=None, finder=None):
+    """
+    큰 이미지를 겹치는 타일로 나누어 프로세스 풀에서 병렬로 별을 검출합니다.
+    이미지는 피클링 대신 공유 메모리로 작업 프로세스에 전달하고,
+    타일별 결과는 소유 영역 기준으로 합친 뒤 남은 중복을 제거합니다.
+    min_pixels보다 작은 이미지는 현재 프로세스에서 detect_sources()로 처리합니다.
+    background, rms 지도가 주어지면 정규화한 영상 하나만 공유하고,
+    없으면 영역 전체의 sigma-clipping 통계(STATS_SAMPLES개의 격자 표본)를 한 번 구해
+    모든 타일에 같은 임계값을 적용합니다.
+    finder는 현재 프로세스에서 정해 작업 프로세스에 이름으로 넘깁니다.
+
+    Returns:
+        SOURCE_DTYPE 구조체 배열 (x, y, peak)
+    """
+    if finder is None:
+        finder = backends.get_backends()["finder"]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if image.size < min_pixels or max_workers < 2:
+        return detect_sources(image, fwhm, threshold, sigma_clip, background, rms, finder=finder)
+
+    normalized = background is not None and rms is not None
+    stats = None
+    if normalized:
+        image = (image - background) / rms
+    else:
+        # 타일마다 통계를 내면 임계값이 타일마다 달라지므로 영역 전체 통계를 한 번 구해 공유
+        # (전체 픽셀을 한 코어에서 처리하지 않도록 격자 간격 표본만 사용)
+        from astropy.stats import sigma_clipped_stats
+        step = max(int(np.sqrt(image.size / STATS_SAMPLES)), 1)
+        _, median, std = sigma_clipped_stats(image[::step, ::step], sigma=sigma_clip)
+        stats = (float(median), float(std))
+
+    if overlap is None:
+        # 타일 경계의 별이 온전히 들어가도록 FWHM의 몇 배만큼 겹침
+        overlap = int(np.ceil(fwhm * 4))
+    tiles = make_tiles(image.shape, tile_size, overlap)
+
+    shm = shared_memory.SharedMemory(create=True, size=image.nbytes)
+    try:
+        shared = np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)
+        np.copyto(shared, image)
+        del shared
+
+        executor = _get_executor(max_workers)
+        futures = [
+            executor.submit(_detect_tile, shm.name, image.shape, image.dtype.str, tile,
+                            fwhm, threshold, sigma_clip, normalized, finder, stats)
+            for tile in tiles
+        ]
+        results = [f.result() for f in futures]
+    finally:
+        shm.close()
+        shm.unlink()
+
+    sources = np.concatenate(results) if results else np.zeros(0, dtype=SOURCE_DTYPE)
+    return merge_duplicates(sources, min_separation=fwhm / 2)
@@ -0,0 +1,239 @@
+# difference_imaging.py
+"""
+FFT 기반 차분 영상 생성.
+
+시퀀스의 여러 프레임을 정렬하여 중앙값으로 기준(템플릿) 영상을 만들고,
+각 프레임과 PSF를 맞춘 기준 영상을 빼서 움직이는 천체(소행성)만 남깁니다.
+배경별이 빠진 차분 영상에서 소행성을 PSF 측광하면 별과 겹칠 때도 안정적입니다.
+
+모든 연산(정렬 이동, PSF 맞춤 컨볼루션)은 푸리에 공간에서 한 번에 수행하고,
+프레임 크기별로 기준 영상의 FFT와 주파수 격자를 캐시해 재사용합니다.
+커널 전달 함수는 프레임마다 FWHM이 달라 캐시하지 않고 주파수 격자에서 바로 계산합니다.
+"""
+
+import numpy as np
+from scipy import fft
+
+GAUSSIAN_SIGMA_TO_FWHM = 2.3548
+# 기준 영상 스택 크기를 정할 때 남겨 둘 FFT 작업 공간 (float32 프레임 장수 기준, 패딩된 복소 스펙트럼 몇 개)
+FFT_WORK_FRAMES = 6
+
+
+class DifferenceImager:
+    def __init__(self, pad=32, workers=-1):
+        """
+        pad : int
+            FFT 순환 경계 효과를 막기 위해 가장자리에 덧붙일 픽셀 수
+            (프레임 간 이동량과 커널 반경이 이보다 작아야 함)
+        workers : int
+            scipy.fft 병렬 스레드 수 (-1이면 전체 코어)
+        """
+        self.pad = pad
+        self.workers = workers
+        self.reference = None
+        self.reference_fwhm = None
+        self._shape = None
+        self._fft_shape = None
+        self._ref_fft = None
+        self._freq_cache = {}
+
+    # ------------------------------------------------
+    # FFT 보조 함수 (프레임 크기별 캐시)
+    # ------------------------------------------------
+
+    def _padded_shape(self, shape):
+        return tuple(fft.next_fast_len(n + 2 * self.pad, real=True) for n in shape)
+
+    def _fft(self, image):
+        h, w = image.shape
+        ph, pw = self._padded_shape(image.shape)
+        # 반사 패딩으로 가장자리 불연속을 줄인 뒤 실수 FFT
+        padded = np.pad(
+            np.asarray(image, dtype=np.float64),
+            ((self.pad, ph - h - self.pad), (self.pad, pw - w - self.pad)),
+            mode="reflect",
+        )
+        return fft.rfft2(padded, workers=self.workers)
+
+    def _ifft(self, spectrum, shape):
+        h, w = shape
+        full = fft.irfft2(spectrum, s=self._padded_shape(shape), workers=self.workers)
+        return full[self.pad:self.pad + h, self.pad:self.pad + w]
+
+    def _frequencies(self, fft_shape):
+        """(fy, fx) 주파수 격자 (cycles/pixel), 브로드캐스트 가능한 형태"""
+        if fft_shape not in self._freq_cache:
+            ph, pw = fft_shape
+            fy = fft.fftfreq(ph)[:, None]
+            fx = fft.rfftfreq(pw)[None, :]
+            self._freq_cache[fft_shape] = (fy, fx)
+        return self._freq_cache[fft_shape]
+
+    def _gaussian_transfer(self, fft_shape, sigma):
+        """
+        가우시안 커널의 푸리에 전달 함수 (커널을 직접 FFT 하지 않고 해석적으로 계산).
+        x, y 방향으로 분리되므로 1D 두 개만 exp 하고 곱해서 만듭니다.
+        """
+        fy, fx = self._frequencies(fft_shape)
+        a = -2 * np.pi**2 * float(sigma)**2
+        return np.exp(a * fy**2) * np.exp(a * fx**2)
+
+    def _shift_transfer(self, fft_shape, dx, dy):
+        """영상을 (dx, dy)만큼 이동시키는 위상 기울기"""
+        fy, fx = self._frequencies(fft_shape)
+        return np.exp(-2j * np.pi * fy * dy) * np.exp(-2j * np.pi * fx * dx)
+
+    def _cross_shift(self, spectrum, reference_spectrum):
+        """위상 상관으로 spectrum 영상이 기준 영상에 대해 이동한 양 (dx, dy)"""
+        cross = spectrum * np.conj(reference_spectrum)
+        cross /= np.maximum(np.abs(cross), 1e-12)
+        corr = fft.irfft2(cross, s=self._fft_shape, workers=self.workers)
+        iy, ix = np.unravel_index(np.argmax(corr), corr.shape)
+        ph, pw = corr.shape
+
+        def subpixel(c_minus, c0, c_plus):
+            denom = c_minus - 2 * c0 + c_plus
+            return 0.5 * (c_minus - c_plus) / denom if denom < 0 else 0.0
+
+        dy = iy + subpixel(corr[iy - 1, ix], corr[iy, ix], corr[(iy + 1) % ph, ix])
+        dx = ix + subpixel(corr[iy, ix - 1], corr[iy, ix], corr[iy, (ix + 1) % pw])
+        # 순환 좌표를 부호 있는 이동량으로 변환
+        if dy > ph / 2:
+            dy -= ph
+        if dx > pw / 2:
+            dx -= pw
+        return dx, dy
+
+    # ------------------------------------------------
+    # 기준 영상과 차분
+    # ------------------------------------------------
+
+    def build_reference(self, frames, max_frames=15, load=None, pool=None):
+        """
+        프레임들을 첫 프레임에 맞춰 정렬한 뒤 중앙값으로 기준 영상을 만듭니다.
+        움직이는 천체는 프레임마다 위치가 달라 중앙값에서 사라집니다.
+
+        Parameters:
+            frames : 2D 배열 리스트 (모두 같은 크기) 또는 load로 읽을 항목(파일 경로 등) 리스트
+            max_frames : int
+                메모리 절약을 위해 균등 간격으로 골라 쓸 최대 프레임 수
+            load : callable 또는 None
+                주어지면 골라진 항목을 하나씩 load(item)으로 읽어서 사용
+                (다음 항목을 읽기 전에 스택에 옮기므로 같은 버퍼를 돌려줘도 됨)
+            pool : frame_buffers.BufferPool 또는 None
+                주어지면 정렬된 프레임 스택을 풀 버퍼에 만들고,
+                풀의 메모리 상한에 맞게 max_frames를 줄임 (FFT 작업 공간 FFT_WORK_FRAMES장 분량은 남김)
+        """
+        frames = list(frames)
+        if len(frames) < 3:
+            raise ValueError("기준 영상을 만들려면 프레임이 3장 이상 필요합니다.")
+        first = load(frames[0]) if load is not None else frames[0]
+        shape = first.shape
+        if pool is not None:
+            frame_bytes = first.size * np.dtype(np.float32).itemsize
+            fit = pool.available() // frame_bytes - FFT_WORK_FRAMES
+            if fit < max_frames:
+                max_frames = max(int(fit), 3)  # 3장도 안 되면 pool.get()이 MemoryLimitError
+        if len(frames) > max_frames:
+            picks = np.linspace(0, len(frames) - 1, max_frames).round().astype(int)
+            frames = [frames[i] for i in picks]  # picks[0] == 0 이므로 first는 그대로 사용
+
+        self._shape = shape
+        self._fft_shape = self._padded_shape(shape)
+        anchor = self._fft(first)
+
+        stack_shape = (len(frames),) + shape
+        if pool is not None:
+            stack = pool.get("reference_stack", stack_shape, np.float32)
+        else:
+            stack = np.empty(stack_shape, dtype=np.float32)
+        stack[0] = first
+        for i, item in enumerate(frames[1:], start=1):
+            frame = load(item) if load is not None else item
+            if frame.shape != shape:
+                raise ValueError("시퀀스의 프레임 크기가 모두 같아야 합니다.")
+            spectrum = self._fft(frame)
+            dx, dy = self._cross_shift(spectrum, anchor)
+            stack[i] = self._ifft(spectrum * self._shift_transfer(self._fft_shape, -dx, -dy), shape)
+
+        # 스택은 다시 쓰지 않으므로 제자리에서 정렬하여 스택 크기의 복사본을 만들지 않음
+        self.reference = np.median(stack, axis=0, overwrite_input=True)
+        if pool is not None:
+            pool.release("reference_stack")
+        self.reference_fwhm = None
+        self._ref_fft = self._fft(self.reference)
+        return self.reference
+
+    def set_reference(self, reference, reference_fwhm=None):
+        """
+        저장해 둔 기준 영상(세션 파일 등)을 다시 사용합니다.
+        기준 영상의 FFT는 처음 차분/이동량 측정을 할 때 계산합니다.
+        """
+        self.reference = reference
+        self.reference_fwhm = reference_fwhm
+        self._shape = tuple(reference.shape)
+        self._fft_shape = self._padded_shape(self._shape)
+        self._ref_fft = None
+
+    def measure_shift(self, image):
+        """image가 기준 영상에 대해 이동한 양 (dx, dy)"""
+        self._check_image(image)
+        return self._cross_shift(self._fft(image), self._ref_fft)
+
+    def _check_image(self, image):
+        if self._ref_fft is None and self.reference is not None:
+            self._ref_fft = self._fft(self.reference)
+        if self._ref_fft is None:
+            raise RuntimeError("기준 영상이 없습니다. build_reference()를 먼저 호출하세요.")
+        if image.shape != self._shape:
+            raise ValueError("기준 영상과 프레임 크기가 다릅니다.")
+
+    def subtract(self, image, image_fwhm, reference_fwhm=None):
+        """
+        기준 영상을 image 좌표로 이동하고 PSF 폭을 맞춘 뒤 빼서 차분 영상을 만듭니다.
+        PSF가 더 좁은 쪽을 가우시안 커널로 넓혀 맞추고, 밝기 비율과 배경 차이도 보정합니다.
+
+        Parameters:
+            image : 2D 배열 (기준 영상과 같은 크기)
+            image_fwhm : float
+                image의 PSF FWHM
+            reference_fwhm : float 또는 None
+                기준 영상의 PSF FWHM (None이면 self.reference_fwhm 사용)
+
+        Returns:
+            (diff, info) : 차분 영상과 {'shift', 'fwhm', 'scale'}
+                'fwhm'은 차분 영상의 PSF FWHM (둘 중 넓은 쪽)
+        """
+        self._check_image(image)
+        if reference_fwhm is None:
+            reference_fwhm = self.reference_fwhm
+        if reference_fwhm is None:
+            raise ValueError("기준 영상의 FWHM이 필요합니다.")
+
+        spectrum = self._fft(image)
+        dx, dy = self._cross_shift(spectrum, self._ref_fft)
+        ref_spectrum = self._ref_fft * self._shift_transfer(self._fft_shape, dx, dy)
+
+        sigma_img = image_fwhm / GAUSSIAN_SIGMA_TO_FWHM
+        sigma_ref = reference_fwhm / GAUSSIAN_SIGMA_TO_FWHM
+        sigma_kernel = np.sqrt(abs(sigma_img**2 - sigma_ref**2))
+        kernel = self._gaussian_transfer(self._fft_shape, sigma_kernel)
+        if sigma_img >= sigma_ref:
+            ref_spectrum = ref_spectrum * kernel
+            science = np.asarray(image, dtype=np.float64)
+        else:
+            science = self._ifft(spectrum * kernel, self._shape)
+        matched_ref = self._ifft(ref_spectrum, self._shape)
+
+        # 밝기 비율(투명도/대기질량 차이)과 배경 차이를 최소제곱으로 보정
+        s = science - np.median(science)
+        r = matched_ref - np.median(matched_ref)
+        scale = float((s * r).sum() / max((r * r).sum(), 1e-12))
+        diff = s - scale * r
+
+        info = {
+            'shift': (dx, dy),
+            'fwhm': max(image_fwhm, reference_fwhm),
+            'scale': scale,
+        }
+        return diff, info
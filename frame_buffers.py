@@ -0,0 +1,246 @@
+# frame_buffers.py
+"""
+메모리 사용량이 일정한 시퀀스 처리를 위한 버퍼 풀.
+
+수백 장의 큰 프레임을 차례로 처리할 때 프레임마다 데이터/nan_to_num/clip/정규화/8비트 영상
+배열을 새로 만들면 가비지 컬렉터가 언제 메모리를 돌려주는지에 따라 사용량이 들쭉날쭉해집니다.
+BufferPool은 용도(이름)별로 버퍼를 한 번 할당해 두고 다음 프레임에서 그대로 다시 씁니다.
+모든 버퍼의 합이 메모리 상한을 넘으면 할당하지 않고 MemoryLimitError를 냅니다.
+상한은 풀의 버퍼에만 적용됩니다. 배경 지도, 검출, 측광, FFT가 잠깐 쓰는 메모리는 풀 밖에서
+할당되므로 프로세스 전체의 최대 사용량은 상한보다 클 수 있습니다. (MemoryReport로 확인)
+
+read_fits()는 FITS 데이터를 풀의 버퍼로 바로 읽고(스케일 적용과 NaN 제거도 제자리에서),
+stretch_to_uint8()은 작은 행 단위 작업 버퍼로 화면 표시용 8비트 영상을 만듭니다.
+MemoryReport는 단계별(읽기, 스트레치, 배경, 검출, 측광 등) 최대 메모리 사용량을 기록합니다.
+
+풀에서 받은 배열은 같은 이름으로 다시 get()/read_fits()를 호출하기 전까지만 유효합니다.
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+# 기본 메모리 상한 (MB), 버퍼 풀이 미리 할당하는 버퍼 전체에만 적용 (프로세스 전체 사용량의 상한이 아님)
+MEMORY_LIMIT_MB = 2048
+MB = 2**20
+
+# 백분위수(화면 표시 범위) 계산에 쓸 최대 표본 수 (큰 영상은 격자 간격으로 표본 추출)
+STRETCH_SAMPLES = 1_000_000
+# 스트레치 작업 버퍼와 NaN 제거에 쓰는 행 블록 크기
+STRETCH_ROWS = 256
+
+
+class MemoryLimitError(MemoryError):
+    """버퍼 풀의 메모리 상한을 넘는 할당 요청"""
+
+
+class BufferPool:
+    """이름별로 미리 할당한 버퍼를 재사용하는 풀"""
+
+    def __init__(self, limit_mb=MEMORY_LIMIT_MB):
+        """
+        limit_mb : float 또는 None
+            풀 전체 버퍼 크기의 상한 (MB), None이면 제한 없음
+        """
+        self.limit_bytes = None
+        self.set_limit(limit_mb)
+        self._buffers = {}  # 이름 -> 1D uint8 버퍼 (요청한 모양/형식으로 view 하여 사용)
+        self.allocations = 0  # 실제로 새로 할당한 횟수 (재사용 확인용)
+
+    def set_limit(self, limit_mb):
+        self.limit_bytes = None if not limit_mb else int(limit_mb * MB)
+
+    @property
+    def nbytes(self):
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def available(self):
+        """상한까지 남은 바이트 수 (제한이 없으면 inf)"""
+        if self.limit_bytes is None:
+            return float("inf")
+        return max(self.limit_bytes - self.nbytes, 0)
+
+    def get(self, name, shape, dtype=np.float32):
+        """
+        name 버퍼를 shape/dtype 배열로 돌려줍니다. 기존 버퍼가 충분히 크면 그대로 재사용하고,
+        작으면 상한 안에서 새로 할당합니다. 내용은 초기화하지 않습니다.
+        """
+        shape = tuple(int(n) for n in shape)
+        dtype = np.dtype(dtype)
+        need = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+
+        buf = self._buffers.get(name)
+        if buf is None or buf.nbytes < need:
+            old = 0 if buf is None else buf.nbytes
+            if self.limit_bytes is not None and self.nbytes - old + need > self.limit_bytes:
+                raise MemoryLimitError(
+                    f"메모리 상한 초과: '{name}' 버퍼 {need / MB:.1f} MB 요청, "
+                    f"사용 중 {(self.nbytes - old) / MB:.1f} MB / 상한 {self.limit_bytes / MB:.0f} MB"
+                )
+            self._buffers.pop(name, None)
+            del buf  # 새로 할당하기 전에 작은 버퍼를 먼저 놓음
+            buf = np.empty(need, dtype=np.uint8)
+            self._buffers[name] = buf
+            self.allocations += 1
+        # 호출마다 새 view 객체를 돌려줌 (배열 객체 기준 캐시가 이전 프레임과 섞이지 않도록)
+        return buf[:need].view(dtype).reshape(shape)
+
+    def release(self, name):
+        """한 번만 쓰는 큰 버퍼(기준 영상 스택 등)를 풀에서 놓음"""
+        self._buffers.pop(name, None)
+
+    def clear(self):
+        self._buffers.clear()
+
+    def report(self):
+        """이름별 버퍼 크기 (MB)"""
+        return {name: buf.nbytes / MB for name, buf in self._buffers.items()}
+
+
+_worker_pool = None
+
+
+def worker_pool(limit_mb=MEMORY_LIMIT_MB):
+    """
+    프로세스마다 하나씩 쓰는 버퍼 풀 (작업 프로세스가 프레임을 차례로 처리할 때 재사용).
+    한 프로세스 안에서 여러 스레드가 동시에 쓰면 안 됩니다.
+    """
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = BufferPool(limit_mb)
+    else:
+        _worker_pool.set_limit(limit_mb)
+    return _worker_pool
+
+
+def fits_dtype(bitpix):
+    """FITS BITPIX에 맞는 부동소수 형식 (32/64비트 정수와 배정밀도는 float64, 나머지는 float32)"""
+    return np.float64 if bitpix in (-64, 32, 64) else np.float32
+
+
+def read_fits(path, pool, name="frame", dtype=np.float64):
+    """
+    FITS에서 데이터가 있는 첫 HDU(주 HDU가 비어 있으면 확장 HDU)를 pool의 name 버퍼로 읽습니다.
+    파일을 메모리 맵으로 열어 원시 데이터를 버퍼에 바로 복사하고
+    BSCALE/BZERO 적용과 NaN → 0 변환을 제자리에서 하므로 프레임 크기의 임시 배열을 만들지 않습니다.
+    기본은 배정밀도입니다. (GUI, 작업 서버, 실시간 측광이 같은 프레임에서 같은 결과를 내도록)
+    dtype이 None이면 BITPIX에 맞는 형식(fits_dtype, 16비트 정수는 float32)으로 읽어 메모리를 아낍니다.
+
+    Returns:
+        (data, header) — header는 데이터를 읽은 HDU의 헤더
+    """
+    from astropy.io import fits
+
+    with fits.open(path, memmap=True, do_not_scale_image_data=True) as hdul:
+        hdu = next((h for h in hdul if h.data is not None), None)
+        if hdu is None:
+            raise ValueError(f"이미지 데이터가 없습니다: {path}")
+        header = hdu.header
+        raw = hdu.data
+        if dtype is None:
+            dtype = fits_dtype(header.get("BITPIX"))
+        data = pool.get(name, raw.shape, dtype)
+        np.copyto(data, raw, casting="unsafe")
+        del raw  # 파일을 닫기 전에 메모리 맵 참조를 놓음
+
+    bscale = header.get("BSCALE", 1.0)
+    bzero = header.get("BZERO", 0.0)
+    if bscale != 1:
+        data *= bscale
+    if bzero:
+        data += bzero
+    # nan_to_num은 copy=False여도 배열 크기의 마스크를 만들므로 행 단위로 처리
+    for start in range(0, data.shape[0], STRETCH_ROWS):
+        np.nan_to_num(data[start:start + STRETCH_ROWS], copy=False)
+    return data, header
+
+
+def display_limits(data, percentiles=(5, 99), max_samples=STRETCH_SAMPLES):
+    """화면 표시 범위 (vmin, vmax). 큰 영상은 격자 간격 표본으로 백분위수를 계산"""
+    step = max(int(np.sqrt(data.size / max_samples)), 1)
+    vmin, vmax = np.percentile(data[::step, ::step], percentiles)
+    return float(vmin), float(vmax)
+
+
+def stretch_to_uint8(data, pool, percentiles=(5, 99), name="display"):
+    """
+    data를 백분위수 범위로 잘라 0-255 8비트 영상으로 만듭니다.
+    결과는 pool의 name 버퍼에 쓰고, 계산은 STRETCH_ROWS 행 크기의 작업 버퍼에서 합니다.
+    """
+    vmin, vmax = display_limits(data, percentiles)
+    scale = 255 / (vmax - vmin) if vmax > vmin else 0.0
+
+    h, w = data.shape
+    out = pool.get(name, (h, w), np.uint8)
+    rows = pool.get(name + "_rows", (min(STRETCH_ROWS, h), w), np.float32)
+    for start in range(0, h, STRETCH_ROWS):
+        block = data[start:start + STRETCH_ROWS]
+        work = rows[:len(block)]
+        np.clip(block, vmin, vmax, out=work, casting="unsafe")
+        work -= vmin
+        work *= scale
+        np.copyto(out[start:start + len(block)], work, casting="unsafe")
+    return out
+
+
+class MemoryReport:
+    """
+    단계별 메모리 사용량 기록 (tracemalloc 사용, NumPy 배열 할당 포함).
+
+        report = MemoryReport(pool)
+        with report.stage("읽기"):
+            data, header = read_fits(path, pool)
+        print("\\n".join(report.lines()))
+
+    각 단계의 최대 사용량은 단계 시작 시점 대비 증가분이며,
+    풀 버퍼와 합쳐 상한을 넘은 단계는 lines()에 [ERROR]로 표시됩니다.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self.stages = {}  # 이름 -> {'count', 'peak', 'retained', 'elapsed'}
+        self._owns_tracing = False
+
+    @contextmanager
+    def stage(self, name):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracing = True
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            entry = self.stages.setdefault(name, {'count': 0, 'peak': 0, 'retained': 0, 'elapsed': 0.0})
+            entry['count'] += 1
+            entry['peak'] = max(entry['peak'], peak - before)
+            entry['retained'] = max(entry['retained'], current - before)
+            entry['elapsed'] += time.perf_counter() - started
+
+    def traced(self):
+        """현재 추적 중인 메모리 (바이트)"""
+        return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+    def stop(self):
+        if self._owns_tracing:
+            tracemalloc.stop()
+            self._owns_tracing = False
+
+    def lines(self):
+        pool_bytes = self.pool.nbytes if self.pool is not None else 0
+        limit = self.pool.limit_bytes if self.pool is not None else None
+        result = [f"{'단계':<10} {'횟수':>5} {'최대(MB)':>10} {'남김(MB)':>10} {'평균(ms)':>10}"]
+        for name, entry in self.stages.items():
+            line = (f"{name:<10} {entry['count']:>5} {entry['peak'] / MB:>10.1f} "
+                    f"{entry['retained'] / MB:>10.1f} {entry['elapsed'] / entry['count'] * 1e3:>10.1f}")
+            if limit is not None and pool_bytes + entry['peak'] > limit:
+                line = "[ERROR] " + line + " (상한 초과)"
+            result.append(line)
+        if self.pool is not None:
+            limit_text = "제한 없음" if limit is None else f"{limit / MB:.0f} MB"
+            result.append(f"버퍼 풀 {pool_bytes / MB:.1f} MB / 상한 {limit_text}, 할당 {self.pool.allocations}회")
+        return result
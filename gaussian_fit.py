@@ -0,0 +1,270 @@
+# gaussian_fit.py
+"""
+여러 별을 한 번에 맞추는 배치 가우시안 PRF 피팅.
+
+photutils의 CircularGaussianPRF(FWHM 고정, 픽셀 적분 가우시안)와 같은 모델을
+쌓아 놓은 절단 이미지들에 Levenberg–Marquardt로 맞춥니다.
+numba가 설치되어 있으면 커널을 컴파일하여 별마다 병렬로 실행하므로
+별이 수천 개인 프레임에서 astropy 모델링/TRFLSQFitter의 파이썬 부담을 피할 수 있습니다.
+numba가 없으면 같은 코드를 순수 파이썬으로 실행합니다. (결과는 같지만 느림)
+"""
+
+import math
+
+import numpy as np
+
+from centroid import annulus_background, stack_cutouts
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# 피팅 결과 형식 (photutils PSFPhotometry 결과 열 이름과 맞춤)
+FIT_DTYPE = np.dtype([
+    ("x_fit", "f8"), ("y_fit", "f8"), ("flux_fit", "f8"),
+    ("x_err", "f8"), ("y_err", "f8"), ("flux_err", "f8"),
+    ("local_bkg", "f8"), ("iter_count", "i4"), ("flags", "i4"),
+])
+
+# flags 비트
+FLAG_NOT_CONVERGED = 1
+FLAG_OUTSIDE = 2
+
+_SQRT2 = math.sqrt(2.0)
+_SQRT2PI = math.sqrt(2.0 * math.pi)
+
+
+@njit(cache=True)
+def _pixel_integrals(n, offset, center, sigma, values, derivs):
+    """픽셀 [u-0.5, u+0.5] 구간의 1D 가우시안 적분과 center에 대한 미분"""
+    s2 = _SQRT2 * sigma
+    for k in range(n):
+        a = (offset + k - center + 0.5) / s2
+        b = (offset + k - center - 0.5) / s2
+        values[k] = 0.5 * (math.erf(a) - math.erf(b))
+        derivs[k] = (math.exp(-b * b) - math.exp(-a * a)) / (_SQRT2PI * sigma)
+
+
+@njit(cache=True)
+def _normal_equations(cut, ox, oy, sigma, p, jtj, jtr, ix, dix, iy, diy):
+    """현재 매개변수 p = (flux, x0, y0)에서 chi2와 정규방정식(JᵀJ, Jᵀr)을 계산"""
+    ny, nx = cut.shape
+    _pixel_integrals(nx, ox, p[1], sigma, ix, dix)
+    _pixel_integrals(ny, oy, p[2], sigma, iy, diy)
+    for a in range(3):
+        jtr[a] = 0.0
+        for b in range(3):
+            jtj[a, b] = 0.0
+
+    chi2 = 0.0
+    n = 0
+    j = np.empty(3)
+    for r in range(ny):
+        for c in range(nx):
+            value = cut[r, c]
+            if value != value:  # NaN (이미지 밖)
+                continue
+            base = ix[c] * iy[r]
+            resid = value - p[0] * base
+            j[0] = base
+            j[1] = p[0] * dix[c] * iy[r]
+            j[2] = p[0] * ix[c] * diy[r]
+            chi2 += resid * resid
+            n += 1
+            for a in range(3):
+                jtr[a] += j[a] * resid
+                for b in range(3):
+                    jtj[a, b] += j[a] * j[b]
+    return chi2, n
+
+
+@njit(cache=True)
+def _inverse3(m, out):
+    """3x3 행렬 역행렬 (특이행렬이면 False)"""
+    det = (m[0, 0] * (m[1, 1] * m[2, 2] - m[1, 2] * m[2, 1])
+           - m[0, 1] * (m[1, 0] * m[2, 2] - m[1, 2] * m[2, 0])
+           + m[0, 2] * (m[1, 0] * m[2, 1] - m[1, 1] * m[2, 0]))
+    if det == 0.0 or det != det:
+        return False
+    out[0, 0] = (m[1, 1] * m[2, 2] - m[1, 2] * m[2, 1]) / det
+    out[0, 1] = (m[0, 2] * m[2, 1] - m[0, 1] * m[2, 2]) / det
+    out[0, 2] = (m[0, 1] * m[1, 2] - m[0, 2] * m[1, 1]) / det
+    out[1, 0] = (m[1, 2] * m[2, 0] - m[1, 0] * m[2, 2]) / det
+    out[1, 1] = (m[0, 0] * m[2, 2] - m[0, 2] * m[2, 0]) / det
+    out[1, 2] = (m[0, 2] * m[1, 0] - m[0, 0] * m[1, 2]) / det
+    out[2, 0] = (m[1, 0] * m[2, 1] - m[1, 1] * m[2, 0]) / det
+    out[2, 1] = (m[0, 1] * m[2, 0] - m[0, 0] * m[2, 1]) / det
+    out[2, 2] = (m[0, 0] * m[1, 1] - m[0, 1] * m[1, 0]) / det
+    return True
+
+
+@njit(cache=True)
+def _fit_one(cut, ox, oy, sigma, p, perr, maxiter, xtol):
+    """별 하나 LM 피팅. p를 제자리에서 갱신하고 (반복 횟수, 수렴 여부) 반환"""
+    ny, nx = cut.shape
+    ix, dix = np.empty(nx), np.empty(nx)
+    iy, diy = np.empty(ny), np.empty(ny)
+    jtj, jtr = np.empty((3, 3)), np.empty(3)
+    jtj_new, jtr_new = np.empty((3, 3)), np.empty(3)
+    damped, inv = np.empty((3, 3)), np.empty((3, 3))
+    trial = np.empty(3)
+
+    lam = 1e-3
+    chi2, n = _normal_equations(cut, ox, oy, sigma, p, jtj, jtr, ix, dix, iy, diy)
+    converged = False
+    it = 0
+    while it < maxiter:
+        it += 1
+        for a in range(3):
+            for b in range(3):
+                damped[a, b] = jtj[a, b]
+            damped[a, a] = jtj[a, a] * (1.0 + lam)
+        if not _inverse3(damped, inv):
+            break
+        for a in range(3):
+            trial[a] = p[a] + inv[a, 0] * jtr[0] + inv[a, 1] * jtr[1] + inv[a, 2] * jtr[2]
+
+        chi2_new, n_new = _normal_equations(cut, ox, oy, sigma, trial, jtj_new, jtr_new, ix, dix, iy, diy)
+        if chi2_new <= chi2:
+            step = max(abs(trial[1] - p[1]), abs(trial[2] - p[2]))
+            flux_step = abs(trial[0] - p[0]) / max(abs(p[0]), 1e-12)
+            for a in range(3):
+                p[a] = trial[a]
+                jtr[a] = jtr_new[a]
+                for b in range(3):
+                    jtj[a, b] = jtj_new[a, b]
+            chi2 = chi2_new
+            lam = max(lam * 0.1, 1e-12)
+            if step < xtol and flux_step < xtol:
+                converged = True
+                break
+        else:
+            lam *= 10.0
+            if lam > 1e12:
+                converged = True  # 더 이상 개선되지 않음 (최소점)
+                break
+
+    # 공분산 = (JᵀJ)⁻¹ · 잔차분산
+    for a in range(3):
+        perr[a] = np.nan
+    if n > 3 and _inverse3(jtj, inv):
+        scale = chi2 / (n - 3)
+        for a in range(3):
+            perr[a] = math.sqrt(abs(inv[a, a]) * scale)
+    return it, converged
+
+
+@njit(parallel=True, cache=True)
+def _fit_batch(cutouts, ox, oy, sigma, params, errors, iters, converged, maxiter, xtol):
+    for k in prange(cutouts.shape[0]):
+        it, ok = _fit_one(cutouts[k], ox[k], oy[k], sigma, params[k], errors[k], maxiter, xtol)
+        iters[k] = it
+        converged[k] = ok
+
+
+def fit_gaussian_prf_batch(data, positions, fwhm, fit_size=None, local_background=True,
+                           maxiter=100, xtol=1e-6):
+    """
+    FWHM이 고정된 픽셀 적분 가우시안(CircularGaussianPRF와 같은 모델)을 여러 별에 한 번에 맞춥니다.
+
+    Parameters:
+        data : 2D numpy array
+        positions : (N, 2) 초기 좌표
+        fwhm : float
+            고정할 PSF FWHM
+        fit_size : int 또는 None
+            피팅 영역 크기 (None이면 photutils 경로와 같은 FWHM * 6의 홀수)
+        local_background : bool
+            별마다 고리(2~4 FWHM)의 MMM 배경을 빼고 피팅 (배경 지도를 미리 뺀 영상이면 False)
+
+    Returns:
+        FIT_DTYPE 구조체 배열 (flags: 1 = 수렴 실패, 2 = 피팅 영역 밖으로 이동)
+    """
+    positions = np.atleast_2d(np.asarray(positions, dtype=np.float64)).reshape(-1, 2)
+    n = len(positions)
+    result = np.zeros(n, dtype=FIT_DTYPE)
+    if n == 0:
+        return result
+
+    if fit_size is None:
+        fit_size = int(round(fwhm * 6))
+    fit_size = int(fit_size) | 1
+    half = fit_size // 2
+    sigma = fwhm / 2.3548
+
+    xs = np.rint(positions[:, 0]).astype(np.intp)
+    ys = np.rint(positions[:, 1]).astype(np.intp)
+    cutouts, ox, oy = stack_cutouts(data, xs, ys, fit_size)
+
+    local_bkg = np.zeros(n)
+    if local_background:
+        local_bkg = annulus_background(data, positions, int(round(fwhm * 2)), int(round(fwhm * 4)))
+        cutouts -= local_bkg[:, None, None]
+
+    params = np.empty((n, 3))
+    params[:, 0] = np.clip(np.nansum(cutouts, axis=(1, 2)), 1e-3, None)
+    params[:, 1] = positions[:, 0]
+    params[:, 2] = positions[:, 1]
+    errors = np.empty((n, 3))
+    iters = np.zeros(n, dtype=np.int32)
+    converged = np.zeros(n, dtype=np.bool_)
+
+    _fit_batch(np.ascontiguousarray(cutouts), ox.astype(np.float64), oy.astype(np.float64),
+               float(sigma), params, errors, iters, converged, int(maxiter), float(xtol))
+
+    result["flux_fit"], result["x_fit"], result["y_fit"] = params.T
+    result["flux_err"], result["x_err"], result["y_err"] = errors.T
+    result["local_bkg"] = local_bkg
+    result["iter_count"] = iters
+    outside = (np.abs(params[:, 1] - xs) > half) | (np.abs(params[:, 2] - ys) > half)
+    result["flags"] = np.where(converged, 0, FLAG_NOT_CONVERGED) | np.where(outside, FLAG_OUTSIDE, 0)
+    return result
+
+
+def compare_with_photutils(data, positions, fwhm, local_background=True):
+    """
+    같은 별들을 photutils 경로(PSFPhotometry + TRFLSQFitter)와 배치 피팅으로 각각 측광하여
+    결과 차이와 소요 시간을 반환합니다.
+
+    Returns:
+        dict : {
+            'n', 'time_photutils', 'time_batch', 'max_dx', 'max_dy',
+            'median_dflux', 'max_dflux' (상대 차이)
+        }
+    """
+    import time
+    from astropy.table import Table
+    from photometry import get_psf_photometry
+
+    positions = np.atleast_2d(np.asarray(positions, dtype=np.float64))
+    # 배치 피팅과 같은 모델/배경 추정기의 photutils 경로
+    phot = get_psf_photometry(
+        fwhm, local_background, {"fitter": "trf", "psf_model": "gaussian_prf", "background": "mmm"}
+    )
+
+    t0 = time.perf_counter()
+    reference = phot(data, init_params=Table(rows=[tuple(p) for p in positions], names=["x_0", "y_0"]))
+    t1 = time.perf_counter()
+    batch = fit_gaussian_prf_batch(data, positions, fwhm, local_background=local_background)
+    t2 = time.perf_counter()
+
+    ref_flux = np.asarray(reference["flux_fit"])
+    dflux = np.abs(batch["flux_fit"] - ref_flux) / np.abs(ref_flux)
+    return {
+        'n': len(positions),
+        'time_photutils': t1 - t0,
+        'time_batch': t2 - t1,
+        'max_dx': float(np.nanmax(np.abs(batch["x_fit"] - reference["x_fit"]))),
+        'max_dy': float(np.nanmax(np.abs(batch["y_fit"] - reference["y_fit"]))),
+        'median_dflux': float(np.nanmedian(dflux)),
+        'max_dflux': float(np.nanmax(dflux)),
+    }
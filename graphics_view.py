@@ -3,12 +3,19 @@
 from PySide6.QtWidgets import (
     QGraphicsView, QGraphicsRectItem, QGraphicsEllipseItem, QGraphicsTextItem
 )
-from PySide6.QtCore import Qt, QRectF
+from PySide6.QtCore import Qt, QRectF, QTimer
 from PySide6.QtGui import QWheelEvent, QMouseEvent, QPen
 
+from collections import OrderedDict
+
 import numpy as np
-from astropy.stats import sigma_clipped_stats
-from photutils.detection import IRAFStarFinder
+
+from star_profile import find_local_peak, measure_star
+
+# 호버 검사 갱신 간격(ms): 화면 주사율(약 60 Hz)보다 자주 계산하지 않음
+INSPECT_INTERVAL_MS = 16
+# 호버 검사 결과를 기억할 별 개수
+INSPECT_CACHE_SIZE = 256
 
 class GraphicsView(QGraphicsView):
     def __init__(self, parent=None):
@@ -32,6 +39,20 @@ class GraphicsView(QGraphicsView):
         self._star_items_comp = []
         self.coords_comp = []
 
+        # 프레임 배경/RMS 지도를 검출에 사용할지 여부
+        self.use_background_map = True
+
+        # 호버 검사 모드 상태
+        self._inspecting = False
+        self._inspect_callback = None
+        self._inspect_pos = None
+        self._inspect_cache = OrderedDict()  # (x_peak, y_peak) -> measure_star 결과
+        self._inspect_items = []
+        self._inspect_timer = QTimer(self)
+        self._inspect_timer.setSingleShot(True)
+        self._inspect_timer.setInterval(INSPECT_INTERVAL_MS)
+        self._inspect_timer.timeout.connect(self._run_inspect)
+
 
     def set_detection_params(self, fwhm, threshold, sigma_clip):
         self.fwhm_value = fwhm
@@ -39,8 +60,13 @@ class GraphicsView(QGraphicsView):
         self.sigma_clipping_value = sigma_clip
 
 
+    def set_background_map_enabled(self, enabled):
+        self.use_background_map = enabled
+
+
     def set_image_data(self, data):
         self._image_data = data
+        self._inspect_cache.clear()
 
 
     def wheelEvent(self, event: QWheelEvent):
@@ -88,7 +114,75 @@ class GraphicsView(QGraphicsView):
         # self.textBrowser.append(f"[INFO] 영역 선택 모드 활성화 ({'측광 대상' if target_type == 'target' else '비교성'})")
        
 
+    def set_inspect_mode(self, enabled, callback=None):
+        """
+        호버 검사 모드 설정. 활성화되면 마우스 아래 픽셀 값과 별의 국소 중심,
+        방사 프로파일, FWHM을 계산하여 callback(info)으로 전달합니다.
+        계산은 INSPECT_INTERVAL_MS 간격으로 제한되고 별마다 캐시됩니다.
+        """
+        self._inspecting = enabled
+        self._inspect_callback = callback
+        if not enabled:
+            self._inspect_timer.stop()
+            self._inspect_pos = None
+            self._clear_inspect_items()
+
+
+    def _clear_inspect_items(self):
+        for item in self._inspect_items:
+            if item.scene() is not None:
+                item.scene().removeItem(item)
+        self._inspect_items.clear()
+
+
+    def _run_inspect(self):
+        data = self._image_data
+        pos = self._inspect_pos
+        if not self._inspecting or data is None or pos is None:
+            return
+
+        h, w = data.shape
+        xi, yi = int(pos.x()), int(pos.y())
+        if not (0 <= xi < w and 0 <= yi < h):
+            return
+
+        info = {'x': xi, 'y': yi, 'pixel_value': float(data[yi, xi]), 'star': None}
+
+        # 같은 별 위에서 마우스가 움직이는 동안은 캐시된 결과를 재사용
+        key = find_local_peak(data, xi, yi)
+        star = self._inspect_cache.get(key)
+        if star is None:
+            star = measure_star(data, *key, search=0)
+            self._inspect_cache[key] = star
+            if len(self._inspect_cache) > INSPECT_CACHE_SIZE:
+                self._inspect_cache.popitem(last=False)
+        else:
+            self._inspect_cache.move_to_end(key)
+
+        self._clear_inspect_items()
+        if star is not None and star['is_star']:
+            info['star'] = star
+            cx, cy = star['x_centroid'], star['y_centroid']
+            radius = star['fwhm'] / 2 if np.isfinite(star['fwhm']) else 3
+            pen = QPen(Qt.yellow)
+            pen.setWidthF(0.3)
+            marker = QGraphicsEllipseItem(cx - radius, cy - radius, radius * 2, radius * 2)
+            marker.setPen(pen)
+            marker.setBrush(Qt.NoBrush)
+            self.scene().addItem(marker)
+            self._inspect_items.append(marker)
+
+        if self._inspect_callback:
+            self._inspect_callback(info)
+
+
     def mouseMoveEvent(self, event: QMouseEvent):
+        if self._inspecting:
+            # 최신 위치만 기억하고, 계산은 타이머가 몰아서 한 번만 수행
+            self._inspect_pos = self.mapToScene(event.pos())
+            if not self._inspect_timer.isActive():
+                self._inspect_timer.start()
+
         if self._selecting and self._selection_origin is not None and self._selection_rect_item is not None:
             current_pos = self.mapToScene(event.pos())
             rect = QRectF(self._selection_origin, current_pos).normalized()
@@ -116,49 +210,25 @@ class GraphicsView(QGraphicsView):
                 # self.textBrowser.append("[WARN] 선택 영역이 유효하지 않음")
                 return
 
-            # 더 나은 별 검출을 위해 photutils의 IRAFStarFinder 사용 (더 정교한 PSF 기반)
-            mean, median, std = sigma_clipped_stats(sub_img, sigma=self.sigma_clipping_value)
-            # IRAFStarFinder는 PSF의 sigma(표준편차) 단위로 입력받음 (fwhm = 2.3548 * sigma)
-            sigma_psf = self.fwhm_value / 2.3548
-            star_finder = IRAFStarFinder(threshold=self.threshold_value * std, fwhm=self.fwhm_value, sigma_radius=sigma_psf)
-            sources = star_finder(sub_img - median)
-
-            if sources is not None:
-                for x, y in zip(sources['xcentroid'], sources['ycentroid']):
-                    abs_x = x1 + x
-                    abs_y = y1 + y
-
-                    # 시각화 (얇은 뚫린 원)
-                    radius = 6
-                    pen = QPen(Qt.red)
-                    pen.setWidthF(0.5)
-                    ellipse = QGraphicsEllipseItem(abs_x - radius, abs_y - radius, radius * 2, radius * 2)
-                    ellipse.setPen(pen)
-                    ellipse.setBrush(Qt.NoBrush)
-                    self.scene().addItem(ellipse)
-
-                    # '측광 대상' 텍스트 추가
-                    if self._region_target_type == "target":
-                        text_item = QGraphicsTextItem("측광 대상")
-                        text_item.setDefaultTextColor(Qt.red)
-                        pen = QPen(Qt.red)
-                    else:
-                        text_item = QGraphicsTextItem("비교성")
-                        text_item.setDefaultTextColor(Qt.blue)
-                        pen = QPen(Qt.blue)
-                    
-                    pen.setWidthF(0.5)
-                    ellipse.setPen(pen)
-                    text_item.setPos(abs_x + radius + 2, abs_y - radius)
-                    self.scene().addItem(text_item)
-
-                    # 마커와 텍스트를 리스트에 저장
-                    if self._region_target_type == "target":
-                        self._star_items_target.append((ellipse, text_item))
-                        self.coords_target.append((abs_x, abs_y))
-                    else:
-                        self._star_items_comp.append((ellipse, text_item))
-                        self.coords_comp.append((abs_x, abs_y))
+            # 큰 영역(모자이크 전체 등)은 겹치는 타일로 나누어 여러 프로세스에서 병렬 검출
+            from detection import detect_sources_tiled
+
+            background = rms = None
+            if self.use_background_map:
+                # 프레임당 한 번 계산된 배경/RMS 지도에서 선택 영역만 잘라 사용
+                from background_map import get_background
+
+                bkg_map, rms_map = get_background(self._image_data, sigma=self.sigma_clipping_value)
+                region = (slice(int(y1), int(y1 + h)), slice(int(x1), int(x1 + w)))
+                background, rms = bkg_map[region], rms_map[region]
+
+            sources = detect_sources_tiled(
+                sub_img, self.fwhm_value, self.threshold_value, self.sigma_clipping_value,
+                background=background, rms=rms,
+            )
+
+            for x, y in zip(sources['x'], sources['y']):
+                self.add_star_marker(x1 + x, y1 + y, self._region_target_type)
 
             if self._region_target_type == "target":
                 # self.textBrowser.append(f"[INFO] 감지된 측광 대상 별 개수: {len(self.coords_target)}")
@@ -177,6 +247,37 @@ class GraphicsView(QGraphicsView):
             super().mouseReleaseEvent(event)
 
 
+    def add_star_marker(self, x, y, target_type="target", label=None):
+        """
+        (x, y)에 별 마커(얇은 뚫린 원)와 텍스트를 추가하고 좌표를 저장합니다.
+        target_type: "target"이면 빨간색/측광 대상, "comp"이면 파란색/비교성
+        """
+        radius = 6
+        color = Qt.red if target_type == "target" else Qt.blue
+        if label is None:
+            label = "측광 대상" if target_type == "target" else "비교성"
+
+        pen = QPen(color)
+        pen.setWidthF(0.5)
+        ellipse = QGraphicsEllipseItem(x - radius, y - radius, radius * 2, radius * 2)
+        ellipse.setPen(pen)
+        ellipse.setBrush(Qt.NoBrush)
+        self.scene().addItem(ellipse)
+
+        text_item = QGraphicsTextItem(label)
+        text_item.setDefaultTextColor(color)
+        text_item.setPos(x + radius + 2, y - radius)
+        self.scene().addItem(text_item)
+
+        # 마커와 텍스트를 리스트에 저장
+        if target_type == "target":
+            self._star_items_target.append((ellipse, text_item))
+            self.coords_target.append((x, y))
+        else:
+            self._star_items_comp.append((ellipse, text_item))
+            self.coords_comp.append((x, y))
+
+
     def enable_manual_star_selection(self, callback, target_type="target"):
         """
         수동 별 선택 모드 활성화. 사용자가 마우스 클릭으로 별 위치를 직접 지정할 수 있습니다.
@@ -203,34 +304,7 @@ class GraphicsView(QGraphicsView):
             x, y = np.float64(scene_pos.x()), np.float64(scene_pos.y())
 
             # 마커 추가
-            radius = 6
-            ellipse = QGraphicsEllipseItem(x - radius, y - radius, radius * 2, radius * 2)
-            ellipse.setBrush(Qt.NoBrush)
-            self.scene().addItem(ellipse)
-            
-            if self._region_target_type == "target":
-                text_item = QGraphicsTextItem("측광 대상")
-                text_item.setDefaultTextColor(Qt.red)
-                text_item.setPos(x + radius + 2, y - radius)
-                self.scene().addItem(text_item)
-                pen = QPen(Qt.red)
-            else:
-                text_item = QGraphicsTextItem("비교성")
-                text_item.setDefaultTextColor(Qt.blue)
-                text_item.setPos(x + radius + 2, y - radius)
-                self.scene().addItem(text_item)
-                pen = QPen(Qt.blue)
-
-            pen.setWidthF(0.5)
-            ellipse.setPen(pen)
-
-            # 마커와 텍스트를 리스트에 저장
-            if self._region_target_type == "target":
-                self._star_items_target.append((ellipse, text_item))
-                self.coords_target.append((x, y))
-            else:
-                self._star_items_comp.append((ellipse, text_item))
-                self.coords_comp.append((x, y))
+            self.add_star_marker(x, y, self._region_target_type)
 
             # self.textBrowser.append(f"[INFO] 수동 선택 별 좌표: ({x:.1f}, {y:.1f})")
 
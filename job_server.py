@@ -0,0 +1,336 @@
+# job_server.py
+"""
+AstroPSF 헤드리스 작업 서버.
+
+Qt 창 없이 PSF 측광 파이프라인을 로컬 HTTP(또는 Unix 소켓) API로 제공합니다.
+작업은 큐에 쌓이고, 크기가 제한된 작업 프로세스 풀이 처리합니다.
+작업 프로세스는 계속 살아 있으므로 astropy/photutils import와 PSF 모델 캐시를 재사용합니다.
+
+실행:
+    python job_server.py --port 8765 --workers 2
+    python job_server.py --unix /tmp/astropsf.sock
+
+API (JSON):
+    GET  /health            서버 상태 (작업 프로세스 수, 대기 작업 수)
+    POST /jobs              작업 제출 → 202 {"id": ...}
+        {
+            "path": "/data/frame_0001.fits",     # 서버에서 읽을 FITS 경로
+            "fits_base64": "...",                # 또는 FITS 파일 내용 (base64)
+            "target": [[x, y], ...],             # 측광 대상 좌표
+            "comp": [[x, y], ...],               # 비교성 좌표
+            "comp_mag": 10.0,                    # 비교성 겉보기 등급 (비교성마다의 목록이면 앙상블)
+            "fwhm": 4.7,                         # (선택) PSF FWHM, 없으면 추정
+            "detection_fwhm": 5.0,               # (선택) 중심 보정용 대략적 FWHM
+            "gain": 1.4, "read_noise": 9.0,      # (선택) e-/ADU, e- (없으면 헤더 GAIN/RDNOISE)
+            "backends": {"fitter": "batch"}      # (선택) 서버 설정에서 바꿀 백엔드 (backends.py)
+        }
+    GET  /jobs/<id>         작업 상태와 결과 (status: queued/running/done/failed)
+"""
+
+import argparse
+import base64
+import io
+import json
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import backends
+
+DEFAULT_PORT = 8765
+# 대기 중인 작업이 이보다 많으면 새 작업을 거절(503)
+MAX_PENDING_JOBS = 256
+# 완료된 작업 결과를 기억할 개수
+MAX_FINISHED_JOBS = 1024
+
+
+# ------------------------------------------------
+# 작업 프로세스에서 실행되는 함수
+# ------------------------------------------------
+
+
+def _warm_worker():
+    """작업 프로세스 시작 시 무거운 모듈을 미리 불러옴"""
+    from lazy_imports import preload_heavy_modules
+    preload_heavy_modules().join()
+
+
+def _load_frame(payload):
+    from astropy.io import fits
+    import numpy as np
+
+    from frame_buffers import read_fits, worker_pool
+
+    if payload.get("path"):
+        # 작업 프로세스의 버퍼 풀에 읽음 (작업마다 프레임 크기 배열을 새로 만들지 않음)
+        return read_fits(payload["path"], worker_pool())
+    elif payload.get("fits_base64"):
+        raw = base64.b64decode(payload["fits_base64"])
+        with fits.open(io.BytesIO(raw)) as hdul:
+            hdu = next((hdu for hdu in hdul if hdu.data is not None), None)
+            if hdu is None:
+                raise ValueError("이미지 데이터가 없습니다")
+            data, header = hdu.data, hdu.header
+    else:
+        raise ValueError("'path' 또는 'fits_base64'가 필요합니다.")
+    return np.nan_to_num(np.asarray(data, dtype=np.float64)), header
+
+
+def _json_float(value):
+    """NaN/inf는 표준 JSON에 없으므로 null로"""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def _table_rows(table):
+    columns = [c for c in ("x_fit", "y_fit", "flux_fit", "flux_err", "flux_err_ccd", "flux_err_total",
+                           "snr", "qfit", "flags") if c in table.colnames]
+    return [{c: _json_float(row[c]) for c in columns} for row in table]
+
+
+def _comp_mag(value):
+    """비교성 등급 하나 또는 비교성마다의 등급 목록 (목록이면 앙상블 등급)"""
+    if isinstance(value, list):
+        return [float(v) for v in value]
+    return float(value)
+
+
+def run_job(payload):
+    """프레임 하나에 PSF 측광을 수행하고 JSON으로 바꿀 수 있는 결과를 반환"""
+    from photometric_errors import ccd_parameters
+    from photometry import run_psf_photometry
+
+    started = time.perf_counter()
+    data, header = _load_frame(payload)
+    result = run_psf_photometry(
+        data,
+        [tuple(p) for p in payload.get("target", [])],
+        [tuple(p) for p in payload.get("comp", [])],
+        _comp_mag(payload.get("comp_mag", 10.0)),
+        fwhm=payload.get("fwhm"),
+        detection_fwhm=payload.get("detection_fwhm"),
+        backends=payload.get("backends"),
+        ccd=ccd_parameters(header, payload.get("gain"), payload.get("read_noise")),
+    )
+    return {
+        "mag": _json_float(result["mag"]),
+        "mag_err": _json_float(result["mag_err"]),
+        "fwhm": _json_float(result["fwhm"]),
+        "target": _table_rows(result["target_result"]),
+        "comp": _table_rows(result["comp_result"]),
+        "elapsed": time.perf_counter() - started,
+        "worker_pid": os.getpid(),
+    }
+
+
+# ------------------------------------------------
+# 작업 큐
+# ------------------------------------------------
+
+
+class JobQueue:
+    """작업 제출/조회와 완료 결과 보관을 담당 (HTTP 처리 스레드들이 공유)"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = self._new_executor()
+        self._jobs = OrderedDict()
+        self._futures = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+
+    def submit(self, payload):
+        """
+        작업을 큐에 넣고 작업 id를 반환합니다. 대기 작업이 너무 많으면 None.
+        작업 프로세스 풀에 넣지 못하면 작업을 실패로 기록하고 예외를 그대로 냅니다.
+        """
+        with self._lock:
+            if self._pending >= MAX_PENDING_JOBS:
+                return None
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {"id": job_id, "status": "queued", "submitted": time.time()}
+            self._pending += 1
+
+        try:
+            future = self._executor.submit(run_job, payload)
+        except Exception as e:
+            with self._lock:
+                job = self._jobs[job_id]
+                job.update(status="failed", error=f"{type(e).__name__}: {e}", finished=time.time())
+                self._pending -= 1
+                if isinstance(e, BrokenProcessPool):
+                    # 작업 프로세스가 비정상 종료된 풀은 다시 쓸 수 없으므로 다음 작업부터 새 풀 사용
+                    self._executor.shutdown(wait=False)
+                    self._executor = self._new_executor()
+            raise
+        with self._lock:
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id, future):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["finished"] = time.time()
+            try:
+                job["result"] = future.result()
+                job["status"] = "done"
+            except Exception as e:
+                job["error"] = f"{type(e).__name__}: {e}"
+                job["status"] = "failed"
+            self._futures.pop(job_id, None)
+            self._pending -= 1
+            self._evict()
+
+    def _evict(self):
+        finished = [k for k, j in self._jobs.items() if j["status"] in ("done", "failed")]
+        for job_id in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            job = dict(job)
+            future = self._futures.get(job_id)
+            if job["status"] == "queued" and future is not None and future.running():
+                job["status"] = "running"
+            return job
+
+    def stats(self):
+        with self._lock:
+            return {"status": "ok", "workers": self.workers, "pending": self._pending}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------------------------------------
+# HTTP 처리
+# ------------------------------------------------
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    server_version = "AstroPSF-JobServer/1.0"
+
+    def _send_json(self, status, body):
+        # 결과의 NaN/inf는 run_job()에서 null로 바꾸므로 표준 JSON만 내보냄
+        data = json.dumps(body, ensure_ascii=False, allow_nan=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        queue = self.server.job_queue
+        if self.path == "/health":
+            self._send_json(200, queue.stats())
+        elif self.path.startswith("/jobs/"):
+            job = queue.get(self.path[len("/jobs/"):])
+            if job is None:
+                self._send_json(404, {"error": "작업을 찾을 수 없습니다."})
+            else:
+                self._send_json(200, job)
+        else:
+            self._send_json(404, {"error": "알 수 없는 경로입니다."})
+
+    def do_POST(self):
+        from photometric_errors import ccd_parameters
+
+        if self.path != "/jobs":
+            self._send_json(404, {"error": "알 수 없는 경로입니다."})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError("JSON 객체가 필요합니다.")
+            if not payload.get("target") or not payload.get("comp"):
+                raise ValueError("'target'과 'comp' 좌표가 필요합니다.")
+            if not isinstance(payload.get("backends", {}), dict):
+                raise ValueError("'backends'는 JSON 객체여야 합니다.")
+            try:
+                # 이득/읽기 잡음 값 검사 (0 이하의 이득 등은 작업을 보내기 전에 거절)
+                ccd_parameters(None, payload.get("gain"), payload.get("read_noise"))
+            except TypeError:
+                raise ValueError("'gain'과 'read_noise'는 숫자여야 합니다.")
+            # 작업 프로세스가 서버와 같은 구현을 쓰도록 전체 설정으로 바꿔서 전달
+            payload["backends"] = backends.resolve(payload.get("backends"))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        try:
+            job_id = self.server.job_queue.submit(payload)
+        except Exception as e:
+            self._send_json(500, {"error": f"작업을 시작하지 못했습니다: {type(e).__name__}: {e}"})
+            return
+        if job_id is None:
+            self._send_json(503, {"error": "대기 중인 작업이 너무 많습니다."})
+        else:
+            self._send_json(202, {"id": job_id, "status": "queued"})
+
+    def address_string(self):
+        # Unix 소켓 연결은 client_address가 비어 있음
+        return self.client_address[0] if self.client_address else "unix"
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(job_queue, host="127.0.0.1", port=DEFAULT_PORT, unix_socket=None):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixHTTPServer(unix_socket, JobRequestHandler)
+    else:
+        server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.job_queue = job_queue
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AstroPSF 헤드리스 측광 작업 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="TCP 대신 사용할 Unix 소켓 경로")
+    parser.add_argument("--workers", type=int, default=max((os.cpu_count() or 2) - 1, 1),
+                        help="작업 프로세스 수")
+    parser.add_argument("--backends", metavar="JSON", default=backends.CONFIG_FILE,
+                        help="백엔드 설정 파일 (기본: 프로그램 폴더의 backends.json)")
+    args = parser.parse_args(argv)
+
+    print(f"[INFO] 백엔드 설정: {backends.load_config(args.backends)}")
+    job_queue = JobQueue(args.workers)
+    server = make_server(job_queue, args.host, args.port, args.unix)
+    where = args.unix or f"http://{args.host}:{args.port}"
+    print(f"[INFO] AstroPSF 작업 서버 시작: {where} (작업 프로세스 {args.workers}개)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        job_queue.shutdown()
+        if args.unix and os.path.exists(args.unix):
+            os.remove(args.unix)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+# lazy_imports.py
+
+import importlib
+import threading
+
+# 프로그램 시작 시점에는 필요 없지만 import에 오래 걸리는 모듈 목록
+# (첫 FITS 파일을 열거나 측광을 시작할 때 비로소 사용됨)
+HEAVY_MODULES = (
+    "astropy.io.fits",
+    "astropy.table",
+    "astropy.stats",
+    "astropy.modeling.fitting",
+    "scipy.optimize",
+    "scipy.fft",
+    "scipy.spatial",
+    "photutils.background",
+    "photutils.detection",
+    "photutils.psf",
+    "numba",  # 선택 의존성 (배치 가우시안 피팅), 없으면 건너뜀
+)
+
+_preload_thread = None
+
+
+def _import_all(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            # 미리 불러오기는 최적화일 뿐이므로 실패해도 무시
+            # (실제 사용 시점의 import에서 오류가 드러남)
+            pass
+
+
+def preload_heavy_modules(modules=HEAVY_MODULES):
+    """
+    무거운 모듈을 백그라운드 스레드에서 미리 import 합니다.
+    창이 표시된 뒤 호출하면 첫 파일 열기/측광 시 대기 시간이 줄어듭니다.
+    이미 실행 중이면 새 스레드를 만들지 않습니다.
+    """
+    global _preload_thread
+    if _preload_thread is not None:
+        return _preload_thread
+
+    _preload_thread = threading.Thread(
+        target=_import_all, args=(tuple(modules),), name="preload-heavy-modules", daemon=True
+    )
+    _preload_thread.start()
+    return _preload_thread
@@ -0,0 +1,350 @@
+# live_reduction.py
+"""
+관측 중 실시간 측광 (폴더 감시).
+
+촬영 프로그램이 FITS 파일을 쓰는 폴더를 주기적으로 확인하여
+다 쓰인 새 파일을 찾고(FolderWatcher), 작업 프로세스 풀에서
+불러오기 → 별 검출(기준 프레임 대비 이동량 추정) → 측광을 수행합니다(LiveReducer).
+Qt에 의존하지 않으므로 MainWindow는 타이머로 poll()/collect()만 호출합니다.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# 압축 파일(.fz 타일 압축, .gz 전체 압축)도 포함
+FITS_SUFFIXES = (".fits", ".fit", ".fts", ".fz", ".fits.gz", ".fit.gz", ".fts.gz")
+# 파일 크기와 수정 시각이 이 시간(초) 동안 바뀌지 않아야 다 쓰인 것으로 봄
+SETTLE_S = 0.5
+FITS_BLOCK = 2880
+# 측광 대상의 S/N이 이보다 낮은 프레임은 이동 속도 추정에 쓰지 않음
+TRACK_MIN_SNR = 5.0
+# 이동 속도를 맞출 때 쓰는 최근 측정 위치 수
+TRACK_POINTS = 8
+
+
+def _read_header(f):
+    """
+    f의 현재 위치에서 헤더 하나를 읽어 {키워드: 값 문자열}을 반환합니다.
+    HDU 경계에서 파일이 끝나면 None, 헤더 중간에서 끝나면 ValueError.
+    """
+    cards = {}
+    first = True
+    while True:
+        block = f.read(FITS_BLOCK)
+        if first and not block:
+            return None
+        if len(block) < FITS_BLOCK:
+            raise ValueError("헤더가 다 쓰이지 않았습니다.")
+        first = False
+        text = block.decode("ascii", errors="replace")
+        for i in range(0, FITS_BLOCK, 80):
+            card = text[i:i + 80]
+            key = card[:8].strip()
+            if key == "END":
+                return cards
+            if card[8:10] == "= ":
+                cards[key] = card[10:].split("/")[0].strip()
+
+
+def _data_size(cards):
+    """헤더 키워드로 계산한 데이터 영역 크기 (바이트, 2880 단위로 채우기 전)"""
+    naxis = int(cards.get("NAXIS", 0))
+    if naxis == 0:
+        return 0
+    n_pixels = 1
+    for i in range(1, naxis + 1):
+        n_pixels *= int(cards[f"NAXIS{i}"])
+    # 확장 HDU(이진 테이블의 힙 포함)는 PCOUNT/GCOUNT까지 더함
+    n_pixels = int(cards.get("GCOUNT", 1)) * (int(cards.get("PCOUNT", 0)) + n_pixels)
+    return n_pixels * abs(int(cards.get("BITPIX", 8))) // 8
+
+
+def fits_complete(path):
+    """
+    FITS 파일이 끝까지 쓰였는지 확인합니다.
+    모든 HDU의 헤더를 차례로 읽으며 NAXIS/BITPIX(/PCOUNT/GCOUNT)로 계산한 데이터 크기만큼
+    파일이 채워졌는지 보고, 데이터가 있는 HDU가 하나 이상이고 주 헤더의 NEXTEND만큼
+    확장 HDU가 있어야 완성으로 봅니다. (주 HDU가 비어 있고 확장 HDU에 영상이 있는 파일이
+    주 헤더까지만 쓰인 경우를 걸러냄)
+    .gz 파일은 압축을 풀며 같은 방식으로 확인합니다. (압축 스트림이 끊겨 있어도 미완성)
+    NEXTEND가 없는 다중 확장 파일이 HDU 경계에서 끊긴 경우는 구별하지 못합니다.
+    """
+    import gzip
+
+    compressed = path.lower().endswith(".gz")
+    try:
+        with (gzip.open if compressed else open)(path, "rb") as f:
+            if not compressed:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0 or size % FITS_BLOCK:
+                    return False
+            n_hdu = 0
+            has_data = False
+            expected = 1
+            while True:
+                cards = _read_header(f)
+                if cards is None:
+                    break
+                if n_hdu == 0:
+                    if cards.get("SIMPLE") != "T":
+                        return False
+                    expected += int(cards.get("NEXTEND", 0))
+                data_size = _data_size(cards)
+                padded = -(-data_size // FITS_BLOCK) * FITS_BLOCK
+                if compressed:
+                    # gzip은 앞으로 seek 해도 압축을 풀어야 하므로 읽어서 버림
+                    while padded:
+                        chunk = f.read(min(padded, 1 << 20))
+                        if not chunk:
+                            return False
+                        padded -= len(chunk)
+                else:
+                    if f.tell() + padded > size:
+                        return False
+                    f.seek(padded, os.SEEK_CUR)
+                n_hdu += 1
+                has_data = has_data or data_size > 0
+        return has_data and n_hdu >= expected
+    except (OSError, EOFError, KeyError, ValueError):
+        return False
+
+
+class FolderWatcher:
+    """폴더에 새로 생겨서 다 쓰인 FITS 파일을 찾습니다."""
+
+    def __init__(self, directory, settle_s=SETTLE_S, include_existing=False):
+        """
+        directory : str
+            감시할 폴더
+        settle_s : float
+            크기/수정 시각이 바뀌지 않고 유지되어야 하는 시간 (초)
+        include_existing : bool
+            False이면 감시 시작 시점에 이미 있던 파일은 무시
+        """
+        self.directory = directory
+        self.settle_s = settle_s
+        self._pending = {}  # path -> (size, mtime, 처음 이 상태로 본 시각)
+        self._seen = set()
+        if not include_existing:
+            self._seen.update(path for path, _ in self._scan())
+
+    def _scan(self):
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return []
+        result = []
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(FITS_SUFFIXES):
+                try:
+                    result.append((entry.path, entry.stat()))
+                except OSError:
+                    pass  # 검사하는 사이 삭제/이름 변경된 파일
+        return result
+
+    def poll(self, now=None):
+        """
+        새로 완성된 파일 경로 목록을 수정 시각 순으로 반환합니다. (각 파일은 한 번만 반환)
+        """
+        if now is None:
+            now = time.monotonic()
+        ready = []
+        for path, stat in self._scan():
+            if path in self._seen:
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            previous = self._pending.get(path)
+            if previous is None or previous[:2] != state:
+                self._pending[path] = state + (now,)
+                continue
+            if now - previous[2] >= self.settle_s and fits_complete(path):
+                ready.append((stat.st_mtime, path))
+
+        ready.sort()
+        for _, path in ready:
+            self._seen.add(path)
+            self._pending.pop(path, None)
+        return [path for _, path in ready]
+
+
+# ------------------------------------------------
+# 작업 프로세스에서 실행되는 함수
+# ------------------------------------------------
+
+
+def _warm_worker():
+    """작업 프로세스 시작 시 무거운 모듈을 미리 불러옴"""
+    from lazy_imports import preload_heavy_modules
+    preload_heavy_modules().join()
+
+
+def reduce_frame(path, setup):
+    """
+    프레임 하나를 불러와 별을 검출하고, 기준 프레임 대비 이동량만큼 옮긴 좌표에서 측광합니다.
+
+    setup : dict
+        'target_coords', 'comp_coords', 'comp_mag', 'reference_xy' (기준 프레임의 밝은 별 좌표),
+        'detection_fwhm', 'threshold', 'sigma_clip', 'psf_fwhm', 'method' ("psf"/"aperture"),
+        'backends' (backends.get_backends()), 'use_background_map',
+        'memory_limit_mb' (작업 프로세스 버퍼 풀 상한, 없으면 기본값),
+        'target_motion' (LiveReducer가 채움: 측광 대상의 위치(시각 'time'에서)와 이동 속도, 없으면 None)
+
+    측광 대상의 초기 좌표는 target_motion이 있으면 그 위치를 이동 속도로
+    이 프레임의 관측 시각까지 옮긴 값, 없으면 기준 프레임 좌표입니다. (별 이동량은 그 뒤에 더함)
+    이동 천체도 측광 단계의 중심 보정 영역을 벗어나지 않습니다.
+
+    Returns:
+        dict : {'path', 'time', 'mag', 'mag_err', 'snr', 'fwhm', 'offset', 'n_sources', 'elapsed',
+                'target_xy' (보정된 측광 대상 위치, 기준 프레임 좌표),
+                'target_ok' (중심이 예측 위치에서 detection_fwhm 안으로 보정되었고 S/N이 TRACK_MIN_SNR 이상)}
+    """
+    import numpy as np
+
+    from background_map import get_background
+    from detection import detect_sources
+    from frame_buffers import MEMORY_LIMIT_MB, read_fits, worker_pool
+    from moving_objects import estimate_offset, header_time
+    from photometric_errors import ccd_parameters
+    from photometry import run_aperture_photometry, run_psf_photometry
+
+    started = time.perf_counter()
+    # 작업 프로세스마다 같은 버퍼에 프레임을 읽어 오래 감시해도 메모리 사용량이 일정하게 유지됨
+    data, header = read_fits(path, worker_pool(setup.get("memory_limit_mb", MEMORY_LIMIT_MB)))
+    obs_time = header_time(header)
+    ccd = ccd_parameters(header)
+
+    background = rms = None
+    if setup["use_background_map"]:
+        background, rms = get_background(data, sigma=setup["sigma_clip"])
+
+    sources = detect_sources(
+        data, setup["detection_fwhm"], setup["threshold"], setup["sigma_clip"],
+        background=background, rms=rms, finder=setup["backends"]["finder"],
+    )
+    sources = np.sort(sources, order="peak")[::-1]
+    offset = (0.0, 0.0)
+    if len(sources) and len(setup["reference_xy"]):
+        offset = estimate_offset(setup["reference_xy"], np.column_stack([sources["x"], sources["y"]]))
+        if offset is None:
+            raise ValueError("기준 프레임과 겹치는 별을 찾지 못해 프레임 이동량을 알 수 없습니다.")
+
+    dx, dy = offset
+    predicted = setup["target_coords"]
+    motion = setup.get("target_motion")
+    if motion is not None:
+        predicted = motion["coords"]
+        if motion["time"] is not None and obs_time is not None:
+            elapsed = obs_time - motion["time"]
+            predicted = [(x + vx * elapsed, y + vy * elapsed)
+                         for (x, y), (vx, vy) in zip(predicted, motion["rate"])]
+    target_coords = [(x + dx, y + dy) for x, y in predicted]
+    comp_coords = [(x + dx, y + dy) for x, y in setup["comp_coords"]]
+
+    if setup["method"] == "aperture":
+        result = run_aperture_photometry(
+            data, target_coords, comp_coords, setup["comp_mag"], setup["psf_fwhm"],
+            detection_fwhm=setup["detection_fwhm"], background=background, ccd=ccd,
+        )
+    else:
+        result = run_psf_photometry(
+            data, target_coords, comp_coords, setup["comp_mag"],
+            detection_fwhm=setup["detection_fwhm"], background=background,
+            backends=setup["backends"], ccd=ccd,
+        )
+
+    n_target = len(target_coords)
+    ok = result['refined']
+    return {
+        'path': path,
+        'time': obs_time,
+        'mag': float(result['mag']),
+        'mag_err': float(result['mag_err']),
+        'snr': float(result['snr']),
+        'fwhm': float(result['fwhm']),
+        'offset': (float(dx), float(dy)),
+        'n_sources': len(sources),
+        'elapsed': time.perf_counter() - started,
+        'target_xy': [(float(x - dx), float(y - dy)) for x, y in result['target_coords']],
+        'target_ok': (ok is not None and bool(np.all(ok[:n_target]))
+                      and bool(result['snr'] >= TRACK_MIN_SNR)),
+    }
+
+
+class LiveReducer:
+    """
+    새 프레임을 작업 프로세스 풀에 보내고, 끝난 결과를 제출 순서대로 돌려줍니다.
+    결과를 꺼낼 때마다 측광 대상의 측정 위치로 위치와 이동 속도를 다시 맞춰 setup['target_motion']에
+    반영하여 이후에 보내는 프레임에서 이동 천체의 위치를 예측합니다.
+    """
+
+    def __init__(self, setup, max_workers=None):
+        if max_workers is None:
+            max_workers = max(min((os.cpu_count() or 1) - 1, 4), 1)
+        self.setup = dict(setup, target_motion=None)
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_warm_worker)
+        self._futures = []  # [(path, future)] 제출 순서
+        self._track = deque(maxlen=TRACK_POINTS)  # [(시각, 측광 대상 위치 목록)] 추적에 쓸 최근 측정
+
+    def __len__(self):
+        """처리 중인 프레임 수"""
+        return len(self._futures)
+
+    def submit(self, path):
+        self._futures.append((path, self._executor.submit(reduce_frame, path, self.setup)))
+
+    def collect(self):
+        """
+        앞에서부터 끝난 작업의 결과를 꺼냅니다. (기다리지 않음)
+
+        Returns:
+            [(path, result dict 또는 None, 예외 또는 None)] 리스트
+        """
+        done = []
+        while self._futures and self._futures[0][1].done():
+            path, future = self._futures.pop(0)
+            error = future.exception()
+            result = None if error else future.result()
+            if result is not None:
+                self._update_motion(result)
+            done.append((path, result, error))
+        return done
+
+    def _update_motion(self, result):
+        """
+        추적에 쓸 수 있는 측정(target_ok)을 최근 측정 목록에 넣고 측광 대상별 위치와 이동 속도(px/일)를
+        다시 맞춥니다. 속도는 모든 측정 쌍의 속도의 중앙값, 위치는 그 속도로 최근 시각에 옮긴 위치의
+        중앙값이므로 (Theil-Sen) 가끔 다른 별이나 잡음에 잘못 맞춘 측정이 섞여도 예측이 벗어나지 않습니다.
+        """
+        import numpy as np
+
+        if not result['target_ok']:
+            return
+        if result['time'] is None:
+            # 관측 시각이 없으면 속도를 알 수 없으므로 최근 위치만 따라감
+            self.setup['target_motion'] = {'coords': result['target_xy'], 'time': None,
+                                           'rate': [(0.0, 0.0)] * len(result['target_xy'])}
+            return
+
+        self._track.append((result['time'], result['target_xy']))
+        times = np.array([t for t, _ in self._track])
+        xy = np.array([coords for _, coords in self._track], dtype=np.float64)  # (측정 수, 대상 수, 2)
+
+        i, j = np.triu_indices(len(times), 1)
+        dt = times[j] - times[i]
+        pairs = dt > 0
+        rate = np.zeros(xy.shape[1:])
+        if pairs.any():
+            rate = np.median((xy[j[pairs]] - xy[i[pairs]]) / dt[pairs, None, None], axis=0)
+        t_ref = times.max()
+        coords = np.median(xy - (times - t_ref)[:, None, None] * rate, axis=0)
+        self.setup['target_motion'] = {
+            'coords': [tuple(map(float, c)) for c in coords],
+            'time': float(t_ref),
+            'rate': [tuple(map(float, r)) for r in rate],
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._futures = []
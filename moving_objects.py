@@ -0,0 +1,284 @@
+# moving_objects.py
+"""
+프레임 간 검출 목록을 비교하여 움직이는 천체(소행성) 후보를 찾습니다.
+
+1) 프레임마다 검출된 별을 첫 프레임 좌표계로 정렬
+2) KD-tree로 여러 프레임에서 같은 위치에 나타나는 정지 천체를 제거
+3) 남은 검출을 등속 직선 운동으로 연결하여 tracklet(이동 경로) 구성
+
+프레임을 하나 추가할 때마다 정지 천체 목록과 tracklet만 갱신하므로
+시퀀스 전체를 처음부터 다시 계산하지 않습니다.
+"""
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def header_time(header):
+    """FITS 헤더에서 관측 시각(MJD)을 읽습니다. 없으면 None."""
+    for key, offset in (("MJD-OBS", 0.0), ("MJD", 0.0), ("JD", -2400000.5), ("JD-OBS", -2400000.5)):
+        if key in header:
+            try:
+                return float(header[key]) + offset
+            except (TypeError, ValueError):
+                pass
+    if "DATE-OBS" in header:
+        from astropy.time import Time
+        try:
+            return Time(header["DATE-OBS"], format="isot", scale="utc").mjd
+        except ValueError:
+            pass
+    return None
+
+
+def estimate_offset(ref_xy, xy, max_shift=30.0, n_bright=60, min_matches=3):
+    """
+    두 검출 목록 사이의 평행 이동량 (dx, dy)을 추정합니다. (xy ≈ ref_xy + (dx, dy))
+    밝은 별들의 모든 쌍 차이를 1픽셀 격자에 투표하여 최빈값을 찾고, 일치한 쌍의 중앙값으로 다듬습니다.
+    ref_xy, xy는 밝기 순으로 정렬되어 있다고 가정합니다.
+
+    최빈값에 모인 쌍이 min_matches개(별이 그보다 적으면 별 수)보다 적으면
+    (이동량이 max_shift보다 크거나 겹치는 별이 없으면) None을 반환합니다.
+    """
+    a = np.asarray(ref_xy, dtype=np.float64)[:n_bright]
+    b = np.asarray(xy, dtype=np.float64)[:n_bright]
+    if len(a) == 0 or len(b) == 0:
+        return None
+
+    diff = (b[None, :, :] - a[:, None, :]).reshape(-1, 2)
+    diff = diff[np.all(np.abs(diff) <= max_shift, axis=1)]
+    if len(diff) == 0:
+        return None
+
+    bins = int(2 * max_shift) + 1
+    hist, xedges, yedges = np.histogram2d(
+        diff[:, 0], diff[:, 1], bins=bins, range=[[-max_shift - 0.5, max_shift + 0.5]] * 2
+    )
+    ix, iy = np.unravel_index(np.argmax(hist), hist.shape)
+    if hist[ix, iy] < min(min_matches, len(a), len(b)):
+        return None
+    guess = np.array([(xedges[ix] + xedges[ix + 1]) / 2, (yedges[iy] + yedges[iy + 1]) / 2])
+    close = np.all(np.abs(diff - guess) <= 1.5, axis=1)
+    dx, dy = np.median(diff[close], axis=0)
+    return float(dx), float(dy)
+
+
+class MovingObjectFinder:
+    def __init__(self, match_radius=2.0, min_stationary=3, link_radius=2.5,
+                 min_tracklet=3, max_step=50.0, seed_window=3):
+        """
+        match_radius : float
+            같은 천체로 볼 프레임 간 위치 차이 (px)
+        min_stationary : int
+            이 프레임 수 이상 같은 자리에서 검출되면 정지 천체로 판단
+        link_radius : float
+            tracklet 예측 위치와 검출 위치의 허용 차이 (px)
+        min_tracklet : int
+            후보로 제시할 tracklet의 최소 검출 수
+        max_step : float
+            연속한 두 프레임 사이에 허용할 최대 이동 거리 (px)
+        seed_window : int
+            새 프레임의 검출과 짝지어 tracklet을 시작할 이전 프레임 수
+        """
+        self.match_radius = match_radius
+        self.min_stationary = min_stationary
+        self.link_radius = link_radius
+        self.min_tracklet = min_tracklet
+        self.max_step = max_step
+        self.seed_window = seed_window
+
+        self.frames = []        # 프레임별 {'time', 'offset', 'xy'(정렬 좌표), 'static_id'}
+        self._static_xy = np.empty((0, 2))
+        self._static_count = np.empty(0, dtype=np.intp)
+        self._static_tree = None
+        self._tracklets = []    # [(frame_index, detection_index), ...] 리스트
+
+    def __len__(self):
+        return len(self.frames)
+
+    # ------------------------------------------------
+    # 프레임 추가
+    # ------------------------------------------------
+
+    def add_frame(self, xy, time=None, offset=None):
+        """
+        검출 목록 하나를 추가하고 정지 천체 목록과 tracklet을 갱신합니다.
+
+        Parameters:
+            xy : (N, 2) 검출 좌표 (프레임 좌표, 밝기 순 정렬 권장)
+            time : float 또는 None
+                관측 시각 (None이면 프레임 순서를 시각으로 사용)
+            offset : (dx, dy) 또는 None
+                첫 프레임 대비 이 프레임의 이동량 (None이면 검출 목록으로 추정)
+
+        Returns:
+            추가된 프레임 번호
+
+        Raises:
+            ValueError : 이동량을 추정하지 못한 경우 (프레임은 추가하지 않음)
+        """
+        xy = np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+        index = len(self.frames)
+        if time is None:
+            time = float(index)
+        if offset is None:
+            offset = estimate_offset(self.frames[0]["raw_xy"], xy) if self.frames else (0.0, 0.0)
+            if offset is None:
+                if len(xy):
+                    raise ValueError("첫 프레임과 겹치는 별을 찾지 못해 프레임 이동량을 알 수 없습니다.")
+                offset = (0.0, 0.0)  # 검출이 없는 프레임은 정렬할 것이 없음
+
+        aligned = xy - np.asarray(offset)
+        static_id = self._update_static(aligned)
+        self.frames.append({
+            "time": float(time), "offset": tuple(offset),
+            "raw_xy": xy, "xy": aligned, "static_id": static_id,
+        })
+        self._update_tracklets(index)
+        return index
+
+    def _update_static(self, aligned):
+        """정지 천체 목록과 매칭하여 등장 횟수를 늘리고, 각 검출의 정지 천체 번호를 반환"""
+        static_id = np.full(len(aligned), -1, dtype=np.intp)
+        if self._static_tree is not None and len(aligned):
+            dist, nearest = self._static_tree.query(aligned, distance_upper_bound=self.match_radius)
+            matched = np.isfinite(dist)
+            # 한 정지 천체에 여러 검출이 붙으면 한 번만 센다
+            ids = np.unique(nearest[matched])
+            self._static_count[ids] += 1
+            static_id[matched] = nearest[matched]
+
+        new = static_id < 0
+        if new.any():
+            start = len(self._static_xy)
+            static_id[new] = np.arange(start, start + new.sum())
+            self._static_xy = np.vstack([self._static_xy, aligned[new]])
+            self._static_count = np.concatenate([self._static_count, np.ones(new.sum(), dtype=np.intp)])
+            self._static_tree = cKDTree(self._static_xy)
+        return static_id
+
+    def transient_mask(self, index):
+        """index 프레임에서 정지 천체가 아닌 검출의 마스크"""
+        frame = self.frames[index]
+        return self._static_count[frame["static_id"]] < self.min_stationary
+
+    # ------------------------------------------------
+    # tracklet 연결
+    # ------------------------------------------------
+
+    def _fit(self, points):
+        """tracklet 점들에 등속 직선 운동을 최소제곱으로 맞춤 → (위치(t0), 속도, t0, rms)"""
+        t = np.array([self.frames[f]["time"] for f, _ in points])
+        xy = np.array([self.frames[f]["xy"][d] for f, d in points])
+        t0 = t.mean()
+        dt = t - t0
+        denom = (dt**2).sum()
+        velocity = (dt[:, None] * (xy - xy.mean(axis=0))).sum(axis=0) / denom if denom > 0 else np.zeros(2)
+        position = xy.mean(axis=0)
+        residual = xy - (position + dt[:, None] * velocity)
+        rms = float(np.sqrt((residual**2).sum(axis=1).mean()))
+        return position, velocity, t0, rms
+
+    def _predict(self, fit, time):
+        position, velocity, t0, _ = fit
+        return position + (time - t0) * velocity
+
+    def _search(self, index, predicted, used):
+        """index 프레임의 미사용 일시 천체 중 predicted에 가장 가까운 검출 번호 (없으면 None)"""
+        frame = self.frames[index]
+        candidates = np.nonzero(self.transient_mask(index))[0]
+        candidates = [c for c in candidates if (index, c) not in used]
+        if not candidates:
+            return None
+        dist = np.hypot(*(frame["xy"][candidates] - predicted).T)
+        best = int(np.argmin(dist))
+        return int(candidates[best]) if dist[best] <= self.link_radius else None
+
+    def _update_tracklets(self, index):
+        frame = self.frames[index]
+        transient = np.nonzero(self.transient_mask(index))[0]
+        used = {p for points in self._tracklets for p in points if p[0] == index}
+
+        # 1. 기존 tracklet을 새 프레임으로 연장
+        for points in self._tracklets:
+            if len(points) < 2:
+                continue
+            detection = self._search(index, self._predict(self._fit(points), frame["time"]), used)
+            if detection is not None:
+                points.append((index, detection))
+                used.add((index, detection))
+
+        # 2. 남은 검출을 최근 프레임의 일시 천체와 짝지어 새 tracklet 시작 후 이전 프레임으로 확장
+        for d in transient:
+            if (index, d) in used:
+                continue
+            for prev in range(max(index - self.seed_window, 0), index):
+                dt = frame["time"] - self.frames[prev]["time"]
+                if dt <= 0:
+                    continue
+                prev_xy = self.frames[prev]["xy"]
+                prev_transient = np.nonzero(self.transient_mask(prev))[0]
+                if len(prev_transient) == 0:
+                    continue
+                step = np.hypot(*(frame["xy"][d] - prev_xy[prev_transient]).T) / (index - prev)
+                for p in prev_transient[step <= self.max_step]:
+                    points = [(prev, int(p)), (index, int(d))]
+                    taken = set(points)
+                    for other in range(index - 1, -1, -1):
+                        if other == prev:
+                            continue
+                        detection = self._search(other, self._predict(self._fit(points), self.frames[other]["time"]), taken)
+                        if detection is not None:
+                            points.append((other, detection))
+                            taken.add((other, detection))
+                    if len(points) >= self.min_tracklet:
+                        points.sort()
+                        self._tracklets.append(points)
+                        used.add((index, int(d)))
+                        break
+                if (index, d) in used:
+                    break
+
+    # ------------------------------------------------
+    # 후보 제시
+    # ------------------------------------------------
+
+    def candidates(self, max_rms=None):
+        """
+        현재까지의 tracklet 중 조건을 만족하는 이동 천체 후보를 반환합니다.
+        나중에 정지 천체로 밝혀진 검출은 제외하고, 검출을 공유하는 후보는 긴 것만 남깁니다.
+
+        Returns:
+            dict 리스트 (검출 수 내림차순, rms 오름차순) : {
+                'points', 'n', 'velocity', 'speed', 'rms', 'position', 't0'
+            }
+            position은 첫 프레임 좌표계 기준, position_at()으로 임의 프레임 위치 계산
+        """
+        if max_rms is None:
+            max_rms = self.link_radius
+        result = []
+        for points in self._tracklets:
+            points = [(f, d) for f, d in points if self.transient_mask(f)[d]]
+            if len(points) < self.min_tracklet:
+                continue
+            position, velocity, t0, rms = self._fit(points)
+            if rms > max_rms:
+                continue
+            result.append({
+                'points': points, 'n': len(points), 'velocity': velocity,
+                'speed': float(np.hypot(*velocity)), 'rms': rms, 'position': position, 't0': t0,
+            })
+
+        result.sort(key=lambda c: (-c['n'], c['rms']))
+        unique, taken = [], set()
+        for candidate in result:
+            if taken.isdisjoint(candidate['points']):
+                unique.append(candidate)
+                taken.update(candidate['points'])
+        return unique
+
+    def position_at(self, candidate, index):
+        """후보의 index 프레임에서의 예측 위치 (그 프레임의 픽셀 좌표)"""
+        frame = self.frames[index]
+        aligned = candidate['position'] + (frame["time"] - candidate['t0']) * candidate['velocity']
+        return aligned + np.asarray(frame["offset"])
@@ -0,0 +1,149 @@
+# photometric_errors.py
+"""
+측광 오차와 S/N 계산.
+
+플럭스 오차는 두 가지로 구합니다.
+    1) 피팅 공분산에서 나온 오차 (PSF 피팅 결과의 flux_err)
+    2) FITS 헤더의 이득(GAIN)과 읽기 잡음(RDNOISE)을 쓴 CCD 잡음 방정식
+둘 중 큰 값을 최종 오차로 쓰고, 등급과 앙상블 등급까지 배열 연산으로 전파합니다.
+모든 함수는 (프레임, 별) 등 임의 모양의 배열에 브로드캐스트되므로
+피팅을 다시 하지 않고 모든 별/프레임의 오차를 한 번에 계산할 수 있습니다.
+"""
+
+import numpy as np
+
+# 등급 오차 = MAG_PER_FLUX * (플럭스 오차 / 플럭스)
+MAG_PER_FLUX = 2.5 / np.log(10)
+
+GAIN_KEYS = ("GAIN", "EGAIN", "CCDGAIN")
+READ_NOISE_KEYS = ("RDNOISE", "READNOIS", "READNOISE", "RON")
+
+
+def _header_value(header, keys):
+    for key in keys:
+        if header is not None and key in header:
+            try:
+                value = float(header[key])
+            except (TypeError, ValueError):
+                continue
+            if np.isfinite(value) and value >= 0:
+                return value
+    return None
+
+
+def ccd_parameters(header, gain=None, read_noise=None):
+    """
+    헤더에서 이득(e-/ADU)과 읽기 잡음(e-)을 읽습니다. 인자로 주면 헤더 값보다 우선합니다.
+    둘 다 없으면 이득 1, 읽기 잡음 0 (ADU 단위 포아송 잡음만)으로 둡니다.
+    인자로 준 이득이 0 이하이거나 읽기 잡음이 음수이면 ValueError를 냅니다.
+
+    Returns:
+        dict : {'gain', 'read_noise', 'from_header'}
+    """
+    header_gain = _header_value(header, GAIN_KEYS)
+    header_read_noise = _header_value(header, READ_NOISE_KEYS)
+    if gain is not None:
+        gain = float(gain)
+        if not (np.isfinite(gain) and gain > 0):
+            raise ValueError(f"이득(gain)은 0보다 커야 합니다: {gain}")
+    elif header_gain:
+        gain = header_gain
+    else:
+        gain = 1.0  # 헤더 값이 없거나 0이면 ADU 단위 포아송 잡음
+    if read_noise is not None:
+        read_noise = float(read_noise)
+        if not (np.isfinite(read_noise) and read_noise >= 0):
+            raise ValueError(f"읽기 잡음(read noise)은 0 이상이어야 합니다: {read_noise}")
+    else:
+        read_noise = header_read_noise if header_read_noise is not None else 0.0
+    return {
+        'gain': gain,
+        'read_noise': read_noise,
+        'from_header': bool(header_gain),
+    }
+
+
+def effective_pixels(fwhm):
+    """가우시안 PSF 피팅의 잡음 등가 면적 (픽셀 수) = 4π σ²"""
+    sigma = np.asarray(fwhm, dtype=np.float64) / 2.3548
+    return 4 * np.pi * sigma**2
+
+
+def ccd_flux_error(flux, sky, n_pix, gain=1.0, read_noise=0.0):
+    """
+    CCD 잡음 방정식으로 구한 플럭스 오차 (ADU)
+    σ² [e-²] = F·g + n_pix · (S·g + RN²)
+
+    Parameters:
+        flux : 별 플럭스 (ADU)
+        sky : 픽셀당 배경 (ADU)
+        n_pix : 측광에 쓰인 픽셀 수 (조리개 면적 또는 PSF 잡음 등가 면적)
+        gain : e-/ADU
+        read_noise : e-
+    """
+    flux = np.clip(np.asarray(flux, dtype=np.float64), 0, None)
+    sky = np.clip(np.asarray(sky, dtype=np.float64), 0, None)
+    variance = flux * gain + n_pix * (sky * gain + read_noise**2)
+    return np.sqrt(variance) / gain
+
+
+def total_flux_error(fit_error, ccd_error):
+    """피팅 오차와 CCD 잡음 오차 중 큰 값 (한쪽이 NaN이면 다른 쪽)"""
+    return np.fmax(np.asarray(fit_error, dtype=np.float64), np.asarray(ccd_error, dtype=np.float64))
+
+
+def snr(flux, flux_error):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.asarray(flux, dtype=np.float64) / np.asarray(flux_error, dtype=np.float64)
+
+
+def magnitude_error(flux, flux_error):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return MAG_PER_FLUX * np.abs(np.asarray(flux_error, dtype=np.float64) / np.asarray(flux, dtype=np.float64))
+
+
+def differential_magnitude(flux_target, error_target, flux_comp, error_comp, comp_mag):
+    """
+    m = comp_mag - 2.5 log10(F_t / F_c) 와 그 오차 (두 별의 오차를 제곱합으로 결합)
+    어느 한쪽 플럭스라도 0 이하이면 등급은 NaN입니다.
+
+    Returns:
+        (mag, mag_err)
+    """
+    flux_target = np.asarray(flux_target, dtype=np.float64)
+    flux_comp = np.asarray(flux_comp, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # 비율의 로그를 쓰면 두 플럭스가 모두 음수일 때 유효한 등급처럼 보이므로 따로 로그
+        mag = comp_mag - 2.5 * (np.log10(flux_target) - np.log10(flux_comp))
+    mag_err = np.hypot(magnitude_error(flux_target, error_target), magnitude_error(flux_comp, error_comp))
+    return mag, mag_err
+
+
+def ensemble_magnitude(flux_target, error_target, flux_comp, error_comp, comp_mag):
+    """
+    여러 비교성(마지막 축)으로 구한 영점의 가중 평균으로 측광 대상 등급을 계산합니다.
+    영점 Z_i = comp_mag_i + 2.5 log10(F_c,i) 를 1/σ_i² 가중 평균하고,
+    측광 대상 오차는 비교성마다 공통이므로 영점 오차와 따로 더합니다.
+
+    Parameters:
+        flux_target, error_target : (...) 배열
+        flux_comp, error_comp : (..., n_comp) 배열
+        comp_mag : (n_comp,) 또는 스칼라
+
+    Returns:
+        (mag, mag_err) : (...) 배열
+    """
+    flux_comp = np.asarray(flux_comp, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zero_point = np.asarray(comp_mag, dtype=np.float64) + 2.5 * np.log10(flux_comp)
+        weight = 1.0 / magnitude_error(flux_comp, error_comp)**2
+    valid = np.isfinite(zero_point) & np.isfinite(weight) & (weight > 0)
+    weight = np.where(valid, weight, 0.0)
+    total = weight.sum(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zero_point = (np.where(valid, zero_point, 0.0) * weight).sum(axis=-1) / total
+        zero_point_err = 1.0 / np.sqrt(total)
+        mag = zero_point - 2.5 * np.log10(np.asarray(flux_target, dtype=np.float64))
+    mag_err = np.hypot(magnitude_error(flux_target, error_target), zero_point_err)
+    return mag, mag_err
@@ -0,0 +1,450 @@
+# photometry.py
+"""
+Qt에 의존하지 않는 PSF 측광 파이프라인.
+MainWindow.f4와 헤드리스 작업 서버(job_server.py)가 함께 사용합니다.
+"""
+
+import warnings
+from functools import lru_cache
+
+import numpy as np
+
+from backends import create as create_backend, resolve as resolve_backends
+from centroid import annulus_background, refine_centroids
+from photometric_errors import (
+    ccd_flux_error, differential_magnitude, effective_pixels, ensemble_magnitude, snr, total_flux_error,
+)
+
+
+def ensure_odd(n):
+    return int(n) if int(n) % 2 == 1 else int(n) + 1
+
+
+def gaussian_1d(x, amplitude, mean, sigma, offset):
+    return amplitude * np.exp(-(x - mean)**2 / (2 * sigma**2)) + offset
+
+
+def estimate_fwhm_1d_profile(image, x0, y0, size=21):
+    """
+    중심 좌표 (x0, y0) 기준으로 1D 밝기 프로파일 절단법으로 FWHM 추정
+
+    Parameters:
+        image : 2D numpy array
+            별이 있는 이미지
+        x0, y0 : float
+            별 중심의 좌표
+        size : int
+            자를 패치 크기 (홀수 추천)
+
+    Returns:
+        dict : {
+            'fwhm_x', 'fwhm_y', 'sigma_x', 'sigma_y', 'success_x', 'success_y'
+        }
+    """
+    from scipy.optimize import curve_fit
+
+    half = size // 2
+    h, w = image.shape
+    x0, y0 = int(round(x0)), int(round(y0))
+
+    if x0 - half < 0 or y0 - half < 0 or x0 + half >= w or y0 + half >= h:
+        raise ValueError("Patch 영역이 이미지 밖으로 나갑니다.")
+
+    patch = image[y0 - half:y0 + half + 1, x0 - half:x0 + half + 1]
+
+    # X, Y 프로파일 추출
+    profile_x = patch[half, :]  # y 방향 중앙 라인
+    profile_y = patch[:, half]  # x 방향 중앙 라인
+    x = np.arange(size)
+
+    result = {}
+
+    for direction, profile in zip(['x', 'y'], [profile_x, profile_y]):
+        amp_guess = profile.max() - profile.min()
+        offset_guess = profile.min()
+        p0 = [amp_guess, size // 2, 3.0, offset_guess]
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                popt, _ = curve_fit(gaussian_1d, x, profile, p0=p0)
+                sigma = abs(popt[2])
+                fwhm = 2.3548 * sigma
+                result[f'fwhm_{direction}'] = fwhm
+                result[f'sigma_{direction}'] = sigma
+                result[f'success_{direction}'] = True
+            except Exception:
+                result[f'fwhm_{direction}'] = np.nan
+                result[f'sigma_{direction}'] = np.nan
+                result[f'success_{direction}'] = False
+
+    return result
+
+
+def refine_positions(data, target_coords, comp_coords, detection_fwhm):
+    """
+    측광 대상과 비교성 좌표를 한 번에 별 중심으로 보정합니다.
+    보정된 중심이 detection_fwhm보다 멀리 옮겨지면 (이웃한 더 밝은 별에 끌려간 경우) 원래 좌표를 씁니다.
+
+    Returns:
+        (target_coords, comp_coords, ok, shift) : 보정된 좌표 리스트 두 개,
+        별마다 보정 성공 여부와 이동 거리(px)
+    """
+    n_target = len(target_coords)
+    init_coords = np.array(list(target_coords) + list(comp_coords), dtype=np.float64)
+    box_size = max(int(round(detection_fwhm * 3)), 7)
+    refined, ok = refine_centroids(data, init_coords, box_size=box_size, max_shift=detection_fwhm)
+    shift = np.hypot(*(refined - init_coords).T)
+    target_coords = [tuple(p) for p in refined[:n_target]]
+    comp_coords = [tuple(p) for p in refined[n_target:]]
+    return target_coords, comp_coords, ok, shift
+
+
+def estimate_fwhm(data, target_xy, comp_xy, size=31):
+    """
+    측광 대상 하나와 비교성 하나의 1D 프로파일 FWHM 평균을 구합니다.
+
+    Returns:
+        (fwhm, target 결과 dict, comp 결과 dict)
+    """
+    fwhm_result = estimate_fwhm_1d_profile(data, x0=target_xy[0], y0=target_xy[1], size=size)
+    fwhm_comp_result = estimate_fwhm_1d_profile(data, x0=comp_xy[0], y0=comp_xy[1], size=size)
+    fwhm_values = [
+        fwhm_result['fwhm_x'],
+        fwhm_result['fwhm_y'],
+        fwhm_comp_result['fwhm_x'],
+        fwhm_comp_result['fwhm_y']
+    ]
+    return np.nanmean(fwhm_values), fwhm_result, fwhm_comp_result
+
+
+def difference_image(imager, data, fwhm, comp_xy):
+    """
+    DifferenceImager로 data의 차분 영상을 만듭니다.
+    기준 영상의 FWHM을 아직 모르면 비교성 위치(기준 영상 좌표로 환산)에서 한 번 측정해 저장합니다.
+
+    Returns:
+        (diff, info) : DifferenceImager.subtract()의 결과
+    """
+    if imager.reference_fwhm is None:
+        dx, dy = imager.measure_shift(data)
+        ref_fwhm = estimate_fwhm_1d_profile(
+            imager.reference, x0=comp_xy[0] - dx, y0=comp_xy[1] - dy, size=31
+        )
+        imager.reference_fwhm = np.nanmean([ref_fwhm['fwhm_x'], ref_fwhm['fwhm_y']])
+    return imager.subtract(data, fwhm)
+
+
+@lru_cache(maxsize=16)
+def _cached_psf_photometry(fwhm, local_background, psf_model, fitter, bkg_estimator):
+    from photutils.psf import PSFPhotometry
+    from photutils.background import LocalBackground
+
+    inner_radius = int(round(fwhm * 2))
+    outer_radius = int(round(fwhm * 4))
+    fit_size = ensure_odd(round(fwhm * 6))
+    fit_shape = (fit_size, fit_size)
+
+    # 지역 배경 추정 설정 (배경 지도를 미리 뺀 경우에는 별마다 고리 통계를 내지 않음)
+    bkg_est = None
+    if local_background:
+        bkg_est = LocalBackground(
+            inner_radius=inner_radius,
+            outer_radius=outer_radius,
+            bkg_estimator=create_backend("background", bkg_estimator)
+        )
+
+    # PSF 측광 객체 생성
+    return PSFPhotometry(
+        psf_model=create_backend("psf_model", psf_model, fwhm),
+        fit_shape=fit_shape,
+        finder=None,
+        fitter=create_backend("fitter", fitter),
+        localbkg_estimator=bkg_est,
+        aperture_radius=fwhm * 2,
+        progress_bar=False,
+    )
+
+
+def get_psf_photometry(fwhm, local_background=True, backends=None):
+    """
+    FWHM과 백엔드 조합별 PSFPhotometry 객체를 캐시하여 재사용합니다.
+    (같은 설정이면 PSF 모델과 배경 추정기를 다시 만들지 않음)
+    local_background=False이면 지역 배경(고리) 추정 없이 피팅합니다. (배경을 미리 뺀 영상용)
+    backends는 현재 설정에서 바꿀 단계만 담은 dict입니다. (backends.resolve() 참고)
+    캐시된 객체는 호출마다 내부 상태를 바꾸므로 한 스레드에서만 사용해야 합니다.
+    """
+    choice = resolve_backends(backends)
+    if choice["fitter"] == "batch":
+        raise ValueError("배치 가우시안 피팅은 PSFPhotometry를 사용하지 않습니다. fit_stars()를 사용하세요.")
+    return _cached_psf_photometry(
+        round(float(fwhm), 3), bool(local_background),
+        choice["psf_model"], choice["fitter"], choice["background"],
+    )
+
+
+def fit_stars(data, coords, fwhm, local_background=True, backends=None):
+    """
+    좌표 목록의 별들을 FWHM을 고정한 PSF 모델로 피팅합니다.
+    모델, 최적화기, 지역 배경 추정기는 backends 설정을 따르고,
+    fitter가 "batch"이면 gaussian_fit의 배치 LM 피팅을 사용합니다.
+    (numba가 있으면 컴파일된 커널로 별마다 병렬 실행, 지역 배경은 MMM 고정)
+
+    Returns:
+        astropy Table (x_fit, y_fit, flux_fit, flux_err 등 photutils 결과와 같은 열 이름)
+    """
+    from astropy.table import Table
+
+    if resolve_backends(backends)["fitter"] == "batch":
+        from gaussian_fit import fit_gaussian_prf_batch
+        return Table(fit_gaussian_prf_batch(data, coords, fwhm, local_background=local_background))
+
+    positions = Table(rows=coords, names=["x_0", "y_0"])
+    return get_psf_photometry(fwhm, local_background, backends)(data, init_params=positions)
+
+
+def sky_levels(data, coords, fwhm, background=None):
+    """별 위치의 픽셀당 배경 (ADU). 배경 지도가 있으면 그 값, 없으면 고리(2~4 FWHM)의 MMM 배경"""
+    coords = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+    if background is not None:
+        h, w = background.shape
+        ix = np.clip(np.rint(coords[:, 0]).astype(np.intp), 0, w - 1)
+        iy = np.clip(np.rint(coords[:, 1]).astype(np.intp), 0, h - 1)
+        return background[iy, ix].astype(np.float64)
+    return annulus_background(data, coords, int(round(fwhm * 2)), int(round(fwhm * 4)))
+
+
+def add_error_columns(table, flux_column, sky, n_pix, ccd=None):
+    """
+    측광 결과 표에 오차 열을 추가합니다. (모든 별을 한 번에 계산, 피팅 반복 없음)
+        sky : 픽셀당 배경, flux_err_ccd : CCD 잡음 방정식 오차,
+        flux_err_total : 피팅 공분산 오차(flux_err)와 CCD 오차 중 큰 값, snr : S/N
+    ccd는 photometric_errors.ccd_parameters()의 dict (None이면 이득 1, 읽기 잡음 0)
+    """
+    ccd = ccd or {'gain': 1.0, 'read_noise': 0.0}
+    flux = np.asarray(table[flux_column], dtype=np.float64)
+    fit_error = np.asarray(table["flux_err"], dtype=np.float64) if "flux_err" in table.colnames else np.nan
+    table["sky"] = sky
+    table["flux_err_ccd"] = ccd_flux_error(flux, sky, n_pix, ccd['gain'], ccd['read_noise'])
+    table["flux_err_total"] = total_flux_error(fit_error, table["flux_err_ccd"])
+    table["snr"] = snr(flux, table["flux_err_total"])
+    return table
+
+
+def target_magnitude(target_result, comp_result, flux_column, comp_mag):
+    """
+    첫 번째 측광 대상의 겉보기 등급과 오차.
+    comp_mag가 숫자이면 첫 번째 비교성 기준, 비교성마다의 등급 목록이면 앙상블 등급을 계산합니다.
+    앙상블에서는 플럭스가 0 이하인 비교성을 빼고 계산합니다.
+
+    Returns:
+        (mag, mag_err) : 등급을 구할 수 없으면 (측광 대상이나 쓸 수 있는 비교성의 플럭스가 없으면) 둘 다 NaN
+    """
+    flux_target = target_result[flux_column][0]
+    error_target = target_result["flux_err_total"][0]
+    comp_mag = np.asarray(comp_mag, dtype=np.float64)
+    if comp_mag.ndim == 0:
+        mag, mag_err = differential_magnitude(
+            flux_target, error_target,
+            comp_result[flux_column][0], comp_result["flux_err_total"][0], comp_mag,
+        )
+    else:
+        if len(comp_mag) != len(comp_result):
+            raise ValueError("비교성 등급 수와 비교성 좌표 수가 다릅니다.")
+        mag, mag_err = ensemble_magnitude(
+            flux_target, error_target,
+            np.asarray(comp_result[flux_column]), np.asarray(comp_result["flux_err_total"]), comp_mag,
+        )
+    if not np.isfinite(mag):
+        mag_err = np.nan
+    return mag, mag_err
+
+
+def run_psf_photometry(data, target_coords, comp_coords, comp_mag, fwhm=None,
+                       detection_fwhm=None, refine=True, difference_imager=None, background=None,
+                       backends=None, ccd=None):
+    """
+    측광 대상과 비교성에 PSF 측광을 수행하고 첫 번째 별끼리 겉보기 등급을 계산합니다.
+    m_target = m_comp - 2.5 * log10(flux_target / flux_comp)
+    (비교성마다 등급을 주면 앙상블 등급, target_magnitude() 참고)
+
+    Parameters:
+        data : 2D numpy array
+        target_coords, comp_coords : (x, y) 튜플 리스트
+        comp_mag : float 또는 비교성마다의 등급 목록
+            비교성 겉보기 등급
+        fwhm : float 또는 None
+            PSF FWHM. None이면 첫 번째 측광 대상과 비교성의 1D 프로파일로 추정
+        detection_fwhm : float 또는 None
+            중심 보정 탐색 영역 크기를 정할 대략적 FWHM (None이면 fwhm 또는 5 사용)
+        refine : bool
+            피팅 전 중심 보정 여부
+        difference_imager : DifferenceImager 또는 None
+            주어지면 측광 대상은 기준 영상을 뺀 차분 영상에서 측광
+            (비교성은 차분 영상에서 사라지므로 원본에서 측광)
+        background : 2D 배열 또는 None
+            프레임 배경 지도 (background_map). 주어지면 미리 빼고 별마다의 고리 배경 추정을 생략
+        backends : dict 또는 None
+            현재 설정에서 바꿀 백엔드 ({"fitter": "lm"} 등, fit_stars() 참고)
+        ccd : dict 또는 None
+            이득/읽기 잡음 (photometric_errors.ccd_parameters()), 오차 계산에 사용
+
+    Returns:
+        dict : {
+            'fwhm', 'fwhm_target', 'fwhm_comp', 'target_coords', 'comp_coords',
+            'refined', 'shift', 'target_result', 'comp_result', 'mag', 'mag_err', 'snr',
+            'difference' (차분 모드일 때 DifferenceImager.subtract()의 info)
+        }
+        target_result, comp_result에는 add_error_columns()의 오차 열이 추가됨
+    """
+    if not target_coords:
+        raise ValueError("측광 대상 좌표가 없습니다.")
+    if not comp_coords:
+        raise ValueError("비교성 좌표가 없습니다.")
+
+    result = {'fwhm_target': None, 'fwhm_comp': None, 'refined': None, 'shift': None,
+              'difference': None}
+    init_target_coords = target_coords
+
+    if refine:
+        if detection_fwhm is None:
+            detection_fwhm = fwhm if fwhm is not None else 5.0
+        target_coords, comp_coords, ok, shift = refine_positions(
+            data, target_coords, comp_coords, detection_fwhm
+        )
+        result['refined'] = ok
+        result['shift'] = shift
+
+    if fwhm is None:
+        fwhm, result['fwhm_target'], result['fwhm_comp'] = estimate_fwhm(
+            data, target_coords[0], comp_coords[0]
+        )
+
+    # 배경 지도가 있으면 한 번만 빼고, 별마다의 지역 배경 추정은 생략
+    phot_data = data if background is None else data - background
+    local_background = background is None
+
+    target_data, target_fwhm = phot_data, fwhm
+    if difference_imager is not None:
+        target_data, info = difference_image(difference_imager, data, fwhm, comp_coords[0])
+        target_fwhm = info['fwhm']
+        result['difference'] = info
+        if refine:
+            # 원본에서는 겹친 배경별 쪽으로 보정될 수 있으므로 차분 영상에서 다시 보정
+            box_size = max(int(round(detection_fwhm * 3)), 7)
+            refined, ok = refine_centroids(target_data, init_target_coords, box_size=box_size,
+                                           max_shift=detection_fwhm)
+            target_coords = [tuple(p) for p in refined]
+            result['refined'][:len(ok)] = ok
+            result['shift'][:len(ok)] = np.hypot(*(refined - np.asarray(init_target_coords)).T)
+
+    # PSF 측광 수행
+    target_result = fit_stars(target_data, target_coords, target_fwhm, local_background, backends)
+    comp_result = fit_stars(phot_data, comp_coords, fwhm, local_background, backends)
+
+    # 오차 (배경은 원본 프레임 기준: 차분 영상에도 원본의 잡음이 그대로 남음)
+    sky = sky_levels(data, list(target_coords) + list(comp_coords), fwhm, background)
+    n_target = len(target_coords)
+    add_error_columns(target_result, "flux_fit", sky[:n_target], effective_pixels(target_fwhm), ccd)
+    add_error_columns(comp_result, "flux_fit", sky[n_target:], effective_pixels(fwhm), ccd)
+
+    # 첫 번째 측광 대상의 겉보기 등급 계산
+    mag = mag_err = target_snr = np.nan
+    if len(target_result) > 0 and len(comp_result) > 0:
+        mag, mag_err = target_magnitude(target_result, comp_result, "flux_fit", comp_mag)
+        target_snr = target_result["snr"][0]
+
+    result.update({
+        'fwhm': fwhm,
+        'target_coords': target_coords,
+        'comp_coords': comp_coords,
+        'target_result': target_result,
+        'comp_result': comp_result,
+        'mag': float(mag),
+        'mag_err': float(mag_err),
+        'snr': float(target_snr),
+    })
+    return result
+
+
+def run_aperture_photometry(data, target_coords, comp_coords, comp_mag, fwhm,
+                            detection_fwhm=None, refine=True, background=None, ccd=None):
+    """
+    빠른 확인용 원형 조리개 측광. 측광 대상과 비교성 전체를 한 번의 벡터화 호출로 측광합니다.
+    조리개 반지름과 배경 고리는 PSF 측광 설정과 같게 둡니다. (반지름 2 FWHM, 고리 2~4 FWHM)
+
+    Parameters:
+        data : 2D numpy array
+        target_coords, comp_coords : (x, y) 튜플 리스트
+        comp_mag : float 또는 비교성마다의 등급 목록
+            비교성 겉보기 등급
+        fwhm : float
+            PSF FWHM (조리개 크기 기준)
+        detection_fwhm : float 또는 None
+            중심 보정 탐색 영역 크기를 정할 대략적 FWHM (None이면 fwhm 사용)
+        refine : bool
+            측광 전 중심 보정 여부
+        background : 2D 배열 또는 None
+            프레임 배경 지도. 주어지면 미리 빼고 고리 배경은 계산하지 않음
+        ccd : dict 또는 None
+            이득/읽기 잡음 (photometric_errors.ccd_parameters()), 오차 계산에 사용
+
+    Returns:
+        dict : {
+            'fwhm', 'target_coords', 'comp_coords', 'refined', 'shift',
+            'target_result', 'comp_result' (x, y, aperture_sum, local_bkg, flux 및 오차 열의 Table),
+            'mag', 'mag_err', 'snr'
+        }
+    """
+    from astropy.table import Table
+    from photutils.aperture import CircularAperture, aperture_photometry
+
+    if not target_coords:
+        raise ValueError("측광 대상 좌표가 없습니다.")
+    if not comp_coords:
+        raise ValueError("비교성 좌표가 없습니다.")
+
+    result = {'refined': None, 'shift': None}
+    if refine:
+        target_coords, comp_coords, result['refined'], result['shift'] = refine_positions(
+            data, target_coords, comp_coords, detection_fwhm if detection_fwhm is not None else fwhm
+        )
+
+    n_target = len(target_coords)
+    positions = np.array(list(target_coords) + list(comp_coords), dtype=np.float64)
+    radius = fwhm * 2
+
+    phot_data = data
+    local_bkg = np.zeros(len(positions))
+    sky = sky_levels(data, positions, fwhm, background)
+    if background is not None:
+        phot_data = data - background
+    else:
+        local_bkg = sky
+
+    aperture = CircularAperture(positions, r=radius)
+    aperture_sum = np.asarray(aperture_photometry(phot_data, aperture)["aperture_sum"], dtype=np.float64)
+    flux = aperture_sum - local_bkg * aperture.area
+
+    table = Table({
+        'x': positions[:, 0], 'y': positions[:, 1],
+        'aperture_sum': aperture_sum, 'local_bkg': local_bkg, 'flux': flux,
+    })
+    add_error_columns(table, "flux", sky, aperture.area, ccd)
+    target_result, comp_result = table[:n_target], table[n_target:]
+
+    # 플럭스가 0 이하인 별의 처리(앙상블에서 제외, 등급 NaN)는 target_magnitude()에서
+    mag, mag_err = target_magnitude(target_result, comp_result, "flux", comp_mag)
+    target_snr = table["snr"][0]
+
+    result.update({
+        'fwhm': fwhm,
+        'target_coords': target_coords,
+        'comp_coords': comp_coords,
+        'target_result': target_result,
+        'comp_result': comp_result,
+        'mag': float(mag),
+        'mag_err': float(mag_err),
+        'snr': float(target_snr),
+    })
+    return result
@@ -0,0 +1,127 @@
+# plot_widgets.py
+
+import numpy as np
+
+from PySide6.QtWidgets import QWidget
+from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtGui import QPainter, QPen, QPolygonF
+
+
+class SimplePlotWidget(QWidget):
+    """
+    matplotlib 없이 QPainter로 그리는 가벼운 2D 플롯 위젯.
+    방사 프로파일, 광도 곡선처럼 점 수가 적고 자주 갱신되는 그래프용입니다.
+    """
+
+    def __init__(self, parent=None, title="", x_label="", y_label="", invert_y=False):
+        super().__init__(parent)
+        self.setMinimumSize(220, 160)
+        self._title = title
+        self._x_label = x_label
+        self._y_label = y_label
+        self._invert_y = invert_y  # 등급처럼 값이 작을수록 위에 그려야 할 때
+        self._x = np.empty(0)
+        self._y = np.empty(0)
+        self._yerr = None
+        self._show_line = True
+        self._hline = None
+
+    def set_title(self, title):
+        self._title = title
+        self.update()
+
+    def set_labels(self, x_label=None, y_label=None):
+        if x_label is not None:
+            self._x_label = x_label
+        if y_label is not None:
+            self._y_label = y_label
+        self.update()
+
+    def set_data(self, x, y, yerr=None, line=True, hline=None):
+        """
+        데이터를 교체하고 다시 그립니다.
+        yerr가 주어지면 오차 막대를, hline이 주어지면 수평 기준선을 그립니다.
+        """
+        self._x = np.asarray(x, dtype=float)
+        self._y = np.asarray(y, dtype=float)
+        self._yerr = None if yerr is None else np.asarray(yerr, dtype=float)
+        self._show_line = line
+        self._hline = hline
+        self.update()
+
+    def clear(self):
+        self.set_data([], [])
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.fillRect(self.rect(), Qt.white)
+
+        margin_l, margin_r, margin_t, margin_b = 48, 10, 20, 28
+        plot = QRectF(margin_l, margin_t,
+                      max(self.width() - margin_l - margin_r, 1),
+                      max(self.height() - margin_t - margin_b, 1))
+
+        painter.setPen(QPen(Qt.black, 1))
+        painter.drawRect(plot)
+        painter.drawText(QRectF(0, 0, self.width(), margin_t), Qt.AlignCenter, self._title)
+        painter.drawText(QRectF(margin_l, self.height() - 14, plot.width(), 14), Qt.AlignCenter, self._x_label)
+
+        finite = np.isfinite(self._x) & np.isfinite(self._y)
+        if not finite.any():
+            painter.end()
+            return
+
+        x, y = self._x[finite], self._y[finite]
+        yerr = self._yerr[finite] if self._yerr is not None else np.zeros_like(y)
+        yerr = np.nan_to_num(yerr)
+
+        xmin, xmax = x.min(), x.max()
+        ymin, ymax = (y - yerr).min(), (y + yerr).max()
+        if self._hline is not None:
+            ymin, ymax = min(ymin, self._hline), max(ymax, self._hline)
+        if xmax == xmin:
+            xmin, xmax = xmin - 0.5, xmax + 0.5
+        if ymax == ymin:
+            ymin, ymax = ymin - 0.5, ymax + 0.5
+        pad = 0.05 * (ymax - ymin)
+        ymin, ymax = ymin - pad, ymax + pad
+
+        def to_px(xv, yv):
+            px = plot.left() + (xv - xmin) / (xmax - xmin) * plot.width()
+            frac = (yv - ymin) / (ymax - ymin)
+            if not self._invert_y:
+                frac = 1 - frac
+            py = plot.top() + frac * plot.height()
+            return px, py
+
+        # 축 눈금 값 (최소/최대만 표시)
+        top_val, bottom_val = (ymin, ymax) if self._invert_y else (ymax, ymin)
+        painter.drawText(QRectF(0, plot.top() - 6, margin_l - 4, 12), Qt.AlignRight, f"{top_val:.3g}")
+        painter.drawText(QRectF(0, plot.bottom() - 6, margin_l - 4, 12), Qt.AlignRight, f"{bottom_val:.3g}")
+        painter.drawText(QRectF(0, plot.center().y() - 6, margin_l - 4, 12), Qt.AlignRight, self._y_label)
+
+        if self._hline is not None:
+            _, hy = to_px(xmin, self._hline)
+            painter.setPen(QPen(Qt.gray, 1, Qt.DashLine))
+            painter.drawLine(QPointF(plot.left(), hy), QPointF(plot.right(), hy))
+
+        px, py = to_px(x, y)
+
+        if self._yerr is not None:
+            _, py_lo = to_px(x, y - yerr)
+            _, py_hi = to_px(x, y + yerr)
+            painter.setPen(QPen(Qt.darkGray, 1))
+            for xi, lo, hi in zip(px, py_lo, py_hi):
+                painter.drawLine(QPointF(xi, lo), QPointF(xi, hi))
+
+        if self._show_line and len(px) > 1:
+            painter.setPen(QPen(Qt.blue, 1.2))
+            painter.drawPolyline(QPolygonF([QPointF(a, b) for a, b in zip(px, py)]))
+
+        painter.setPen(QPen(Qt.red, 1))
+        painter.setBrush(Qt.red)
+        for a, b in zip(px, py):
+            painter.drawEllipse(QPointF(a, b), 2.0, 2.0)
+
+        painter.end()
@@ -0,0 +1,138 @@
+# session.py
+"""
+작업 세션 저장/불러오기.
+
+프레임 목록, 측광 대상/비교성 선택(구조체 배열), 검출·측광 설정, 광도 곡선과
+캐시된 결과(차분 영상 기준 영상)를 NumPy .npz 파일 하나에 저장합니다.
+큰 배열(기준 영상)은 옆에 .npy 파일로 따로 저장해 경로만 기록하고,
+불러올 때는 메모리 맵으로 열어 실제로 사용할 때만 읽습니다.
+pickle을 쓰지 않으므로 세션 파일을 열어도 코드가 실행되지 않습니다.
+"""
+
+import json
+import os
+
+import numpy as np
+
+SESSION_VERSION = 1
+SESSION_SUFFIX = ".astropsf.npz"
+
+COORD_DTYPE = np.dtype([("x", "f8"), ("y", "f8")])
+# time은 관측 시각(MJD), 헤더에 없으면 NaN
+LIGHT_CURVE_DTYPE = np.dtype([("time", "f8"), ("mag", "f8"), ("mag_err", "f8")])
+
+
+def coords_to_array(coords):
+    """(x, y) 튜플 리스트 → COORD_DTYPE 구조체 배열"""
+    array = np.zeros(len(coords), dtype=COORD_DTYPE)
+    if len(coords):
+        xy = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        array["x"], array["y"] = xy[:, 0], xy[:, 1]
+    return array
+
+
+def array_to_coords(array):
+    return [(float(x), float(y)) for x, y in zip(array["x"], array["y"])]
+
+
+def _reference_path(path):
+    base = path[:-len(SESSION_SUFFIX)] if path.endswith(SESSION_SUFFIX) else os.path.splitext(path)[0]
+    return base + ".reference.npy"
+
+
+def in_memory(array):
+    """메모리 맵 배열을 메모리로 읽어 파일 매핑을 놓음 (그 밖의 배열은 그대로)"""
+    if isinstance(array, np.memmap):
+        return np.array(array)
+    return array
+
+
+def save_session(path, state):
+    """
+    세션을 저장합니다.
+
+    state : dict
+        'frame_paths' : 경로 리스트
+        'current_frame_path' : 현재 프레임 경로 또는 None
+        'target_coords', 'comp_coords' : (x, y) 리스트
+        'params' : JSON으로 저장할 설정 dict
+        'light_curve' : [(time 또는 None, mag, mag_err)] 리스트
+        'reference' : 차분 영상 기준 영상 (2D 배열) 또는 None
+        'reference_fwhm' : 기준 영상 FWHM 또는 None
+
+    load_session()으로 연 기준 영상(메모리 맵)을 같은 경로에 다시 저장하려면 호출하기 전에
+    in_memory()로 바꿔 두어야 합니다. (Windows에서는 매핑된 파일을 바꿀 수 없음)
+    """
+    light_curve = np.zeros(len(state.get("light_curve", [])), dtype=LIGHT_CURVE_DTYPE)
+    for i, (t, mag, mag_err) in enumerate(state.get("light_curve", [])):
+        light_curve[i] = (np.nan if t is None else t, mag, mag_err)
+
+    meta = {
+        "version": SESSION_VERSION,
+        "current_frame_path": state.get("current_frame_path"),
+        "params": state.get("params", {}),
+        "reference_file": None,
+        "reference_fwhm": state.get("reference_fwhm"),
+    }
+
+    reference = state.get("reference")
+    reference_file = _reference_path(path)
+    if reference is not None:
+        # 중간에 실패해도 이전 기준 영상이 남도록 새 파일에 쓴 뒤 교체
+        with open(reference_file + ".tmp", "wb") as f:
+            np.save(f, np.asarray(reference, dtype=np.float32))
+        os.replace(reference_file + ".tmp", reference_file)
+        meta["reference_file"] = os.path.basename(reference_file)
+    elif os.path.exists(reference_file):
+        os.remove(reference_file)  # 이전 저장의 기준 영상은 더 이상 유효하지 않음
+
+    frame_paths = [os.path.abspath(p) for p in state.get("frame_paths", [])]
+    with open(path + ".tmp", "wb") as f:
+        # 불러오기 속도를 위해 압축하지 않음 (큰 배열은 따로 저장하므로 파일은 작음)
+        np.savez(
+            f,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+            frame_paths=np.array(frame_paths, dtype=str),
+            target=coords_to_array(state.get("target_coords", [])),
+            comp=coords_to_array(state.get("comp_coords", [])),
+            light_curve=light_curve,
+        )
+    os.replace(path + ".tmp", path)
+
+
+def load_session(path):
+    """
+    세션을 불러옵니다. 기준 영상은 메모리 맵으로 열어 실제로 쓰일 때 읽힙니다.
+
+    Returns:
+        save_session()의 state와 같은 형식의 dict (+ 'missing_frames': 없는 프레임 수)
+    """
+    with np.load(path, allow_pickle=False) as npz:
+        meta = json.loads(str(npz["meta"]))
+        if meta.get("version", 0) > SESSION_VERSION:
+            raise ValueError("더 새로운 버전의 세션 파일입니다.")
+        frame_paths = [str(p) for p in npz["frame_paths"]]
+        target = npz["target"]
+        comp = npz["comp"]
+        light_curve = npz["light_curve"]
+
+    reference = None
+    if meta.get("reference_file"):
+        reference_file = os.path.join(os.path.dirname(os.path.abspath(path)), meta["reference_file"])
+        if os.path.exists(reference_file):
+            reference = np.load(reference_file, mmap_mode="r")
+
+    return {
+        'frame_paths': frame_paths,
+        'current_frame_path': meta.get("current_frame_path"),
+        'target_coords': array_to_coords(target),
+        'comp_coords': array_to_coords(comp),
+        'params': meta.get("params", {}),
+        'light_curve': [
+            (None if np.isnan(t) else float(t), float(m), float(e))
+            for t, m, e in zip(light_curve["time"], light_curve["mag"], light_curve["mag_err"])
+        ],
+        'reference': reference,
+        'reference_fwhm': meta.get("reference_fwhm"),
+        'missing_frames': sum(not os.path.exists(p) for p in frame_paths),
+    }
@@ -0,0 +1,125 @@
+# star_profile.py
+
+import numpy as np
+
+# 가우시안 sigma → FWHM 변환 계수
+GAUSSIAN_SIGMA_TO_FWHM = 2.3548
+
+
+def find_local_peak(image, x, y, search=3):
+    """
+    (x, y) 주변 반경 search 안에서 가장 밝은 픽셀 좌표 (px, py)를 반환합니다.
+    좌표가 이미지 밖이면 None을 반환합니다.
+    """
+    h, w = image.shape
+    xi, yi = int(round(x)), int(round(y))
+    if not (0 <= xi < w and 0 <= yi < h):
+        return None
+
+    # 1. 커서 주변에서 가장 밝은 픽셀(별의 대략적 중심) 찾기
+    sy0, sy1 = max(yi - search, 0), min(yi + search + 1, h)
+    sx0, sx1 = max(xi - search, 0), min(xi + search + 1, w)
+    search_box = image[sy0:sy1, sx0:sx1]
+    iy, ix = np.unravel_index(np.argmax(search_box), search_box.shape)
+    return int(sx0 + ix), int(sy0 + iy)
+
+
+def measure_star(image, x, y, size=15, search=3, min_snr=5.0):
+    """
+    (x, y) 근처 별의 빠른 정보(국소 중심, 방사 프로파일, FWHM)를 계산합니다.
+    마우스 호버처럼 자주 호출되는 용도이므로 작은 절단 이미지에서 벡터화된 모멘트만 사용합니다.
+
+    Parameters:
+        image : 2D numpy array
+        x, y : float
+            조사할 좌표 (픽셀)
+        size : int
+            절단 이미지 크기 (홀수 추천)
+        search : int
+            (x, y) 주변에서 가장 밝은 픽셀을 찾는 반경
+        min_snr : float
+            이 값보다 신호대잡음비가 낮으면 별이 아닌 것으로 판단
+
+    Returns:
+        dict 또는 None (이미지 경계 밖) : {
+            'x_peak', 'y_peak', 'x_centroid', 'y_centroid', 'background', 'noise',
+            'peak', 'snr', 'is_star', 'radii', 'profile', 'fwhm'
+        }
+    """
+    h, w = image.shape
+    peak_pos = find_local_peak(image, x, y, search)
+    if peak_pos is None:
+        return None
+    px, py = peak_pos
+
+    # 2. 밝은 픽셀 중심의 절단 이미지
+    half = size // 2
+    y0, y1 = max(py - half, 0), min(py + half + 1, h)
+    x0, x1 = max(px - half, 0), min(px + half + 1, w)
+    cutout = np.asarray(image[y0:y1, x0:x1], dtype=np.float64)
+    if cutout.shape[0] < 5 or cutout.shape[1] < 5:
+        return None
+
+    # 3. 테두리 픽셀로 배경과 잡음 추정
+    border = np.concatenate([cutout[0], cutout[-1], cutout[1:-1, 0], cutout[1:-1, -1]])
+    background = np.median(border)
+    noise = 1.4826 * np.median(np.abs(border - background))
+    sub = cutout - background
+    peak = sub.max()
+    if noise <= 0:
+        # 테두리가 모두 같은 값(평탄하거나 포화된 영역, 빈 영역)이면 잡음을 알 수 없으므로 별로 보지 않음
+        return {
+            'x_peak': px, 'y_peak': py,
+            'x_centroid': float(px), 'y_centroid': float(py),
+            'background': background, 'noise': noise,
+            'peak': peak, 'snr': 0.0, 'is_star': False,
+            'radii': np.zeros(0), 'profile': np.zeros(0), 'fwhm': np.nan,
+        }
+    snr = peak / noise
+
+    # 4. 모멘트 기반 중심 (음수 픽셀은 가중치에서 제외)
+    yy, xx = np.mgrid[y0:y1, x0:x1]
+    weights = np.clip(sub, 0, None)
+    total = weights.sum()
+    if total > 0:
+        cx = (weights * xx).sum() / total
+        cy = (weights * yy).sum() / total
+    else:
+        cx, cy = float(px), float(py)
+
+    # 5. 1픽셀 간격 방사 프로파일
+    r = np.hypot(xx - cx, yy - cy).ravel()
+    idx = r.astype(np.intp)
+    counts = np.bincount(idx)
+    valid = counts > 0
+    radii = (np.bincount(idx, weights=r)[valid] / counts[valid])
+    profile = (np.bincount(idx, weights=sub.ravel())[valid] / counts[valid])
+
+    # 6. 반치폭: 프로파일이 최대값의 절반으로 떨어지는 반경의 두 배
+    fwhm = _half_max_fwhm(radii, profile, peak)
+    if not np.isfinite(fwhm) and total > 0:
+        # 반치 지점을 못 찾으면 2차 모멘트로 대체
+        sigma = np.sqrt((weights.ravel() * r**2).sum() / (2 * total))
+        fwhm = GAUSSIAN_SIGMA_TO_FWHM * sigma
+
+    return {
+        'x_peak': px, 'y_peak': py,
+        'x_centroid': cx, 'y_centroid': cy,
+        'background': background, 'noise': noise,
+        'peak': peak, 'snr': snr, 'is_star': bool(snr >= min_snr),
+        'radii': radii, 'profile': profile, 'fwhm': fwhm,
+    }
+
+
+def _half_max_fwhm(radii, profile, peak):
+    if peak <= 0:
+        return np.nan
+    below = np.nonzero(profile < peak / 2)[0]
+    if below.size == 0 or below[0] == 0:
+        return np.nan
+    i = below[0]
+    # 반치 지점 전후 두 점 사이를 선형 보간
+    r0, r1 = radii[i - 1], radii[i]
+    p0, p1 = profile[i - 1], profile[i]
+    r_half = r0 + (p0 - peak / 2) * (r1 - r0) / (p0 - p1)
+    return 2 * r_half
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# 모듈들이 프로그램 폴더에 평평하게 있으므로 테스트에서 바로 import 할 수 있도록 경로 추가
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,29 @@
+# tests/test_centroid.py
+
+import numpy as np
+
+from centroid import refine_centroids
+
+
+def gaussian_image(stars, shape=(80, 80), sigma=1.5, sky=10.0, noise=0.5, seed=0):
+    yy, xx = np.mgrid[:shape[0], :shape[1]]
+    image = np.full(shape, sky) + np.random.default_rng(seed).normal(0, noise, shape)
+    for x, y, amplitude in stars:
+        image += amplitude * np.exp(-((xx - x)**2 + (yy - y)**2) / (2 * sigma**2))
+    return image
+
+
+def test_refines_offset_click():
+    image = gaussian_image([(40.3, 39.6, 200)])
+    refined, ok = refine_centroids(image, [(42, 38)], box_size=11)
+    assert ok.all()
+    np.testing.assert_allclose(refined[0], (40.3, 39.6), atol=0.1)
+
+
+def test_brighter_neighbour_is_rejected_with_max_shift():
+    image = gaussian_image([(40.0, 40.0, 100), (45.0, 40.0, 400)])
+    refined, ok = refine_centroids(image, [(40, 40)], box_size=15)
+    assert ok.all() and refined[0, 0] > 44  # 제한이 없으면 이웃 별로 끌려감
+    refined, ok = refine_centroids(image, [(40, 40)], box_size=15, max_shift=3.5)
+    assert not ok.any()
+    np.testing.assert_array_equal(refined[0], (40, 40))
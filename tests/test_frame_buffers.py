@@ -0,0 +1,83 @@
+# tests/test_frame_buffers.py
+
+import numpy as np
+import pytest
+
+from frame_buffers import MB, BufferPool, MemoryLimitError, read_fits, stretch_to_uint8
+
+fits = pytest.importorskip("astropy.io.fits")
+
+
+def test_pool_reuses_buffer_for_same_or_smaller_request():
+    pool = BufferPool(limit_mb=None)
+    a = pool.get("frame", (100, 100), np.float64)
+    b = pool.get("frame", (50, 80), np.float32)
+    assert pool.allocations == 1
+    assert np.shares_memory(a, b)
+    assert b.shape == (50, 80) and b.dtype == np.float32
+
+
+def test_pool_grows_and_reports():
+    pool = BufferPool(limit_mb=None)
+    pool.get("frame", (10, 10))
+    pool.get("frame", (100, 100))
+    assert pool.allocations == 2
+    assert pool.nbytes == 100 * 100 * 4
+    pool.release("frame")
+    assert pool.nbytes == 0
+
+
+def test_pool_limit():
+    pool = BufferPool(limit_mb=1)
+    pool.get("a", (MB // 8 // 2,), np.float64)  # 0.5 MB
+    with pytest.raises(MemoryLimitError):
+        pool.get("b", (MB // 8,), np.float64)  # 1 MB 더 요청
+    # 같은 이름의 버퍼를 키울 때는 기존 크기를 빼고 계산
+    pool.get("a", (MB // 8,), np.float64)
+    assert pool.available() == 0
+    pool.set_limit(None)
+    pool.get("b", (MB // 8,), np.float64)
+
+
+def test_stretch_reuses_buffers():
+    pool = BufferPool(limit_mb=None)
+    data = np.random.default_rng(0).normal(100, 5, (300, 200))
+    out = stretch_to_uint8(data, pool)
+    allocations = pool.allocations
+    out2 = stretch_to_uint8(data + 1, pool)
+    assert pool.allocations == allocations
+    assert out.dtype == np.uint8 and np.shares_memory(out, out2)
+
+
+def test_read_fits_scaling_and_nan(tmp_path):
+    raw = (np.arange(60, dtype=np.float64).reshape(6, 10) * 100)
+    hdu = fits.PrimaryHDU(raw.copy())
+    hdu.scale("int16", bscale=2.0, bzero=1000.0)
+    hdu.writeto(tmp_path / "scaled.fits")
+    data, header = read_fits(tmp_path / "scaled.fits", BufferPool(None))
+    assert data.dtype == np.float64
+    np.testing.assert_allclose(data, fits.getdata(tmp_path / "scaled.fits"))
+
+    nan_data = np.ones((4, 4), dtype=np.float32)
+    nan_data[1, 2] = np.nan
+    fits.PrimaryHDU(nan_data).writeto(tmp_path / "nan.fits")
+    data, _ = read_fits(tmp_path / "nan.fits", BufferPool(None), dtype=None)
+    assert data.dtype == np.float32 and data[1, 2] == 0
+
+
+def test_read_fits_extension_and_compressed(tmp_path):
+    image = np.random.default_rng(1).uniform(0, 1000, (20, 30)).astype(np.float32)
+    header = fits.Header({"OBJECT": "ext"})
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(image, header=header)]).writeto(tmp_path / "ext.fits")
+    data, header = read_fits(tmp_path / "ext.fits", BufferPool(None))
+    np.testing.assert_allclose(data, image)
+    assert header["OBJECT"] == "ext"
+
+    counts = np.random.default_rng(2).integers(0, 60000, (20, 30)).astype(np.uint16)
+    fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(counts)]).writeto(tmp_path / "c.fits.fz")
+    data, _ = read_fits(tmp_path / "c.fits.fz", BufferPool(None))
+    np.testing.assert_array_equal(data, counts)
+
+    fits.PrimaryHDU().writeto(tmp_path / "empty.fits")
+    with pytest.raises(ValueError):
+        read_fits(tmp_path / "empty.fits", BufferPool(None))
@@ -0,0 +1,38 @@
+# tests/test_gaussian_fit.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("photutils")
+
+from bench_gaussian_fit import FLUX_TOLERANCE, POSITION_TOLERANCE, isolated, make_field
+from photometry import fit_stars
+
+FWHM = 3.5
+
+
+@pytest.fixture(scope="module")
+def field():
+    image, positions, _ = make_field(40, shape=(400, 400), fwhm=FWHM)
+    return image, positions[isolated(positions, FWHM * 8)]
+
+
+def test_batch_fit_matches_photutils(field):
+    image, positions = field
+    assert len(positions) >= 5
+    coords = [tuple(p) for p in positions]
+    reference = fit_stars(image, coords, FWHM, backends={"fitter": "trf", "psf_model": "gaussian_prf",
+                                                        "background": "mmm"})
+    batch = fit_stars(image, coords, FWHM, backends={"fitter": "batch"})
+
+    assert np.all(batch["flags"] == 0)
+    np.testing.assert_allclose(batch["x_fit"], reference["x_fit"], atol=POSITION_TOLERANCE)
+    np.testing.assert_allclose(batch["y_fit"], reference["y_fit"], atol=POSITION_TOLERANCE)
+    np.testing.assert_allclose(batch["flux_fit"], reference["flux_fit"], rtol=FLUX_TOLERANCE)
+
+
+def test_batch_fit_recovers_true_flux():
+    image, positions, params = make_field(10, shape=(300, 300), fwhm=FWHM, seed=1)
+    keep = isolated(positions, FWHM * 8)
+    batch = fit_stars(image, [tuple(p) for p in positions[keep]], FWHM, backends={"fitter": "batch"})
+    np.testing.assert_allclose(batch["flux_fit"], np.asarray(params["flux"])[keep], rtol=0.05)
@@ -0,0 +1,106 @@
+# tests/test_live_reduction.py
+
+import gzip
+
+import numpy as np
+import pytest
+
+from live_reduction import FITS_BLOCK, FolderWatcher, fits_complete
+
+fits = pytest.importorskip("astropy.io.fits")
+
+
+def truncate(src, dst, size):
+    dst.write_bytes(src.read_bytes()[:size])
+    return dst
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).uniform(0, 1000, (64, 80)).astype(np.float32)
+
+
+def test_complete_primary(tmp_path, image):
+    path = tmp_path / "frame.fits"
+    fits.PrimaryHDU(image).writeto(path)
+    assert fits_complete(str(path))
+    size = path.stat().st_size
+    assert not fits_complete(str(truncate(path, tmp_path / "cut.fits", size - FITS_BLOCK)))
+    assert not fits_complete(str(truncate(path, tmp_path / "odd.fits", size - 100)))
+
+
+def test_extension_cut_after_primary_header(tmp_path, image):
+    path = tmp_path / "ext.fits"
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(image)]).writeto(path)
+    assert fits_complete(str(path))
+    assert not fits_complete(str(truncate(path, tmp_path / "primary.fits", FITS_BLOCK)))
+    assert not fits_complete(str(truncate(path, tmp_path / "headers.fits", 2 * FITS_BLOCK)))
+
+
+def test_nextend_cut_at_hdu_boundary(tmp_path, image):
+    path = tmp_path / "multi.fits"
+    fits.HDUList([
+        fits.PrimaryHDU(header=fits.Header({"NEXTEND": 2})), fits.ImageHDU(image), fits.ImageHDU(image),
+    ]).writeto(path)
+    assert fits_complete(str(path))
+    # 주 헤더 + 첫 확장 HDU (헤더 한 블록 + 데이터)까지만 쓰인 파일
+    first_extension_end = 2 * FITS_BLOCK + -(-image.nbytes // FITS_BLOCK) * FITS_BLOCK
+    assert not fits_complete(str(truncate(path, tmp_path / "cut.fits", first_extension_end)))
+
+
+def test_compressed_files(tmp_path, image):
+    fz = tmp_path / "frame.fits.fz"
+    fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(image)]).writeto(fz)
+    assert fits_complete(str(fz))
+    assert not fits_complete(str(truncate(fz, tmp_path / "cut.fits.fz", fz.stat().st_size - FITS_BLOCK)))
+
+    plain = tmp_path / "frame.fits"
+    fits.PrimaryHDU(image).writeto(plain)
+    gz = tmp_path / "frame.fits.gz"
+    gz.write_bytes(gzip.compress(plain.read_bytes()))
+    assert fits_complete(str(gz))
+    assert not fits_complete(str(truncate(gz, tmp_path / "cut.fits.gz", gz.stat().st_size // 2)))
+
+
+def test_not_fits(tmp_path):
+    path = tmp_path / "junk.fits"
+    path.write_bytes(b" " * FITS_BLOCK)
+    assert not fits_complete(str(path))
+    assert not fits_complete(str(tmp_path / "missing.fits"))
+
+
+def test_watcher_waits_for_complete_file(tmp_path, image):
+    watcher = FolderWatcher(str(tmp_path), settle_s=0.0)
+    full = tmp_path / "full.fits"
+    fits.HDUList([fits.PrimaryHDU(), fits.ImageHDU(image)]).writeto(full)
+    partial = truncate(full, tmp_path / "partial.fits", FITS_BLOCK)
+
+    assert watcher.poll(now=0.0) == []  # 처음 본 파일은 크기가 유지되는지 기다림
+    assert watcher.poll(now=1.0) == [str(full)]
+    assert watcher.poll(now=2.0) == []
+
+    partial.write_bytes(full.read_bytes())
+    watcher.poll(now=3.0)
+    assert watcher.poll(now=4.0) == [str(partial)]
+
+
+def test_tracking_ignores_single_bad_lock():
+    from live_reduction import LiveReducer
+
+    reducer = LiveReducer({}, max_workers=1)
+    try:
+        step = 5 / 1440  # 5분 간격 (일)
+        for k in range(8):
+            x, y = 60 + 3 * k, 80 + 1.5 * k
+            if k == 4:
+                x, y = x + 3.5, y - 3.0  # 이웃 별에 잘못 맞춘 측정
+            reducer._update_motion({'target_ok': True, 'time': 60000 + k * step, 'target_xy': [(x, y)]})
+        # 추적에 쓸 수 없는 측정은 무시
+        reducer._update_motion({'target_ok': False, 'time': 60001.0, 'target_xy': [(0.0, 0.0)]})
+
+        motion = reducer.setup['target_motion']
+        np.testing.assert_allclose(motion['rate'][0], (3 / step, 1.5 / step))
+        np.testing.assert_allclose(motion['coords'][0], (81.0, 90.5))
+        assert motion['time'] == pytest.approx(60000 + 7 * step)
+    finally:
+        reducer.shutdown()
@@ -0,0 +1,29 @@
+# tests/test_moving_objects.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("scipy")
+
+from moving_objects import MovingObjectFinder, estimate_offset
+
+
+def test_estimate_offset():
+    xy = np.random.default_rng(0).uniform(0, 500, (40, 2))
+    dx, dy = estimate_offset(xy, xy + (3.2, -1.1))
+    assert dx == pytest.approx(3.2) and dy == pytest.approx(-1.1)
+
+
+def test_estimate_offset_reports_no_match():
+    xy = np.random.default_rng(0).uniform(0, 500, (40, 2))
+    assert estimate_offset(xy, xy + (45.0, 0.0)) is None
+    assert estimate_offset(xy, np.zeros((0, 2))) is None
+
+
+def test_finder_rejects_unaligned_frame():
+    xy = np.random.default_rng(0).uniform(0, 500, (40, 2))
+    finder = MovingObjectFinder()
+    finder.add_frame(xy, time=0.0)
+    with pytest.raises(ValueError):
+        finder.add_frame(xy + (45.0, 0.0), time=1.0)
+    assert len(finder.frames) == 1
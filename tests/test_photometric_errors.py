@@ -0,0 +1,70 @@
+# tests/test_photometric_errors.py
+
+import numpy as np
+import pytest
+
+from photometric_errors import (
+    MAG_PER_FLUX, ccd_parameters, differential_magnitude, ensemble_magnitude, magnitude_error,
+)
+
+
+def test_ccd_parameters_defaults_and_header():
+    assert ccd_parameters(None) == {'gain': 1.0, 'read_noise': 0.0, 'from_header': False}
+    ccd = ccd_parameters({"GAIN": 1.5, "RDNOISE": 8.0})
+    assert ccd == {'gain': 1.5, 'read_noise': 8.0, 'from_header': True}
+    # 헤더의 0 이득은 없는 것으로 봄
+    assert ccd_parameters({"GAIN": 0.0})['gain'] == 1.0
+    # 인자가 헤더보다 우선
+    assert ccd_parameters({"GAIN": 1.5}, gain=2.0, read_noise=3.0)['gain'] == 2.0
+
+
+@pytest.mark.parametrize("gain", [0, -1.0, float("nan"), float("inf")])
+def test_ccd_parameters_rejects_bad_gain(gain):
+    with pytest.raises(ValueError):
+        ccd_parameters(None, gain=gain)
+
+
+def test_ccd_parameters_rejects_negative_read_noise():
+    with pytest.raises(ValueError):
+        ccd_parameters(None, read_noise=-1.0)
+    with pytest.raises(TypeError):
+        ccd_parameters(None, gain=[1.0])
+
+
+def test_differential_magnitude():
+    mag, err = differential_magnitude(1000.0, 10.0, 10000.0, 50.0, 10.0)
+    assert mag == pytest.approx(12.5)
+    assert err == pytest.approx(np.hypot(MAG_PER_FLUX * 0.01, MAG_PER_FLUX * 0.005))
+    # 두 플럭스가 모두 음수여도 비율이 양수인 등급을 내지 않음
+    assert np.isnan(differential_magnitude(-1000.0, 10.0, -10000.0, 50.0, 10.0)[0])
+
+
+def test_ensemble_magnitude_weighting():
+    flux_comp = np.array([10000.0, 10000.0])
+    error_comp = np.array([10.0, 100.0])
+    # 두 비교성의 영점이 0.1 등급 다르면 가중 평균은 오차가 작은 쪽에 가까움
+    comp_mag = np.array([10.0, 10.1])
+    mag, err = ensemble_magnitude(10000.0, 10.0, flux_comp, error_comp, comp_mag)
+    weight = 1 / magnitude_error(flux_comp, error_comp)**2
+    expected_zero_point = (comp_mag * weight).sum() / weight.sum() + 2.5 * np.log10(10000.0)
+    assert mag == pytest.approx(expected_zero_point - 2.5 * np.log10(10000.0))
+    assert 10.0 < mag < 10.01
+    assert err == pytest.approx(np.hypot(magnitude_error(10000.0, 10.0), 1 / np.sqrt(weight.sum())))
+
+
+def test_ensemble_magnitude_skips_non_positive_comparison():
+    mag, _ = ensemble_magnitude(1000.0, 10.0, np.array([-5.0, 10000.0]), np.array([10.0, 10.0]),
+                                np.array([9.0, 10.0]))
+    assert mag == pytest.approx(12.5)
+    mag, err = ensemble_magnitude(1000.0, 10.0, np.array([-5.0, 0.0]), np.array([10.0, 10.0]),
+                                  np.array([9.0, 10.0]))
+    assert np.isnan(mag)
+
+
+def test_ensemble_magnitude_vectorised():
+    flux_target = np.array([1000.0, 100.0])
+    flux_comp = np.array([[10000.0, 10000.0], [10000.0, 10000.0]])
+    mag, err = ensemble_magnitude(flux_target, np.array([10.0, 10.0]), flux_comp,
+                                  np.full((2, 2), 10.0), np.array([10.0, 10.0]))
+    np.testing.assert_allclose(mag, [12.5, 15.0])
+    assert err.shape == (2,)
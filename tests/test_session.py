@@ -0,0 +1,56 @@
+# tests/test_session.py
+
+import numpy as np
+import pytest
+
+from session import SESSION_SUFFIX, in_memory, load_session, save_session
+
+
+@pytest.fixture
+def state(tmp_path):
+    frames = [tmp_path / f"f{i}.fits" for i in range(3)]
+    for path in frames[:2]:
+        path.write_bytes(b"")
+    return {
+        'frame_paths': [str(p) for p in frames],
+        'current_frame_path': str(frames[1]),
+        'target_coords': [(10.5, 20.25)],
+        'comp_coords': [(30.0, 40.0), (50.5, 60.5)],
+        'params': {'fwhm': 4.7, 'mode': 'psf', 'name': '소행성'},
+        'light_curve': [(60000.5, 12.3, 0.01), (None, 12.4, 0.02)],
+        'reference': np.arange(12, dtype=np.float32).reshape(3, 4),
+        'reference_fwhm': 3.9,
+    }
+
+
+def test_round_trip(tmp_path, state):
+    path = str(tmp_path / ("work" + SESSION_SUFFIX))
+    save_session(path, state)
+    loaded = load_session(path)
+
+    for key in ('frame_paths', 'current_frame_path', 'target_coords', 'comp_coords', 'params',
+                'light_curve', 'reference_fwhm'):
+        assert loaded[key] == state[key], key
+    np.testing.assert_array_equal(loaded['reference'], state['reference'])
+    assert isinstance(loaded['reference'], np.memmap)
+    assert loaded['missing_frames'] == 1
+
+
+def test_resave_over_mapped_reference(tmp_path, state):
+    path = str(tmp_path / ("work" + SESSION_SUFFIX))
+    save_session(path, state)
+    loaded = load_session(path)
+    loaded['reference'] = in_memory(loaded['reference'])
+    assert not isinstance(loaded['reference'], np.memmap)
+    loaded['reference'] = loaded['reference'] * 2
+    save_session(path, loaded)
+    np.testing.assert_array_equal(load_session(path)['reference'], state['reference'] * 2)
+
+
+def test_reference_removed_when_not_saved(tmp_path, state):
+    path = str(tmp_path / ("work" + SESSION_SUFFIX))
+    save_session(path, state)
+    save_session(path, dict(state, reference=None, reference_fwhm=None))
+    loaded = load_session(path)
+    assert loaded['reference'] is None
+    assert not (tmp_path / "work.reference.npy").exists()